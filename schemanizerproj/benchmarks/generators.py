@@ -0,0 +1,138 @@
+"""Generators of synthetic schemas and changesets for benchmarks.
+
+Schemas have tables x columns x indexes; besides the id primary key, each
+table has the given number of columns and of single-column indexes. The
+generated text is deterministic, so that results of different runs are
+comparable.
+"""
+
+# column types, used in turn
+COLUMN_TYPES = (
+    'int(11) DEFAULT NULL',
+    'varchar(64) DEFAULT NULL',
+    'datetime DEFAULT NULL',
+    'decimal(10,2) DEFAULT NULL',
+    'bigint(20) NOT NULL DEFAULT \'0\'',
+)
+
+# lines mysqldump -d --skip-add-drop-table --skip-comments writes before and
+# after the tables
+DUMP_HEADER = """/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;
+/*!40101 SET @OLD_CHARACTER_SET_RESULTS=@@CHARACTER_SET_RESULTS */;
+/*!40101 SET @OLD_COLLATION_CONNECTION=@@COLLATION_CONNECTION */;
+/*!40101 SET NAMES utf8 */;
+/*!40103 SET @OLD_TIME_ZONE=@@TIME_ZONE */;
+/*!40103 SET TIME_ZONE='+00:00' */;
+/*!40014 SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0 */;
+/*!40014 SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0 */;
+/*!40101 SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='NO_AUTO_VALUE_ON_ZERO' */;
+/*!40111 SET @OLD_SQL_NOTES=@@SQL_NOTES, SQL_NOTES=0 */;
+"""
+DUMP_FOOTER = """/*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
+
+/*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
+/*!40014 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS */;
+/*!40014 SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS */;
+/*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;
+/*!40101 SET CHARACTER_SET_RESULTS=@OLD_CHARACTER_SET_RESULTS */;
+/*!40101 SET COLLATION_CONNECTION=@OLD_COLLATION_CONNECTION */;
+/*!40111 SET SQL_NOTES=@OLD_SQL_NOTES */;
+"""
+TABLE_HEADER = """/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+"""
+TABLE_FOOTER = """/*!40101 SET character_set_client = @saved_cs_client */;
+"""
+
+
+def get_table_name(table):
+    return 't%04d' % (table,)
+
+
+def get_column_name(column):
+    return 'c%04d' % (column,)
+
+
+def generate_create_table(table, columns=10, indexes=2):
+    """Returns CREATE TABLE statement of a table, as mysqldump writes it,
+    without the trailing semicolon."""
+
+    if indexes > columns:
+        raise ValueError('There can not be more indexes than columns.')
+    lines = ['  `id` int(11) NOT NULL AUTO_INCREMENT']
+    for column in range(columns):
+        lines.append('  `%s` %s' % (
+            get_column_name(column),
+            COLUMN_TYPES[column % len(COLUMN_TYPES)]))
+    lines.append('  PRIMARY KEY (`id`)')
+    for index in range(indexes):
+        lines.append('  KEY `ix_%s` (`%s`)' % (
+            get_column_name(index), get_column_name(index)))
+    return 'CREATE TABLE `%s` (\n%s\n) ENGINE=InnoDB DEFAULT CHARSET=utf8' % (
+        get_table_name(table), ',\n'.join(lines))
+
+
+def generate_schema_ddl(tables=10, columns=10, indexes=2):
+    """Returns DDL of a synthetic schema, as stored in schema versions."""
+
+    return ''.join(
+        '%s;\n' % (generate_create_table(table, columns, indexes),)
+        for table in range(tables))
+
+
+def generate_schema_dump(tables=10, columns=10, indexes=2):
+    """Returns a schema dump of a synthetic schema, in the format of
+    utils.mysql_functions.dump_schema()."""
+
+    parts = [DUMP_HEADER]
+    for table in range(tables):
+        parts.append('\n')
+        parts.append(TABLE_HEADER)
+        parts.append('%s;\n' % (
+            generate_create_table(table, columns, indexes),))
+        parts.append(TABLE_FOOTER)
+    parts.append(DUMP_FOOTER)
+    return ''.join(parts)
+
+
+def generate_changeset_details(changeset, details=3, tables=10):
+    """Returns list of dicts of ChangesetDetail fields of a synthetic
+    changeset.
+
+    The details of changeset number changeset add a column, add an index and
+    create a table in turn, with revert SQL that undoes them. Details of
+    different changesets do not conflict, so that they can be applied one
+    after the other.
+    """
+
+    changeset_details = []
+    for detail in range(details):
+        table_name = get_table_name((changeset + detail) % tables)
+        name = 'b%04d_%04d' % (changeset, detail)
+        kind = detail % 3
+        if kind == 0:
+            apply_sql = (
+                'ALTER TABLE `%s` ADD COLUMN `%s` int(11) DEFAULT NULL' % (
+                    table_name, name))
+            revert_sql = 'ALTER TABLE `%s` DROP COLUMN `%s`' % (
+                table_name, name)
+        elif kind == 1:
+            apply_sql = 'ALTER TABLE `%s` ADD INDEX `%s` (`id`, `%s`)' % (
+                table_name, name, get_column_name(0))
+            revert_sql = 'ALTER TABLE `%s` DROP INDEX `%s`' % (
+                table_name, name)
+        else:
+            apply_sql = (
+                'CREATE TABLE `%s` (\n'
+                '  `id` int(11) NOT NULL AUTO_INCREMENT,\n'
+                '  `%s` varchar(64) DEFAULT NULL,\n'
+                '  PRIMARY KEY (`id`)\n'
+                ') ENGINE=InnoDB DEFAULT CHARSET=utf8' % (
+                    name, get_column_name(0)))
+            revert_sql = 'DROP TABLE `%s`' % (name,)
+        changeset_details.append(dict(
+            description='Benchmark changeset %s detail %s' % (
+                changeset, detail),
+            apply_sql=apply_sql,
+            revert_sql=revert_sql))
+    return changeset_details
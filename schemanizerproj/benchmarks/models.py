@@ -0,0 +1,3 @@
+"""benchmarks models"""
+
+# Benchmarks have no models, the app is installed for its tests.
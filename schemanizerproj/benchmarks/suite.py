@@ -0,0 +1,191 @@
+"""Benchmarks of the schema and changeset pipelines on synthetic data.
+
+Offline benchmarks only process generated text. MySQL benchmarks load the
+synthetic schema into a scratch database of a local MySQL server, the
+stand-in for the servers and EC2 instances changesets are normally reviewed
+and applied on. Temporary database schema, changesets and server records are
+created and deleted afterwards.
+"""
+
+import string
+import time
+import MySQLdb
+from django.utils import timezone
+from changesetapplies import changeset_apply
+from changesets import models as changesets_models
+from changesettests import changeset_testing
+from changesetvalidations import changeset_validation
+from schemaversions import models as schemaversions_models
+from servers import models as servers_models
+from utils import helpers, mysql_functions, sql_functions
+from . import generators
+
+
+def get_timings(timings):
+    """Returns dict of the number of runs and of the min, mean and max of
+    timings in seconds."""
+
+    return dict(
+        runs=len(timings),
+        min=min(timings),
+        mean=sum(timings) / len(timings),
+        max=max(timings))
+
+
+def time_function(function, repeat=3):
+    """Calls function repeat times, returns dict of timings."""
+
+    timings = []
+    for i in range(repeat):
+        start = time.time()
+        function()
+        timings.append(time.time() - start)
+    return get_timings(timings)
+
+
+def drop_schema(cursor, schema_name):
+    try:
+        cursor.execute('DROP SCHEMA IF EXISTS %s' % (schema_name,))
+    except MySQLdb.Warning:
+        # ignore warnings
+        pass
+
+
+def load_schema(schema_name, ddl, connection_options):
+    """Creates schema_name, dropping it first if it exists, and executes
+    ddl in it."""
+
+    conn = MySQLdb.connect(**connection_options)
+    try:
+        cursor = conn.cursor()
+        drop_schema(cursor, schema_name)
+        cursor.execute('CREATE SCHEMA %s' % (schema_name,))
+        cursor.execute('USE %s' % (schema_name,))
+        for statement in sql_functions.split(ddl):
+            statement = statement.rstrip(unicode(string.whitespace + ';'))
+            if statement:
+                cursor.execute(statement)
+                while cursor.nextset() is not None:
+                    pass
+    finally:
+        conn.close()
+
+
+def unload_schema(schema_name, connection_options):
+    conn = MySQLdb.connect(**connection_options)
+    try:
+        drop_schema(conn.cursor(), schema_name)
+    finally:
+        conn.close()
+
+
+def run_offline_benchmarks(tables=10, columns=10, indexes=2, repeat=3):
+    """Returns dict of timings of the functions that process schema dumps,
+    on a generated dump."""
+
+    dump = generators.generate_schema_dump(tables, columns, indexes)
+    changed_dump = generators.generate_schema_dump(
+        tables, columns + 1, indexes)
+    return dict(
+        normalize_schema_dump=time_function(
+            lambda: mysql_functions.normalize_schema_dump(dump), repeat),
+        generate_schema_hash=time_function(
+            lambda: mysql_functions.generate_schema_hash(dump), repeat),
+        generate_delta=time_function(
+            lambda: helpers.generate_delta(dump, changed_dump), repeat),
+    )
+
+
+def create_changesets(database_schema, changesets=10, details=3, tables=10):
+    """Creates approved synthetic changesets of database_schema."""
+
+    changeset_list = []
+    for i in range(changesets):
+        changeset = changesets_models.Changeset.objects.create(
+            database_schema=database_schema,
+            type=changesets_models.Changeset.DDL_TABLE_ALTER,
+            classification=changesets_models.Changeset.CLASSIFICATION_PAINLESS,
+            review_status=changesets_models.Changeset.REVIEW_STATUS_APPROVED)
+        for changeset_detail in generators.generate_changeset_details(
+                i, details, tables):
+            changesets_models.ChangesetDetail.objects.create(
+                changeset=changeset, **changeset_detail)
+        changeset_list.append(changeset)
+    return changeset_list
+
+
+def run_mysql_benchmarks(
+        connection_options, tables=10, columns=10, indexes=2, changesets=10,
+        details=3, repeat=3):
+    """Returns dict of timings of dump_schema and of the changeset review
+    and apply loops, against the MySQL server of connection_options.
+
+    Loops process all the changesets. The review loop runs the validators
+    and the syntax tests of each changeset on the MySQL server itself,
+    instead of an EC2 instance. The apply loop applies the changesets one
+    after the other, so it runs once; its number of failed applies is
+    included.
+    """
+
+    schema_name = 'benchmark_%s' % (helpers.random_string(8).lower(),)
+    ddl = generators.generate_schema_ddl(tables, columns, indexes)
+    database_schema = schemaversions_models.DatabaseSchema.objects.create(
+        name=schema_name)
+    server = servers_models.Server.objects.create(
+        name=schema_name,
+        hostname=connection_options.get('host') or 'localhost',
+        port=connection_options.get('port'))
+    results = {}
+    try:
+        load_schema(schema_name, ddl, connection_options)
+
+        dump_options = dict(connection_options, db=schema_name)
+        results['dump_schema'] = time_function(
+            lambda: mysql_functions.dump_schema(**dump_options), repeat)
+        schema_dump = mysql_functions.dump_schema(**dump_options)
+        schema_version = schemaversions_models.SchemaVersion.objects.create(
+            database_schema=database_schema,
+            ddl=schema_dump,
+            checksum=mysql_functions.generate_schema_hash(schema_dump),
+            pulled_from=server,
+            pull_datetime=timezone.now())
+
+        changeset_list = create_changesets(
+            database_schema, changesets, details, tables)
+
+        def run_validators():
+            for changeset in changeset_list:
+                changeset_validation.run_validators(
+                    changeset, schema_version=schema_version)
+
+        def run_review_loop():
+            for changeset in changeset_list:
+                changeset_validation.run_validators(
+                    changeset, schema_version=schema_version)
+                changeset_testing.run_tests(
+                    changeset, schema_version=schema_version,
+                    connection_options=connection_options.copy())
+
+        results['validators'] = time_function(run_validators, repeat)
+        results['review_loop'] = time_function(run_review_loop, repeat)
+
+        # the syntax tests leave the schema with the changesets applied
+        load_schema(schema_name, ddl, connection_options)
+        failed_applies = []
+
+        def run_apply_loop():
+            for changeset in changeset_list:
+                changeset_apply_obj = changeset_apply.ChangesetApply(
+                    changeset, None, server, connection_options.copy(),
+                    unit_testing=True)
+                changeset_apply_obj.run()
+                if changeset_apply_obj.has_errors:
+                    failed_applies.append(changeset.pk)
+
+        results['apply_loop'] = time_function(run_apply_loop, 1)
+        results['apply_loop']['errors'] = len(failed_applies)
+    finally:
+        unload_schema(schema_name, connection_options)
+        server.delete()
+        database_schema.delete()
+    return results
@@ -0,0 +1,62 @@
+from django.test import TestCase
+
+from utils import mysql_functions, sql_functions
+from . import generators
+
+
+class GeneratorsTestCase(TestCase):
+
+    def test_generate_create_table(self):
+        sql = generators.generate_create_table(3, columns=5, indexes=2)
+        self.assertTrue(sql.startswith('CREATE TABLE `t0003` (\n'))
+        self.assertIn('  `c0004` bigint(20)', sql)
+        self.assertNotIn('`c0005`', sql)
+        self.assertIn('  PRIMARY KEY (`id`)', sql)
+        self.assertIn('  KEY `ix_c0001` (`c0001`)', sql)
+        self.assertNotIn('ix_c0002', sql)
+
+    def test_generate_create_table_too_many_indexes(self):
+        self.assertRaises(
+            ValueError, generators.generate_create_table, 0, 2, 3)
+
+    def test_generate_schema_dump(self):
+        dump = generators.generate_schema_dump(4, columns=3, indexes=1)
+        self.assertEqual(
+            dump, generators.generate_schema_dump(4, columns=3, indexes=1))
+        statements = mysql_functions.normalize_schema_dump(dump).split(
+            u';\n')
+        self.assertEqual(len(statements), 4)
+        for statement in statements:
+            self.assertTrue(statement.startswith(u'CREATE TABLE `t'))
+        # the dump and the DDL have the same tables
+        self.assertEqual(
+            mysql_functions.generate_schema_hash(dump),
+            mysql_functions.generate_schema_hash(
+                generators.generate_schema_ddl(4, columns=3, indexes=1)))
+        self.assertNotEqual(
+            mysql_functions.generate_schema_hash(dump),
+            mysql_functions.generate_schema_hash(
+                generators.generate_schema_dump(4, columns=4, indexes=1)))
+
+    def test_generate_changeset_details(self):
+        details = generators.generate_changeset_details(2, details=4, tables=3)
+        self.assertEqual(len(details), 4)
+        self.assertEqual(
+            details[0]['apply_sql'],
+            'ALTER TABLE `t0002` ADD COLUMN `b0002_0000` int(11) DEFAULT NULL')
+        self.assertEqual(
+            details[0]['revert_sql'],
+            'ALTER TABLE `t0002` DROP COLUMN `b0002_0000`')
+        self.assertEqual(
+            details[1]['revert_sql'],
+            'ALTER TABLE `t0000` DROP INDEX `b0002_0001`')
+        self.assertTrue(
+            details[2]['apply_sql'].startswith('CREATE TABLE `b0002_0002`'))
+        self.assertEqual(details[2]['revert_sql'], 'DROP TABLE `b0002_0002`')
+        # names of details of other changesets do not conflict
+        other_details = generators.generate_changeset_details(
+            3, details=4, tables=3)
+        for detail, other_detail in zip(details, other_details):
+            self.assertNotEqual(detail['apply_sql'], other_detail['apply_sql'])
+        for detail in details:
+            self.assertEqual(len(sql_functions.split(detail['apply_sql'])), 1)
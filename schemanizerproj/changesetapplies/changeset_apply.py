@@ -2,9 +2,9 @@ import difflib
 import logging
 import string
 import MySQLdb
+from celery.exceptions import SoftTimeLimitExceeded
 from django.conf import settings
 from django.utils import timezone
-import sqlparse
 from changesets import models as changesets_models
 from schemaversions import models as schemaversions_models
 from utils import exceptions, mysql_functions
@@ -15,8 +15,13 @@ log = logging.getLogger(__name__)
 
 
 def apply_changeset(changeset, applied_by, server, message_callback=None,
-                    task_id='', request=None, unit_testing=False):
-    """Applies changeset to specified server."""
+                    task_id='', request=None, unit_testing=False,
+                    job_runner=None):
+    """Applies changeset to specified server.
+
+    If job_runner is given, the apply stops before the next changeset detail
+    when the job is cancelled.
+    """
 
     if not privileges_logic.can_user_apply_changeset(applied_by, changeset):
         raise exceptions.PrivilegeError(
@@ -33,7 +38,7 @@ def apply_changeset(changeset, applied_by, server, message_callback=None,
         changeset, applied_by, server,
         connection_options, message_callback,
         task_id=task_id, request=request,
-        unit_testing=unit_testing)
+        unit_testing=unit_testing, job_runner=job_runner)
     changeset_apply_obj.run()
 
     return changeset_apply_obj
@@ -45,7 +50,7 @@ class ChangesetApply(object):
     def __init__(
             self, changeset, applied_by, server, connection_options=None,
             message_callback=None, task_id=None, request=None,
-            unit_testing=False):
+            unit_testing=False, job_runner=None):
         """Initializes instance."""
 
         super(ChangesetApply, self).__init__()
@@ -68,6 +73,7 @@ class ChangesetApply(object):
         self.task_id = task_id
         self.request = request
         self.unit_testing = unit_testing
+        self.job_runner = job_runner
 
         self.messages = []
         self.has_errors = False
@@ -84,6 +90,11 @@ class ChangesetApply(object):
         if self.message_callback:
             self.message_callback(message, message_type, extra)
 
+    def checkpoint(self):
+        """Raises JobCancelledError if the apply was cancelled."""
+        if self.job_runner:
+            self.job_runner.checkpoint()
+
     def apply_changeset_detail(self, changeset_detail):
         has_errors = False
         results_logs = []
@@ -100,7 +111,7 @@ class ChangesetApply(object):
             #
             log.debug(
                 u'Executing apply_sql:\n%s', changeset_detail.apply_sql)
-            queries = sqlparse.split(changeset_detail.apply_sql)
+            queries = changeset_detail.get_statements('apply_sql')
             self.store_message(
                 u'apply_sql: %s' % (changeset_detail.apply_sql,))
             for query in queries:
@@ -141,6 +152,8 @@ class ChangesetApply(object):
     def apply_changeset_details(self):
         for changeset_detail in (
                 self.changeset.changesetdetail_set.all().order_by('id')):
+            # changeset details are not interrupted once started
+            self.checkpoint()
             ret = self.apply_changeset_detail(
                 changeset_detail)
             if ret['has_errors']:
@@ -150,8 +163,33 @@ class ChangesetApply(object):
             self.changeset_detail_apply_ids.append(
                 ret['changeset_detail_apply'].id)
 
+    def save_failed_apply(self, results_log):
+        """Records failed changeset apply."""
+        try:
+            changeset_action = changesets_models.ChangesetAction.objects.create(
+                changeset=self.changeset,
+                type=changesets_models.ChangesetAction.TYPE_APPLIED_FAILED,
+                timestamp=timezone.now())
+            changesets_models.ChangesetActionServerMap.objects.create(
+                changeset_action=changeset_action, server=self.server)
+            self.changeset_apply = models.ChangesetApply.objects.create(
+                changeset=self.changeset, server=self.server,
+                applied_at=timezone.now(), applied_by=self.applied_by,
+                results_log=results_log,
+                success=False,
+                changeset_action=changeset_action,
+                task_id=self.task_id)
+
+            if not self.unit_testing:
+                event_handlers.on_changeset_apply_failed(
+                    self.changeset_apply, request=self.request)
+        except:
+            log.exception('EXCEPTION')
+            pass
+
     def run(self):
         try:
+            self.checkpoint()
             if models.ChangesetApply.objects.filter(
                     changeset=self.changeset, server=self.server,
                     success=True).exists():
@@ -270,56 +308,18 @@ class ChangesetApply(object):
             extra = dict(delta=e.delta)
             self.store_message(msg, 'error', extra)
             self.has_errors = True
-
-            try:
-                changeset_action = changesets_models.ChangesetAction.objects.create(
-                    changeset=self.changeset,
-                    type=changesets_models.ChangesetAction.TYPE_APPLIED_FAILED,
-                    timestamp=timezone.now())
-                changesets_models.ChangesetActionServerMap.objects.create(
-                    changeset_action=changeset_action, server=self.server)
-                self.changeset_apply = models.ChangesetApply.objects.create(
-                    changeset=self.changeset, server=self.server,
-                    applied_at=timezone.now(), applied_by=self.applied_by,
-                    results_log=u'%s\nSchema delta:\n%s' % (msg, e.delta),
-                    success=False,
-                    changeset_action=changeset_action,
-                    task_id=self.task_id)
-
-                if not self.unit_testing:
-                    event_handlers.on_changeset_apply_failed(
-                        self.changeset_apply, request=self.request)
-            except:
-                log.exception('EXCEPTION')
-                pass
+            self.save_failed_apply(
+                u'%s\nSchema delta:\n%s' % (msg, e.delta))
 
         except Exception, e:
             msg = 'ERROR %s: %s' % (type(e), e)
             log.exception(msg)
             self.store_message(msg, 'error')
             self.has_errors = True
-
-            try:
-                changeset_action = changesets_models.ChangesetAction.objects.create(
-                    changeset=self.changeset,
-                    type=changesets_models.ChangesetAction.TYPE_APPLIED_FAILED,
-                    timestamp=timezone.now())
-                changesets_models.ChangesetActionServerMap.objects.create(
-                    changeset_action=changeset_action, server=self.server)
-                self.changeset_apply = models.ChangesetApply.objects.create(
-                    changeset=self.changeset, server=self.server,
-                    applied_at=timezone.now(), applied_by=self.applied_by,
-                    results_log=msg,
-                    success=False,
-                    changeset_action=changeset_action,
-                    task_id=self.task_id)
-
-                if not self.unit_testing:
-                    event_handlers.on_changeset_apply_failed(
-                        self.changeset_apply, request=self.request)
-            except:
-                log.exception('EXCEPTION')
-                pass
+            self.save_failed_apply(msg)
+            if isinstance(
+                    e, (exceptions.JobCancelledError, SoftTimeLimitExceeded)):
+                raise
 
 
 # TODO: remove this method when no longer needed
@@ -342,7 +342,7 @@ def test_apply(changeset_pk, server_pk):
         conn = MySQLdb.connect(**connection_options)
         cursor = conn.cursor()
         try:
-            queries = sqlparse.split(changeset_detail.apply_sql)
+            queries = changeset_detail.get_statements('apply_sql')
             for query in queries:
                 query = query.rstrip(string.whitespace + ';')
                 try:
@@ -1,7 +1,6 @@
 import logging
 from django.contrib import messages
-from django.utils import timezone
-from emails import tasks as emails_tasks
+from events import event_bus
 from events import models as events_models
 
 log = logging.getLogger(__name__)
@@ -13,19 +12,15 @@ def on_changeset_applied(changeset_apply, request=None):
         changeset_apply.server.pk,
         changeset_apply.server.name)
 
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_applied,
-        description=msg,
-        user=changeset_apply.applied_by)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_applied, msg,
+        changeset_apply.applied_by, changeset_apply_pk=changeset_apply.pk)
 
     if request:
         messages.success(request, msg)
 
     log.info(msg)
 
-    emails_tasks.send_mail_changeset_applied.delay(changeset_apply.pk)
-
 
 def on_changeset_apply_failed(changeset_apply, request=None):
 
@@ -34,11 +29,9 @@ def on_changeset_apply_failed(changeset_apply, request=None):
         changeset_apply.server.pk,
         changeset_apply.server.name)
 
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_apply_failed,
-        description=msg,
-        user=changeset_apply.applied_by)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_apply_failed, msg,
+        changeset_apply.applied_by, changeset_apply_pk=changeset_apply.pk)
 
     if request:
         messages.success(request, msg)
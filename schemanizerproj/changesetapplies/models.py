@@ -43,6 +43,8 @@ class ChangesetApply(models.Model):
     class Meta:
         db_table = 'changeset_applies'
         verbose_name_plural = 'changeset applies'
+        # successful applies of a changeset to a server
+        index_together = (('changeset', 'server', 'success'),)
 
     def __unicode__(self):
         return u'ChangesetApply [id=%s]' % self.pk
\ No newline at end of file
@@ -1,6 +1,9 @@
 import logging
 from celery import task, current_task, states
+from django.conf import settings
 from changesets import models as changesets_models
+from jobs import job_functions
+from jobs import models as jobs_models
 from users import models as users_models
 from servers import models as servers_models
 from . import changeset_apply
@@ -8,58 +11,52 @@ from . import changeset_apply
 log = logging.getLogger(__name__)
 
 
-@task(ignore_result=True)
+@task(
+    ignore_result=True,
+    soft_time_limit=settings.APPLY_TASK_SOFT_TIME_LIMIT,
+    time_limit=settings.APPLY_TASK_TIME_LIMIT)
 def apply_changeset(changeset_pk, applied_by_user_pk, server_pk):
-    """Applies changeset."""
-    try:
-
-        changeset = changesets_models.Changeset.objects.get(pk=changeset_pk)
-        applied_by = users_models.User.objects.get(pk=applied_by_user_pk)
-        server = servers_models.Server.objects.get(pk=server_pk)
-
-        messages = []
+    """Applies changeset.
 
-        current_task.update_state(
-            state=states.STARTED,
-            meta=dict(
+    Messages of the apply and the IDs of changeset detail applies are
+    recorded on its job.
+    """
+    try:
+        with job_functions.JobRunner(
+                current_task.request.id,
+                jobs_models.Job.TYPE_CHANGESET_APPLY,
                 changeset_id=changeset_pk,
-                user_id=applied_by_user_pk,
-                server_id=server_pk,
-                messages=messages
-            ))
+                server_id=server_pk) as job_runner:
+            changeset = changesets_models.Changeset.objects.get(
+                pk=changeset_pk)
+            applied_by = users_models.User.objects.get(pk=applied_by_user_pk)
+            server = servers_models.Server.objects.get(pk=server_pk)
+
+            changeset_apply_obj = changeset_apply.apply_changeset(
+                changeset, applied_by, server,
+                job_runner.add_message,
+                task_id=current_task.request.id,
+                job_runner=job_runner)
+            job_runner.set_result(
+                changeset_detail_apply_ids=
+                    changeset_apply_obj.changeset_detail_apply_ids)
 
-        def message_callback(message, message_type, extra=None):
-            messages.append(dict(
-                message=message,
-                message_type=message_type,
-                extra=extra))
-            current_task.update_state(
-                state=states.STARTED,
-                meta=dict(
-                    changeset_id=changeset_pk,
-                    user_id=applied_by_user_pk,
-                    server_id=server_pk,
-                    messages=messages))
+        if job_runner.job.state == states.REVOKED:
+            job_runner.add_message('Changeset apply job was cancelled.')
+        else:
+            job_runner.add_message('Changeset apply job completed.')
+    except:
+        log.exception('EXCEPTION')
+        raise
 
-        changeset_apply_obj = changeset_apply.apply_changeset(
-            changeset, applied_by, server,
-            message_callback,
-            task_id=current_task.request.id)
 
-        messages.append(dict(
-            message='Changeset apply job completed.',
-            message_type='info',
-            extra=None))
+def queue_apply_changeset(changeset_pk, applied_by_user_pk, server_pk):
+    """Queues apply_changeset task, returns its job."""
 
-        current_task.update_state(
-            state=states.STARTED,
-            meta=dict(
-                changeset_id=changeset_pk,
-                user_id=applied_by_user_pk,
-                server_id=server_pk,
-                messages=messages,
-                changeset_detail_apply_ids=
-                    changeset_apply_obj.changeset_detail_apply_ids))
-    except:
-        log.exception('EXCEPTION')
-        raise
\ No newline at end of file
+    return job_functions.queue_job(
+        apply_changeset, jobs_models.Job.TYPE_CHANGESET_APPLY,
+        kwargs=dict(
+            changeset_pk=changeset_pk,
+            applied_by_user_pk=applied_by_user_pk,
+            server_pk=server_pk),
+        changeset_id=changeset_pk, server_id=server_pk)
@@ -1,4 +1,5 @@
 import logging
+import socket
 
 from django.conf import settings
 from django.test import TestCase
@@ -264,3 +265,49 @@ class ChangesetApplyIncorrectInitialSchemaTestCase(TestCase):
         )
         changeset_apply_obj = changeset_apply_class_instance.changeset_apply
         self.assertTrue(not changeset_apply_obj.success)
+
+
+class TaskRoutingTestCase(TestCase):
+
+    def get_queue_name(self, task_name):
+        from celery import current_app
+        route = current_app.amqp.router.route({}, task_name)
+        return route['queue'].name
+
+    def test_routes(self):
+        self.assertEqual(
+            self.get_queue_name('changesetapplies.tasks.apply_changeset'),
+            'applies')
+        self.assertEqual(
+            self.get_queue_name('changesetreviews.tasks.review_changeset'),
+            'reviews')
+        self.assertEqual(
+            self.get_queue_name('emails.tasks.send_mail_changeset_applied'),
+            'emails')
+        self.assertEqual(
+            self.get_queue_name('schemanizer.tasks.testtask'),
+            settings.CELERY_DEFAULT_QUEUE)
+
+    def test_every_queue_has_worker(self):
+        worker_queues = set()
+        for worker in settings.CELERY_WORKERS:
+            worker_queues.update(worker['queues'])
+        self.assertEqual(
+            worker_queues, set(queue.name for queue in settings.CELERY_QUEUES))
+
+    def test_worker_command(self):
+        from schemanizer.management.commands import worker_commands
+        worker = dict(name='applies', queues=('applies',), autoscale=(4, 1))
+        command = worker_commands.get_worker_command(
+            worker, hostname='host01')
+        self.assertIn('-Q applies', command)
+        self.assertIn('-n applies.host01', command)
+        self.assertIn('--autoscale=4,1', command)
+        command = worker_commands.get_worker_command(worker)
+        self.assertIn('-n applies.%s' % (socket.gethostname(),), command)
+
+    def test_review_rate_limit(self):
+        self.assertEqual(
+            settings.CELERY_ANNOTATIONS[
+                'changesetreviews.tasks.review_changeset']['rate_limit'],
+            settings.REVIEW_RATE_LIMIT)
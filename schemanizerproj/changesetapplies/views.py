@@ -1,7 +1,6 @@
 import json
 import logging
 import urllib
-from celery.result import AsyncResult
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.urlresolvers import reverse
@@ -9,8 +8,9 @@ from django.http import HttpResponseForbidden, HttpResponse
 from django.shortcuts import render_to_response, redirect
 from django.template import RequestContext
 from django.template.loader import render_to_string
-from djcelery import models as djcelery_models, humanize as djcelery_humanize
+from djcelery import humanize as djcelery_humanize
 from changesets import models as changesets_models
+from jobs import models as jobs_models
 from servers import models as servers_models
 from users import models as users_models
 from utils import exceptions, helpers
@@ -133,9 +133,9 @@ def apply_changeset_to_multiple_hosts(request, changeset_pk,
 
                 task_ids = []
                 for server_id in server_ids:
-                    result = tasks.apply_changeset.delay(
+                    job = tasks.queue_apply_changeset(
                         changeset.id, user.id, server_id)
-                    task_ids.append(result.task_id)
+                    task_ids.append(job.task_id)
 
                 request_id = helpers.generate_request_id(request)
                 request.session[request_id] = task_ids
@@ -196,47 +196,42 @@ def ajax_changeset_applies(
         else:
             if request_id and request_id in request.session:
                 task_ids = request.session[request_id]
-        filter_kwargs = dict(name='changesetapplies.tasks.apply_changeset')
+        jobs = jobs_models.Job.objects.filter(
+            type=jobs_models.Job.TYPE_CHANGESET_APPLY)
         if task_ids:
-            filter_kwargs.update(dict(task_id__in=task_ids))
-        task_states = djcelery_models.TaskState.objects.filter(
-            **filter_kwargs)
-        task_state_list = []
-        for task_state in task_states:
-            ar = AsyncResult(task_state.task_id)
-            result = ar.result
-
-            if result and isinstance(result, dict) and 'message' in result:
-                show_message = True
-            else:
-                show_message = False
-
-            changeset_id = None
-            server = None
-            changeset_detail_applies = []
-            if result:
-                changeset_id = result.get('changeset_id')
-                server_id = result.get('server_id')
-                changeset_detail_apply_ids = result.get(
-                    'changeset_detail_apply_ids')
-                if server_id:
-                    server = servers_models.Server.objects.get(pk=server_id)
-                if changeset_detail_apply_ids:
-                    for id in changeset_detail_apply_ids:
-                        try:
-                            changeset_detail_applies.append(
-                                models.ChangesetDetailApply.objects.get(pk=id))
-                        except:
-                            pass
+            jobs = jobs.filter(task_id__in=task_ids)
+        jobs = list(
+            jobs.select_related('server__environment').order_by('-id'))
+
+        # changeset detail applies of all jobs are fetched with one query
+        job_results = {}
+        changeset_detail_apply_ids = []
+        for job in jobs:
+            job_results[job.pk] = job.get_result()
+            changeset_detail_apply_ids.extend(
+                job_results[job.pk].get('changeset_detail_apply_ids', []))
+        changeset_detail_applies_map = {}
+        if changeset_detail_apply_ids:
+            changeset_detail_applies_map = (
+                models.ChangesetDetailApply.objects.select_related(
+                    'environment', 'server').in_bulk(
+                        changeset_detail_apply_ids))
 
+        task_state_list = []
+        for job in jobs:
+            changeset_detail_applies = [
+                changeset_detail_applies_map[id] for id in
+                job_results[job.pk].get('changeset_detail_apply_ids', [])
+                if id in changeset_detail_applies_map]
             task_state_list.append(dict(
-                task_id=task_state.task_id,
-                tstamp=djcelery_humanize.naturaldate(task_state.tstamp),
-                state=task_state.state,
-                result=result,
-                show_message=show_message,
-                changeset_id=changeset_id,
-                server=server,
+                task_id=job.task_id,
+                tstamp=djcelery_humanize.naturaldate(
+                    job.started_at or job.created_at),
+                state=job.state,
+                result=dict(messages=job.get_messages()),
+                show_message=False,
+                changeset_id=job.changeset_id,
+                server=job.server,
                 changeset_detail_applies=changeset_detail_applies
             ))
 
@@ -1,7 +1,6 @@
 import logging
 from django.contrib import messages
-from django.utils import timezone
-from emails import tasks as emails_tasks
+from events import event_bus
 from events import models as events_models
 
 log = logging.getLogger(__name__)
@@ -16,17 +15,13 @@ def on_changeset_reviewed(changeset, request=None):
 
     msg = u'Changeset [id=%s] was reviewed.' % changeset.pk
 
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_reviewed,
-        description=msg,
-        user=user)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_reviewed, msg, user,
+        changeset_pk=changeset.pk)
 
     if request:
         messages.success(request, msg)
 
     log.info(msg)
 
-    emails_tasks.send_mail_changeset_reviewed.delay(changeset.pk)
-
 
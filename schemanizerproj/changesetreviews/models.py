@@ -1,5 +1,5 @@
 from django.db import models
-from utils import models as utils_models
+from utils import cache_functions, models as utils_models
 
 
 class ChangesetReview(utils_models.TimeStampedModel):
@@ -17,4 +17,7 @@ class ChangesetReview(utils_models.TimeStampedModel):
         db_table = 'changeset_reviews'
 
     def __unicode__(self):
-        return u'ChangesetReview [id=%s]' % self.pk
\ No newline at end of file
+        return u'ChangesetReview [id=%s]' % self.pk
+
+
+cache_functions.register_model(ChangesetReview, 'changeset_results')
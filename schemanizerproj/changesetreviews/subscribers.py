@@ -0,0 +1,14 @@
+"""Subscribers that start changeset reviews."""
+
+from events import event_bus
+from events import models as events_models
+from . import tasks
+
+
+@event_bus.subscriber(events_models.Event.TYPE.changeset_submitted)
+def on_changeset_submitted(event):
+    if event.data.get('notify', True):
+        tasks.queue_review_changeset(
+            changeset_pk=event.data['changeset_pk'],
+            schema_version_pk=event.data.get('schema_version_pk'),
+            reviewed_by_user_pk=event.user_id)
@@ -1,7 +1,9 @@
 import logging
-import functools
 from celery import task, states, current_task
+from django.conf import settings
 from changesets import models as changesets_models
+from jobs import job_functions
+from jobs import models as jobs_models
 from schemaversions import models as schemaversions_models
 from users import models as users_models
 from . import changeset_review
@@ -9,41 +11,59 @@ from . import changeset_review
 log = logging.getLogger(__name__)
 
 
-@task(ignore_result=True)
+@task(
+    ignore_result=True,
+    soft_time_limit=settings.REVIEW_TASK_SOFT_TIME_LIMIT,
+    time_limit=settings.REVIEW_TASK_TIME_LIMIT)
 def review_changeset(
         changeset_pk, schema_version_pk=None, reviewed_by_user_pk=None):
-    """Reviews changeset."""
+    """Reviews changeset.
+
+    Messages of the review are recorded on its job.
+    """
 
     try:
-        def message_callback(message, message_type, current_task):
-            current_task.update_state(
-                state=states.STARTED,
-                meta=dict(
-                    message=message,
-                    message_type=message_type))
-
-        message_callback = functools.partial(
-            message_callback, current_task=current_task)
-
-        changeset = changesets_models.Changeset.objects.get(pk=changeset_pk)
-        schema_version = None
-        if schema_version_pk:
-            schema_version = schemaversions_models.SchemaVersion.objects.get(
-                pk=schema_version_pk)
-        reviewed_by = None
-        if reviewed_by_user_pk:
-            reviewed_by = users_models.User.objects.get(pk=reviewed_by_user_pk)
-
-        changeset_review.review_changeset(
-            changeset, schema_version, reviewed_by,
-            message_callback=message_callback,
-            task_id=current_task.request.id)
-
-        current_task.update_state(
-            state=states.STARTED,
-            meta=dict(
-                message='Changeset review task completed.',
-                message_type='info'))
+        with job_functions.JobRunner(
+                current_task.request.id,
+                jobs_models.Job.TYPE_CHANGESET_REVIEW,
+                changeset_id=changeset_pk,
+                # only the latest message is shown by status views
+                max_messages=1) as job_runner:
+            changeset = changesets_models.Changeset.objects.get(
+                pk=changeset_pk)
+            schema_version = None
+            if schema_version_pk:
+                schema_version = (
+                    schemaversions_models.SchemaVersion.objects.get(
+                        pk=schema_version_pk))
+            reviewed_by = None
+            if reviewed_by_user_pk:
+                reviewed_by = users_models.User.objects.get(
+                    pk=reviewed_by_user_pk)
+
+            changeset_review.review_changeset(
+                changeset, schema_version, reviewed_by,
+                message_callback=job_runner.add_message,
+                task_id=current_task.request.id,
+                job_runner=job_runner)
+
+        if job_runner.job.state == states.REVOKED:
+            job_runner.add_message('Changeset review task was cancelled.')
+        else:
+            job_runner.add_message('Changeset review task completed.')
     except:
         log.exception('EXCEPTION')
-        raise
\ No newline at end of file
+        raise
+
+
+def queue_review_changeset(
+        changeset_pk, schema_version_pk=None, reviewed_by_user_pk=None):
+    """Queues review_changeset task, returns its job."""
+
+    return job_functions.queue_job(
+        review_changeset, jobs_models.Job.TYPE_CHANGESET_REVIEW,
+        kwargs=dict(
+            changeset_pk=changeset_pk,
+            schema_version_pk=schema_version_pk,
+            reviewed_by_user_pk=reviewed_by_user_pk),
+        changeset_id=changeset_pk)
@@ -1,7 +1,6 @@
 import json
 import logging
 from celery import states
-from celery.result import AsyncResult
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ObjectDoesNotExist
@@ -11,11 +10,11 @@ from django.template import RequestContext
 from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView, View
-from djcelery import models as djcelery_models, humanize as djcelery_humanize
-import yaml
+from djcelery import humanize as djcelery_humanize
 from changesets import models as changesets_models
 from changesettests import models as changesettests_models
 from changesetvalidations import models as changesetvalidations_models
+from jobs import models as jobs_models
 from schemaversions import models as schemaversions_models
 from users import models as users_models
 from utils import decorators, exceptions, helpers
@@ -120,41 +119,22 @@ class AjaxChangesetReviews(View):
             if not request.user.is_authenticated():
                 raise exceptions.Error('Login is required.')
 
-            task_states = djcelery_models.TaskState.objects.filter(
-                name='changesetreviews.tasks.review_changeset',
-                state__in=states.UNREADY_STATES)
+            jobs = jobs_models.Job.objects.filter(
+                type=jobs_models.Job.TYPE_CHANGESET_REVIEW,
+                state__in=states.UNREADY_STATES).order_by('-id')
             task_state_list = []
-            for task_state in task_states:
-                ar = AsyncResult(task_state.task_id)
-                result = ar.result
-                if result and isinstance(result, dict) and 'message' in result:
-                    show_message = True
-                else:
-                    show_message = False
-                kwargs_obj = {}
-                if task_state.kwargs:
-                    try:
-                        kwargs_obj = yaml.load(task_state.kwargs)
-                        if 'changeset_pk' in kwargs_obj:
-                            kwargs_obj['changeset_pk'] = long(kwargs_obj['changeset_pk'])
-                    except:
-                        pass
-                changeset_id = kwargs_obj.get('changeset_pk')
-                show_changeset_view_url = False
-                if changeset_id:
-                    show_changeset_view_url = (
-                        changesets_models.Changeset.objects.filter(
-                            pk=changeset_id).exists())
-
+            for job in jobs:
+                result = job.get_last_message()
                 task_state_list.append(dict(
-                    task_id=task_state.task_id,
-                    tstamp=djcelery_humanize.naturaldate(task_state.tstamp),
-                    state=task_state.state,
-                    params=task_state.kwargs,
+                    task_id=job.task_id,
+                    tstamp=djcelery_humanize.naturaldate(
+                        job.started_at or job.created_at),
+                    state=job.state,
                     result=result,
-                    show_message=show_message,
-                    changeset_id=changeset_id,
-                    show_changeset_view_url=show_changeset_view_url,
+                    show_message=result is not None,
+                    changeset_id=job.changeset_id,
+                    # changeset is set to NULL when it is deleted
+                    show_changeset_view_url=job.changeset_id is not None,
                 ))
 
             data['html'] = render_to_string(
@@ -209,7 +189,7 @@ def changeset_review(
                         changeset.review_version = schema_version
                         changeset.save()
 
-                        tasks.review_changeset.delay(
+                        tasks.queue_review_changeset(
                             changeset_pk=changeset.pk,
                             schema_version_pk=schema_version.pk,
                             reviewed_by_user_pk=user.pk)
@@ -11,6 +11,13 @@ from schemanizer.logic import privileges_logic
 
 log = logging.getLogger(__name__)
 
+# fields of changeset YAML documents that are saved
+CHANGESET_YAML_FIELDS = (
+    'database_schema', 'type', 'classification', 'submitted_by')
+CHANGESET_DETAIL_YAML_FIELDS = (
+    'description', 'apply_sql', 'revert_sql', 'apply_verification_sql',
+    'revert_verification_sql')
+
 
 def submit_changeset(
         from_form=True, changeset_form=None, changeset_detail_formset=None,
@@ -208,7 +215,8 @@ def update_changeset_yaml(yaml_obj, f, commit):
         if user_qs.exists():
             committer_user = user_qs[0]
 
-    qs = models.Changeset.objects.filter(repo_filename=repo_filename)
+    qs = models.filter_repo_filenames(
+        models.Changeset.objects.all(), [repo_filename])
     if not qs.exists():
         log.warn('Changeset does not exists.')
         return None
@@ -240,12 +248,8 @@ def update_changeset_yaml(yaml_obj, f, commit):
             changeset_detail_obj['changeset'] = changeset
             new_changeset_detail_obj = {}
             for k, v in changeset_detail_obj.iteritems():
-                if (k in
-                        [
-                            'description', 'apply_sql', 'revert_sql',
-                            'apply_verification_sql',
-                            'revert_verification_sql',
-                            'changeset']):
+                if (k in CHANGESET_DETAIL_YAML_FIELDS or
+                        k == 'changeset'):
                     new_changeset_detail_obj[k] = v
                 else:
                     log.warn(u'Ignored changeset detail field %s.' % (k,))
@@ -277,7 +281,8 @@ def save_changeset_yaml(yaml_obj, f, commit):
         if user_qs.exists():
             committer_user = user_qs[0]
 
-    if models.Changeset.objects.filter(repo_filename=repo_filename).exists():
+    if models.filter_repo_filenames(
+            models.Changeset.objects.all(), [repo_filename]).exists():
         log.warn('Changeset is already existing.')
         return
 
@@ -285,10 +290,7 @@ def save_changeset_yaml(yaml_obj, f, commit):
         changeset_obj = yaml_obj['changeset']
         new_changeset_obj = {}
         for k, v in changeset_obj.iteritems():
-            if (
-                    k in [
-                        'database_schema', 'type', 'classification',
-                        'submitted_by']):
+            if k in CHANGESET_YAML_FIELDS:
                 new_changeset_obj[k] = v
             else:
                 log.warn(u'Ignored changeset field %s.' % (k,))
@@ -312,12 +314,8 @@ def save_changeset_yaml(yaml_obj, f, commit):
             changeset_detail_obj['changeset'] = changeset
             new_changeset_detail_obj = {}
             for k, v in changeset_detail_obj.iteritems():
-                if (k in
-                        [
-                            'description', 'apply_sql', 'revert_sql',
-                            'apply_verification_sql',
-                            'revert_verification_sql',
-                            'changeset']):
+                if (k in CHANGESET_DETAIL_YAML_FIELDS or
+                        k == 'changeset'):
                     new_changeset_detail_obj[k] = v
                 else:
                     log.warn(u'Ignored changeset detail field %s.' % (k,))
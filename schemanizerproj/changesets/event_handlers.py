@@ -1,38 +1,28 @@
 import logging
 from django.contrib import messages
-from django.utils import timezone
-from emails import tasks as emails_tasks
+from events import event_bus
 from events import models as events_models
-from changesetreviews import tasks as changesetreviews_tasks
 
 log = logging.getLogger(__name__)
 
 
 def on_changeset_submit(changeset, request=None):
-    """Queues tasks for changeset submit event."""
+    """Records changeset submit event.
+
+    Subscribers send the email and start the changeset review.
+    """
     user = changeset.submitted_by
 
     msg = 'Changeset [id=%s] was submitted.' % changeset.pk
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_submitted,
-        description=msg,
-        user=user)
-
-    emails_tasks.send_mail_changeset_submitted.delay(changeset.pk)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_submitted, msg, user,
+        changeset_pk=changeset.pk,
+        schema_version_pk=changeset.review_version_id)
 
     if request:
         messages.success(request, msg)
     log.info(msg)
 
-    schema_version_pk = None
-    if changeset.review_version:
-        schema_version_pk = changeset.review_version.pk
-    changesetreviews_tasks.review_changeset.delay(
-        changeset_pk=changeset.pk,
-        schema_version_pk=schema_version_pk,
-        reviewed_by_user_pk=user.pk)
-
     if request:
         messages.info(
             request,
@@ -40,53 +30,60 @@ def on_changeset_submit(changeset, request=None):
             'emailed to interested parties once the process has completed.')
 
 
+def on_changesets_imported(changesets, review=True):
+    """Records submit events of imported changesets.
+
+    Events are inserted with a single query. If review is False, no
+    emails are sent and no reviews are started.
+    """
+
+    with event_bus.buffered():
+        for changeset in changesets:
+            event_bus.record(
+                events_models.Event.TYPE.changeset_submitted,
+                'Changeset [id=%s] was submitted.' % changeset.pk,
+                changeset.submitted_by,
+                changeset_pk=changeset.pk,
+                schema_version_pk=changeset.review_version_id,
+                notify=review)
+    log.info('%s changeset(s) were imported.' % len(changesets))
+
+
 def on_changeset_approved(changeset, request=None):
     msg = 'Changeset [id=%s] was approved.' % changeset.pk
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_approved,
-        description=msg,
-        user=changeset.approved_by)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_approved, msg,
+        changeset.approved_by, changeset_pk=changeset.pk)
 
     if request:
         messages.success(request, msg)
     log.info(msg)
 
-    emails_tasks.send_mail_changeset_approved.delay(changeset.pk)
-
 
 def on_changeset_updated(changeset, request=None):
     user = None
     if request:
         user = request.user.schemanizer_user
     msg = 'Changeset [id=%s] was updated.' % changeset.pk
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_updated,
-        description=msg,
-        user=user)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_updated, msg, user,
+        changeset_pk=changeset.pk)
 
     if request:
         messages.success(request, msg)
     log.info(msg)
 
-    emails_tasks.send_mail_changeset_updated.delay(changeset.pk)
-
 
 def on_changeset_rejected(changeset, request=None):
     msg = 'Changeset [id=%s] was rejected.' % changeset.pk
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_rejected,
-        description=msg,
-        user=changeset.approved_by)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_rejected, msg,
+        changeset.approved_by, changeset_pk=changeset.pk)
 
     if request:
         messages.success(request, msg)
     log.info(msg)
 
-    emails_tasks.send_mail_changeset_rejected.delay(changeset.pk)
-
 
 def on_changeset_soft_deleted(changeset, request=None):
     user = None
@@ -94,11 +91,9 @@ def on_changeset_soft_deleted(changeset, request=None):
         user = request.user.schemanizer_user
 
     msg = 'Changeset [id=%s] was soft deleted.' % changeset.pk
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.changeset_soft_deleted,
-        description=msg,
-        user=user)
+    event_bus.record(
+        events_models.Event.TYPE.changeset_soft_deleted, msg, user,
+        changeset_pk=changeset.pk)
 
     if request:
         messages.success(request, msg)
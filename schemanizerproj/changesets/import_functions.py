@@ -0,0 +1,252 @@
+"""Functions for importing changesets from YAML files in bulk."""
+
+import logging
+import os
+import posixpath
+import tarfile
+from django.db import transaction
+from django.utils import timezone
+import yaml
+from schemaversions import models as schemaversions_models
+from users import models as users_models
+from utils import cache_functions, exceptions
+from . import changeset_functions, event_handlers, models
+
+log = logging.getLogger(__name__)
+
+YAML_EXTENSIONS = ('.yaml', '.yml')
+BULK_CREATE_BATCH_SIZE = 500
+
+
+def _is_yaml_filename(filename):
+    return os.path.splitext(filename)[1].lower() in YAML_EXTENSIONS
+
+
+def _get_repo_filename(prefix, name):
+    while name.startswith('./'):
+        name = name[2:]
+    if prefix:
+        return posixpath.join(prefix, name)
+    return name
+
+
+def read_changeset_files(path, prefix=''):
+    """Returns (repo_filename, content) items of the YAML files of a
+    directory or tar file, sorted by repo_filename.
+
+    repo_filename is the path of the file relative to the directory or in
+    the tar file, joined to prefix.
+    """
+
+    files = []
+    if os.path.isdir(path):
+        for dirpath, dirnames, filenames in os.walk(path):
+            for filename in filenames:
+                if not _is_yaml_filename(filename):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                name = os.path.relpath(full_path, path).replace(os.sep, '/')
+                with open(full_path) as f:
+                    files.append((_get_repo_filename(prefix, name), f.read()))
+    elif os.path.isfile(path) and tarfile.is_tarfile(path):
+        tar = tarfile.open(path)
+        try:
+            for member in tar:
+                if not member.isfile() or not _is_yaml_filename(member.name):
+                    continue
+                files.append((
+                    _get_repo_filename(prefix, member.name),
+                    tar.extractfile(member).read()))
+        finally:
+            tar.close()
+    else:
+        raise exceptions.Error(
+            u'%s is not a directory or a tar file.' % (path,))
+    files.sort()
+    return files
+
+
+def _load_document(content):
+    """Returns (changeset_obj, changeset_detail_objs) of a YAML document."""
+
+    yaml_obj = yaml.load(content)
+    if (
+            not isinstance(yaml_obj, dict) or
+            not isinstance(yaml_obj.get('changeset'), dict) or
+            not isinstance(yaml_obj.get('changeset_details'), list) or
+            not all(
+                isinstance(changeset_detail_obj, dict)
+                for changeset_detail_obj in yaml_obj['changeset_details'])):
+        raise exceptions.Error('File format is invalid.')
+    return yaml_obj['changeset'], yaml_obj['changeset_details']
+
+
+def prepare_changesets(files, submitted_by=None):
+    """Returns unsaved changesets and their details from
+    (repo_filename, content) items.
+
+    All files are validated before anything is returned, lookups are done
+    with one query each. Files of changesets that already exist are
+    skipped. submitted_by is used for documents without a submitted_by
+    field.
+
+    Returns (changesets, changeset_details_map) where changeset_details_map
+    maps repo_filename to list of unsaved changeset details.
+    Raises ChangesetImportError listing the errors of all files.
+    """
+
+    errors = []
+    documents = []
+    seen_repo_filenames = set()
+    for repo_filename, content in files:
+        if repo_filename in seen_repo_filenames:
+            errors.append(u'%s: Duplicate file.' % (repo_filename,))
+            continue
+        seen_repo_filenames.add(repo_filename)
+        try:
+            changeset_obj, changeset_detail_objs = _load_document(content)
+        except Exception, e:
+            errors.append(u'%s: %s' % (repo_filename, e))
+            continue
+        documents.append((repo_filename, changeset_obj, changeset_detail_objs))
+
+    schema_names = set(
+        changeset_obj.get('database_schema')
+        for __, changeset_obj, __ in documents) - set([None])
+    database_schemas = dict(
+        (database_schema.name, database_schema) for database_schema in
+        schemaversions_models.DatabaseSchema.objects.filter(
+            name__in=schema_names))
+    user_names = set(
+        changeset_obj.get('submitted_by')
+        for __, changeset_obj, __ in documents) - set([None])
+    users = dict(
+        (user.name, user) for user in
+        users_models.User.objects.filter(name__in=user_names))
+    existing_repo_filenames = set(
+        models.filter_repo_filenames(
+            models.Changeset.objects.all(),
+            seen_repo_filenames).values_list(
+                'repo_filename', flat=True))
+    types = set(k for k, v in models.Changeset.TYPE_CHOICES)
+    classifications = set(
+        k for k, v in models.Changeset.CLASSIFICATION_CHOICES)
+
+    now = timezone.now()
+    changesets = []
+    changeset_details_map = {}
+    for repo_filename, changeset_obj, changeset_detail_objs in documents:
+        if repo_filename in existing_repo_filenames:
+            log.warn(u'Changeset of %s is already existing.' % (
+                repo_filename,))
+            continue
+
+        file_errors = []
+        for k in changeset_obj:
+            if k not in changeset_functions.CHANGESET_YAML_FIELDS:
+                log.warn(u'%s: Ignored changeset field %s.' % (
+                    repo_filename, k))
+        database_schema = database_schemas.get(
+            changeset_obj.get('database_schema'))
+        if database_schema is None:
+            file_errors.append(u'Database schema %s does not exist.' % (
+                changeset_obj.get('database_schema'),))
+        if 'submitted_by' in changeset_obj:
+            user = users.get(changeset_obj['submitted_by'])
+            if user is None:
+                file_errors.append(u'User %s does not exist.' % (
+                    changeset_obj['submitted_by'],))
+        else:
+            user = submitted_by
+            if user is None:
+                file_errors.append(u'submitted_by is missing.')
+        changeset_type = changeset_obj.get(
+            'type', models.Changeset.TYPE_CHOICES[0][0])
+        if changeset_type not in types:
+            file_errors.append(u'Invalid type %s.' % (changeset_type,))
+        classification = changeset_obj.get(
+            'classification', models.Changeset.CLASSIFICATION_CHOICES[0][0])
+        if classification not in classifications:
+            file_errors.append(u'Invalid classification %s.' % (
+                classification,))
+        if file_errors:
+            errors.extend(
+                u'%s: %s' % (repo_filename, error) for error in file_errors)
+            continue
+
+        changesets.append(models.Changeset(
+            database_schema=database_schema,
+            type=changeset_type,
+            classification=classification,
+            submitted_by=user,
+            submitted_at=now,
+            repo_filename=repo_filename,
+            repo_filename_hash=models.get_repo_filename_hash(repo_filename),
+            version_control_url=''))
+        changeset_details = []
+        for changeset_detail_obj in changeset_detail_objs:
+            new_changeset_detail_obj = {}
+            for k, v in changeset_detail_obj.iteritems():
+                if k in changeset_functions.CHANGESET_DETAIL_YAML_FIELDS:
+                    new_changeset_detail_obj[k] = v
+                else:
+                    log.warn(u'%s: Ignored changeset detail field %s.' % (
+                        repo_filename, k))
+            changeset_details.append(
+                models.ChangesetDetail(**new_changeset_detail_obj))
+        changeset_details_map[repo_filename] = changeset_details
+
+    if errors:
+        raise exceptions.ChangesetImportError(
+            u'%s file(s) could not be imported.' % (len(errors),), errors)
+    return changesets, changeset_details_map
+
+
+def import_changesets(files, submitted_by=None, review=True):
+    """Imports changesets from (repo_filename, content) items.
+
+    Nothing is imported if any of the files is invalid. Changesets, their
+    details and actions are inserted in bulk in a single transaction.
+    If review is False, no emails are sent and no reviews are started for
+    the imported changesets.
+
+    Returns list of imported changesets.
+    """
+
+    changesets, changeset_details_map = prepare_changesets(
+        files, submitted_by=submitted_by)
+    if not changesets:
+        return []
+
+    with transaction.commit_on_success():
+        models.Changeset.objects.bulk_create(
+            changesets, batch_size=BULK_CREATE_BATCH_SIZE)
+        # bulk_create() does not set primary keys, changesets are fetched
+        # again to get them
+        changesets = list(
+            models.filter_repo_filenames(
+                models.Changeset.objects.all(),
+                changeset_details_map.keys()).select_related(
+                    'submitted_by').order_by('repo_filename'))
+
+        now = timezone.now()
+        changeset_details = []
+        changeset_actions = []
+        for changeset in changesets:
+            for changeset_detail in changeset_details_map[
+                    changeset.repo_filename]:
+                changeset_detail.changeset = changeset
+                changeset_details.append(changeset_detail)
+            changeset_actions.append(models.ChangesetAction(
+                changeset=changeset,
+                type=models.ChangesetAction.TYPE_CREATED_WITH_DATA_FROM_GITHUB_REPO,
+                timestamp=now))
+        models.ChangesetDetail.objects.bulk_create(
+            changeset_details, batch_size=BULK_CREATE_BATCH_SIZE)
+        models.ChangesetAction.objects.bulk_create(
+            changeset_actions, batch_size=BULK_CREATE_BATCH_SIZE)
+
+    # bulk_create() does not send post_save signals
+    cache_functions.new_version('changesets')
+    event_handlers.on_changesets_imported(changesets, review=review)
+    return changesets
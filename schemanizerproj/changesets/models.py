@@ -1,8 +1,36 @@
+import json
 from django.db import models
-from utils import models as utils_models
+from utils import (
+    cache_functions, hash_functions, models as utils_models, sql_functions)
 from changesettests import models as changesettests_models
 
 
+def get_repo_filename_hash(repo_filename):
+    """Returns value of repo_filename_hash for repo_filename."""
+
+    if not repo_filename:
+        return ''
+    if isinstance(repo_filename, unicode):
+        repo_filename = repo_filename.encode('utf-8')
+    return hash_functions.generate_hash(repo_filename)
+
+
+def filter_repo_filenames(queryset, repo_filenames):
+    """Returns changesets of queryset whose repo_filename is one of
+    repo_filenames.
+
+    The changesets are looked up with the indexed repo_filename_hash column,
+    repo_filename is also compared since hashes may collide.
+    """
+
+    repo_filenames = list(repo_filenames)
+    return queryset.filter(
+        repo_filename_hash__in=[
+            get_repo_filename_hash(repo_filename)
+            for repo_filename in repo_filenames],
+        repo_filename__in=repo_filenames)
+
+
 class NotDeletedChangesetManager(models.Manager):
     def get_query_set(self):
         return super(NotDeletedChangesetManager, self).get_query_set().filter(
@@ -101,6 +129,10 @@ class Changeset(utils_models.TimeStampedModel):
         'schemaversions.SchemaVersion', db_column='after_version', null=True,
         blank=True, default=None, on_delete=models.SET_NULL, related_name='+')
     repo_filename = models.TextField(blank=True, default='')
+    # set on save, bulk_create() callers must set it, see
+    # get_repo_filename_hash()
+    repo_filename_hash = models.CharField(
+        max_length=32, blank=True, default='', db_index=True)
 
     objects = models.Manager()
     not_deleted_objects = NotDeletedChangesetManager()
@@ -112,6 +144,10 @@ class Changeset(utils_models.TimeStampedModel):
     def __unicode__(self):
         return u'Changeset [id=%s]' % self.pk
 
+    def save(self, *args, **kwargs):
+        self.repo_filename_hash = get_repo_filename_hash(self.repo_filename)
+        super(Changeset, self).save(*args, **kwargs)
+
     # def clean(self):
     #     from django.core.exceptions import ValidationError
     #     database_schema = None
@@ -141,6 +177,9 @@ class ChangesetDetail(utils_models.TimeStampedModel):
     apply_verification_sql = models.TextField(blank=True, default='')
     revert_verification_sql = models.TextField(blank=True, default='')
     volumetric_values = models.TextField(blank=True, default='')
+    # JSON object of SQL field names to their split statements and the hash
+    # of the SQL text they were split from, see get_statements()
+    split_statements = models.TextField(blank=True, default='')
 
     CHANGESET_TEST_STATUS_NONE = 0
     CHANGESET_TEST_STATUS_SUCCESS = 1
@@ -152,6 +191,32 @@ class ChangesetDetail(utils_models.TimeStampedModel):
     def __unicode__(self):
         return u'ChangesetDetail [id=%s]' % self.pk
 
+    def get_statements(self, field_name):
+        """Returns list of statements of a SQL field.
+
+        Split results are stored and reused for as long as the SQL text
+        of the field does not change.
+        """
+
+        sql = getattr(self, field_name)
+        sql_hash = sql_functions.sql_hash(sql)
+        try:
+            split_statements = json.loads(self.split_statements or '{}')
+        except ValueError:
+            split_statements = {}
+        entry = split_statements.get(field_name)
+        if entry and entry.get('hash') == sql_hash:
+            return entry['statements']
+
+        statements = list(sql_functions.split(sql))
+        split_statements[field_name] = dict(
+            hash=sql_hash, statements=statements)
+        self.split_statements = json.dumps(split_statements)
+        if self.pk:
+            ChangesetDetail.objects.filter(pk=self.pk).update(
+                split_statements=self.split_statements)
+        return statements
+
     def changeset_test_status(self):
         """Returns changeset test status."""
 
@@ -229,3 +294,42 @@ class ChangesetActionServerMap(models.Model):
 
     def __unicode__(self):
         return u'ChangesetActionServerMap [id=%s]' % self.pk
+
+
+class RepositoryCursor(utils_models.TimeStampedModel):
+    """Last commit processed by the changeset repository poller."""
+
+    repo_url = models.CharField(max_length=255)
+    path = models.CharField(max_length=255, blank=True, default='')
+    last_commit_sha = models.CharField(max_length=40, blank=True, default='')
+    last_commit_date = models.CharField(
+        max_length=32, blank=True, default='')
+    # ETag of the first page of the commit list
+    etag = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        db_table = 'repository_cursors'
+        unique_together = (('repo_url', 'path'),)
+
+    def __unicode__(self):
+        return u'RepositoryCursor [id=%s]' % self.pk
+
+
+class ProcessedRepoFile(utils_models.TimeStampedModel):
+    """Changeset file of a repository commit that has been processed."""
+
+    commit_sha = models.CharField(max_length=40)
+    filename = models.CharField(max_length=255)
+    changeset = models.ForeignKey(
+        Changeset, null=True, blank=True, default=None,
+        on_delete=models.SET_NULL)
+
+    class Meta:
+        db_table = 'processed_repo_files'
+        unique_together = (('commit_sha', 'filename'),)
+
+    def __unicode__(self):
+        return u'ProcessedRepoFile [id=%s]' % self.pk
+
+
+cache_functions.register_model(Changeset, 'changesets')
@@ -0,0 +1,412 @@
+"""Functions for processing changesets committed to the Github repository."""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from dateutil import parser, relativedelta
+import requests
+import yaml
+from emails import tasks as emails_tasks
+from utils import exceptions
+from . import changeset_functions, models
+
+log = logging.getLogger(__name__)
+
+
+def get_session():
+    """Returns session for Github API requests.
+
+    Connections are reused by all requests made with the session, including
+    requests made concurrently by map_concurrently().
+    """
+
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(
+        pool_maxsize=settings.GITHUB_REQUEST_THREADS))
+    if settings.AUTHORIZATION_TOKEN:
+        session.headers.update({
+            'Authorization': 'token %s' % (settings.AUTHORIZATION_TOKEN,)})
+    return session
+
+
+def map_concurrently(func, items):
+    """Returns list of func results for items, in the same order.
+
+    Items are processed in a pool of settings.GITHUB_REQUEST_THREADS
+    threads.
+    """
+
+    pool_size = min(len(items), settings.GITHUB_REQUEST_THREADS)
+    if pool_size <= 1:
+        return [func(item) for item in items]
+    pool = ThreadPool(pool_size)
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_commit_datetime(commit):
+    return parser.parse(commit['commit']['committer']['date'])
+
+
+def list_commits(session, cursor, path=None, since=None):
+    """Returns commits to process, oldest first.
+
+    Without since, only commits after the last processed commit of the
+    cursor are listed, and the first page is requested with the ETag saved
+    by the previous poll. None is returned if Github answers that the commit
+    list has not changed. With since, all commits after that date are
+    listed.
+    """
+
+    params = dict(per_page=settings.GITHUB_ITEMS_PER_PAGE)
+    if path:
+        params['path'] = path
+    use_cursor = since is None and cursor.last_commit_sha
+    headers = {}
+    if use_cursor:
+        if cursor.etag:
+            headers['If-None-Match'] = cursor.etag
+        last_commit_datetime = parser.parse(cursor.last_commit_date)
+    else:
+        params['since'] = since
+
+    r = session.get(
+        settings.CHANGESET_REPO_URL, params=params, headers=headers)
+    if r.status_code == 304:
+        log.debug('Commit list was not modified.')
+        return None
+    if r.status_code != 200:
+        raise exceptions.Error(
+            u'Unable to list commits, HTTP status code was %s.' % (
+                r.status_code,))
+    if use_cursor:
+        # the URL of the first page is the same for every poll
+        cursor.etag = r.headers.get('etag', '')
+
+    latest_to_oldest_commits = []
+    while True:
+        found_last_commit = False
+        for commit in json.loads(r.text):
+            if use_cursor and (
+                    commit['sha'] == cursor.last_commit_sha or
+                    get_commit_datetime(commit) < last_commit_datetime):
+                found_last_commit = True
+                break
+            latest_to_oldest_commits.append(commit)
+        next_url = r.links.get('next', {}).get('url')
+        if found_last_commit or not next_url:
+            break
+        log.debug(u'Processing next page of commits: %s' % (next_url,))
+        r = session.get(next_url)
+        if r.status_code != 200:
+            raise exceptions.Error(
+                u'Unable to list commits, HTTP status code was %s.' % (
+                    r.status_code,))
+    latest_to_oldest_commits.reverse()
+    return latest_to_oldest_commits
+
+
+def _get_json(session, url):
+    """Returns decoded JSON response, None if status code is not 200."""
+
+    r = session.get(url)
+    if r.status_code != 200:
+        log.error(u'Request for %s failed, HTTP status code was %s.' % (
+            url, r.status_code))
+        return None
+    return json.loads(r.text)
+
+
+def _get_files_to_fetch(files, reprocess=False):
+    """Returns (file, commit) items of files whose contents are needed to
+    save or update changesets.
+
+    Files processed before are skipped, unless reprocess is True.
+    """
+
+    filenames = set(f['filename'] for f, commit in files)
+    existing_repo_filenames = set(
+        models.filter_repo_filenames(
+            models.Changeset.objects.all(), filenames).values_list(
+                'repo_filename', flat=True))
+    processed_files = set()
+    if not reprocess:
+        processed_files = set(
+            models.ProcessedRepoFile.objects.filter(
+                commit_sha__in=set(commit['sha'] for f, commit in files),
+                filename__in=filenames).values_list(
+                    'commit_sha', 'filename'))
+    files_to_fetch = []
+    for f, commit in files:
+        if not reprocess and (
+                commit['sha'], f['filename']) in processed_files:
+            continue
+        if f['status'] == 'modified' or (
+                f['status'] == 'added' and
+                f['filename'] not in existing_repo_filenames):
+            files_to_fetch.append((f, commit))
+    return files_to_fetch
+
+
+def process_file(f, commit, contents, reprocess=False):
+    """Saves or updates changeset from a file of a commit.
+
+    contents is the decoded response for the contents_url of the file, or
+    None if the file is ignored or could not be fetched. A file is processed
+    only once for each commit, unless reprocess is True.
+    """
+
+    try:
+        filename = f['filename']
+        status = f['status']
+        log.debug(u'Filename: %s\nStatus: %s\nCommit Datetime: %s' % (
+            filename, status, commit['commit']['author']['date']))
+
+        repo_filename_exists = models.filter_repo_filenames(
+            models.Changeset.objects.all(), [filename]).exists()
+        if repo_filename_exists and status == 'modified':
+            save_func = changeset_functions.update_changeset_yaml
+        elif not repo_filename_exists and status in ('added', 'modified'):
+            save_func = changeset_functions.save_changeset_yaml
+        else:
+            log.debug(u'File %s was ignored.' % (filename,))
+            return None
+
+        processed_file, created = (
+            models.ProcessedRepoFile.objects.get_or_create(
+                commit_sha=commit['sha'], filename=filename))
+        if not created and not reprocess:
+            log.debug(u'File %s of commit %s was processed before.' % (
+                filename, commit['sha']))
+            return None
+        if contents is None:
+            log.error(u'Contents of %s are not available.' % (filename,))
+            if created:
+                # can be processed again later
+                processed_file.delete()
+            return None
+
+        content = None
+        try:
+            content = base64.b64decode(contents['content'])
+            yaml_obj = yaml.load(content)
+            if not isinstance(yaml_obj, dict):
+                raise exceptions.Error('File format is invalid.')
+            changeset = save_func(yaml_obj, f, commit)
+            if changeset:
+                log.info(u'Changeset [id=%s] was saved from %s.' % (
+                    changeset.id, filename))
+                processed_file.changeset = changeset
+                processed_file.save()
+            return changeset
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            log.exception(msg)
+            if not content:
+                content = ''
+            emails_tasks.send_changeset_submission_through_repo_failed_mail.delay(
+                content, msg, f, commit)
+
+    except Exception, e:
+        msg = 'ERROR %s: %s' % (type(e), e)
+        log.exception(msg)
+
+
+def fetch_contents(session, files, reprocess=False):
+    """Returns contents of files from (file, commit) items, keyed by commit
+    SHA and filename.
+
+    Only contents needed to save or update changesets are fetched, they are
+    fetched concurrently.
+    """
+
+    files_to_fetch = _get_files_to_fetch(files, reprocess=reprocess)
+    contents_list = map_concurrently(
+        lambda item: _get_json(session, item[0]['contents_url']),
+        files_to_fetch)
+    contents_map = {}
+    for (f, commit), contents in zip(files_to_fetch, contents_list):
+        contents_map[(commit['sha'], f['filename'])] = contents
+    return contents_map
+
+
+def process_files(files, contents_map, reprocess=False):
+    """Saves or updates changesets from (file, commit) items in order.
+
+    Returns list of saved changesets.
+    """
+
+    changesets = []
+    for f, commit in files:
+        changeset = process_file(
+            f, commit, contents_map.get((commit['sha'], f['filename'])),
+            reprocess=reprocess)
+        if changeset:
+            changesets.append(changeset)
+    return changesets
+
+
+def process_commits(session, commits, cursor=None, reprocess=False):
+    """Saves or updates changesets from commits, oldest first.
+
+    Commit details and file contents are fetched concurrently, changesets
+    are then saved in commit order. The cursor is saved after each commit.
+    Files processed before are processed again if reprocess is True.
+    Returns list of saved changesets.
+    """
+
+    commit_details = map_concurrently(
+        lambda commit: _get_json(session, commit['url']), commits)
+    for commit, commit_detail in zip(commits, commit_details):
+        if commit_detail is None:
+            raise exceptions.Error(
+                u'Unable to get commit %s.' % (commit['sha'],))
+
+    contents_map = fetch_contents(session, [
+        (f, commit) for commit in commit_details for f in commit['files']],
+        reprocess=reprocess)
+    changesets = []
+    for commit in commit_details:
+        changesets.extend(process_files(
+            [(f, commit) for f in commit['files']], contents_map,
+            reprocess=reprocess))
+        if cursor is not None:
+            cursor.last_commit_sha = commit['sha']
+            cursor.last_commit_date = commit['commit']['committer']['date']
+            cursor.save()
+    return changesets
+
+
+def poll_repository(since=None, path=None):
+    """Processes commits to the changeset repository since the last poll.
+
+    since is used when no commit has been processed yet, or to process
+    commits again; files of commits after since are processed again even if
+    they were processed before.
+    Returns list of saved changesets.
+    """
+
+    reprocess = since is not None
+    cursor, __ = models.RepositoryCursor.objects.get_or_create(
+        repo_url=settings.CHANGESET_REPO_URL, path=path or '')
+    session = get_session()
+    if since is None and not cursor.last_commit_sha:
+        since = (timezone.now() - relativedelta.relativedelta(
+            hours=settings.CHANGESET_CHECK_HOUR_OFFSET)).isoformat()
+    etag = cursor.etag
+    commits = list_commits(session, cursor, path=path, since=since)
+    if commits is None:
+        return []
+    new_etag = cursor.etag
+    # the ETag is saved only after all commits have been processed
+    cursor.etag = etag
+    changesets = process_commits(
+        session, commits, cursor=cursor, reprocess=reprocess)
+    cursor.etag = new_etag
+    cursor.save()
+    return changesets
+
+
+def is_valid_signature(body, signature):
+    """Returns True if signature is the X-Hub-Signature header value for
+    the request body and settings.GITHUB_WEBHOOK_SECRET."""
+
+    if not settings.GITHUB_WEBHOOK_SECRET or not signature:
+        return False
+    digest = hmac.new(
+        settings.GITHUB_WEBHOOK_SECRET, body, hashlib.sha1).hexdigest()
+    return constant_time_compare('sha1=%s' % (digest,), signature)
+
+
+def is_changeset_filename(filename):
+    """Returns True if file is in the changeset directory of the
+    repository."""
+
+    if not settings.CHANGESET_PATH:
+        return True
+    return filename.startswith(settings.CHANGESET_PATH.strip('/') + '/')
+
+
+def get_push_files(payload):
+    """Returns (file, commit) items for changeset files added or modified by
+    the commits of a Github push event payload, oldest commit first.
+
+    Only pushes to the default branch are processed. Files and commits have
+    the fields of Github commit API responses that are used to save
+    changesets.
+    """
+
+    repository = payload['repository']
+    default_branch = repository.get(
+        'default_branch', repository.get('master_branch'))
+    if default_branch and (
+            payload.get('ref') != 'refs/heads/%s' % (default_branch,)):
+        log.debug(u'Ignored push to %s.' % (payload.get('ref'),))
+        return []
+
+    repo_api_url = settings.CHANGESET_REPO_URL
+    if repo_api_url.endswith('/commits'):
+        repo_api_url = repo_api_url[:-len('/commits')]
+    html_url = repository.get('html_url', repository.get('url'))
+
+    files = []
+    for push_commit in payload.get('commits', []):
+        sha = push_commit['id']
+        commit = {
+            'sha': sha,
+            'commit': {
+                'author': {'date': push_commit['timestamp']},
+                'committer': {'date': push_commit['timestamp']}}}
+        username = push_commit.get('committer', {}).get('username')
+        if username:
+            commit['committer'] = {'login': username}
+        for status in ('added', 'modified'):
+            for filename in push_commit.get(status, []):
+                if not is_changeset_filename(filename):
+                    continue
+                f = {
+                    'filename': filename,
+                    'status': status,
+                    'blob_url': '%s/blob/%s/%s' % (html_url, sha, filename),
+                    'contents_url': '%s/contents/%s?ref=%s' % (
+                        repo_api_url, filename, sha)}
+                files.append((f, commit))
+    return files
+
+
+def is_truncated_push(payload):
+    """Returns True if a Github push event payload lists fewer commits than
+    were pushed.
+
+    Payloads list at most 20 commits, size is the number of pushed commits.
+    """
+
+    return payload.get('size', 0) > len(payload.get('commits', []))
+
+
+def process_push(payload, session=None):
+    """Saves or updates changesets from files of a Github push event.
+
+    If the payload does not list all pushed commits, the repository is
+    polled instead.
+    Returns list of saved changesets.
+    """
+
+    if is_truncated_push(payload):
+        log.info(
+            u'Push of %s commits lists %s commits, polling repository.' % (
+                payload['size'], len(payload.get('commits', []))))
+        return poll_repository(path=settings.CHANGESET_PATH)
+    if session is None:
+        session = get_session()
+    files = get_push_files(payload)
+    return process_files(files, fetch_contents(session, files))
@@ -0,0 +1,15 @@
+import logging
+from celery import task
+from . import repository_functions
+
+log = logging.getLogger(__name__)
+
+
+@task(ignore_result=True)
+def process_repository_push(payload):
+    """Saves or updates changesets from files of a Github push event."""
+    try:
+        repository_functions.process_push(payload)
+    except:
+        log.exception('EXCEPTION')
+        raise
@@ -1,14 +1,33 @@
+import hashlib
+import hmac
+import json
 import logging
+import os
+import shutil
+import tarfile
+import tempfile
 
+from celery import states
 from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone, unittest
 
 import MySQLdb
+from djcelery import models as djcelery_models
 
+from changesetapplies import models as changesetapplies_models
 from users import models as users_models
 from schemaversions import schema_functions
+from schemaversions import models as schemaversions_models
 from servers import models as servers_models
-from . import changeset_functions, models
+from events import models as events_models
+from utils import cache_functions, exceptions
+from . import (
+    changeset_functions, import_functions, models, repository_functions,
+    tasks)
 
 log = logging.getLogger(__name__)
 
@@ -96,4 +115,633 @@ class SubmitChangesetTestCase(TestCase):
         self.assertTrue(changeset_actions.exists())
         changeset_action = changeset_actions[0]
         self.assertEqual(
-            changeset_action.type, models.ChangesetAction.TYPE_CREATED)
\ No newline at end of file
+            changeset_action.type, models.ChangesetAction.TYPE_CREATED)
+
+class ChangesetDetailStatementsTestCase(TestCase):
+
+    def setUp(self):
+        database_schema = schemaversions_models.DatabaseSchema.objects.create(
+            name='test_changeset_detail_statements')
+        changeset = models.Changeset.objects.create(
+            database_schema=database_schema,
+            type=models.Changeset.DDL_TABLE_CREATE,
+            classification=models.Changeset.CLASSIFICATION_PAINLESS,
+        )
+        self.changeset_detail = models.ChangesetDetail.objects.create(
+            changeset=changeset,
+            description='create tables',
+            apply_sql='create table t01 (id int); create table t02 (id int)',
+            revert_sql='drop table t02; drop table t01'
+        )
+
+    def test_get_statements(self):
+        statements = self.changeset_detail.get_statements('apply_sql')
+        self.assertEqual(
+            statements,
+            ['create table t01 (id int);', 'create table t02 (id int)'])
+
+        # split results are stored
+        changeset_detail = models.ChangesetDetail.objects.get(
+            pk=self.changeset_detail.pk)
+        self.assertTrue(changeset_detail.split_statements)
+        self.assertEqual(
+            changeset_detail.get_statements('apply_sql'), statements)
+
+    def test_get_statements_after_sql_changed(self):
+        self.changeset_detail.get_statements('apply_sql')
+        self.changeset_detail.apply_sql = 'create table t03 (id int)'
+        self.changeset_detail.save()
+        changeset_detail = models.ChangesetDetail.objects.get(
+            pk=self.changeset_detail.pk)
+        self.assertEqual(
+            changeset_detail.get_statements('apply_sql'),
+            ['create table t03 (id int)'])
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, data=None, headers=None, links=None):
+        self.status_code = status_code
+        self.text = json.dumps(data)
+        self.headers = headers or {}
+        self.links = links or {}
+
+
+class FakeSession(object):
+    """Returns recorded responses for URLs and keeps requests made."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, params=None, headers=None):
+        self.requests.append((url, params, headers))
+        return self.responses[url]
+
+
+def fake_commit(sha, date, files=None):
+    return {
+        'sha': sha,
+        'url': 'https://api.github.com/commits/%s' % (sha,),
+        'commit': {
+            'author': {'date': date},
+            'committer': {'date': date}},
+        'files': files or []}
+
+
+class RepositoryPollingTestCase(TestCase):
+
+    repo_url = 'https://api.github.com/repos/owner/repo/commits'
+
+    def setUp(self):
+        self.cursor = models.RepositoryCursor.objects.create(
+            repo_url=self.repo_url)
+        self.commits = [
+            fake_commit('c%s' % (i,), '2013-07-0%sT00:00:00Z' % (i,))
+            for i in range(1, 5)]
+
+    def test_list_commits_since(self):
+        session = FakeSession({
+            self.repo_url: FakeResponse(
+                200, self.commits[:1:-1],
+                links={'next': {'url': 'page2'}}),
+            'page2': FakeResponse(200, self.commits[1::-1])})
+        with self.settings(CHANGESET_REPO_URL=self.repo_url):
+            commits = repository_functions.list_commits(
+                session, self.cursor, since='2013-07-01T00:00:00Z')
+        self.assertEqual(commits, self.commits)
+        self.assertEqual(len(session.requests), 2)
+        self.assertEqual(self.cursor.etag, '')
+
+    def test_list_commits_after_cursor(self):
+        self.cursor.last_commit_sha = 'c2'
+        self.cursor.last_commit_date = '2013-07-02T00:00:00Z'
+        self.cursor.etag = '"1"'
+        session = FakeSession({
+            self.repo_url: FakeResponse(
+                200, self.commits[::-1], headers={'etag': '"2"'},
+                links={'next': {'url': 'page2'}})})
+        with self.settings(CHANGESET_REPO_URL=self.repo_url):
+            commits = repository_functions.list_commits(session, self.cursor)
+        self.assertEqual(commits, self.commits[2:])
+        self.assertEqual(len(session.requests), 1)
+        self.assertEqual(session.requests[0][2], {'If-None-Match': '"1"'})
+        self.assertFalse('since' in session.requests[0][1])
+        self.assertEqual(self.cursor.etag, '"2"')
+
+    def test_list_commits_not_modified(self):
+        self.cursor.last_commit_sha = 'c4'
+        self.cursor.last_commit_date = '2013-07-04T00:00:00Z'
+        self.cursor.etag = '"1"'
+        session = FakeSession({self.repo_url: FakeResponse(304)})
+        with self.settings(CHANGESET_REPO_URL=self.repo_url):
+            commits = repository_functions.list_commits(session, self.cursor)
+        self.assertTrue(commits is None)
+        self.assertEqual(len(session.requests), 1)
+
+    def test_process_commits_saves_cursor(self):
+        commits = [
+            fake_commit('c5', '2013-07-05T00:00:00Z', files=[{
+                'sha': 'f1', 'filename': 'changesets/removed.yaml',
+                'status': 'removed',
+                'contents_url': 'contents/removed.yaml'}])]
+        session = FakeSession(dict(
+            (commit['url'], FakeResponse(200, commit))
+            for commit in commits))
+        changesets = repository_functions.process_commits(
+            session, commits, cursor=self.cursor)
+        self.assertEqual(changesets, [])
+        # removed files are not fetched
+        self.assertEqual(len(session.requests), 1)
+        cursor = models.RepositoryCursor.objects.get(pk=self.cursor.pk)
+        self.assertEqual(cursor.last_commit_sha, 'c5')
+        self.assertEqual(cursor.last_commit_date, '2013-07-05T00:00:00Z')
+
+
+def load_payload(name):
+    path = os.path.join(
+        os.path.dirname(__file__), 'test_payloads', '%s.json' % (name,))
+    with open(path) as f:
+        return f.read()
+
+
+class RepositoryPushTestCase(TestCase):
+
+    repo_url = 'https://api.github.com/repos/owner/changesets/commits'
+
+    def setUp(self):
+        self.payload = json.loads(load_payload('push'))
+
+    def get_push_files(self, payload):
+        with self.settings(
+                CHANGESET_REPO_URL=self.repo_url,
+                CHANGESET_PATH='changesets'):
+            return repository_functions.get_push_files(payload)
+
+    def test_get_push_files(self):
+        files = self.get_push_files(self.payload)
+        self.assertEqual(
+            [(f['filename'], f['status'], commit['sha'][:7])
+                for f, commit in files],
+            [
+                ('changesets/t01.yaml', 'added', '1b2c3d4'),
+                ('changesets/t01.yaml', 'modified', '2c1f3e5'),
+            ])
+        f, commit = files[0]
+        self.assertEqual(
+            f['contents_url'],
+            'https://api.github.com/repos/owner/changesets/contents/'
+            'changesets/t01.yaml?ref=%s' % (commit['sha'],))
+        self.assertEqual(
+            f['blob_url'],
+            'https://github.com/owner/changesets/blob/%s/'
+            'changesets/t01.yaml' % (commit['sha'],))
+        self.assertEqual(commit['committer'], {'login': 'dev01'})
+        self.assertFalse('committer' in files[1][1])
+
+    def test_push_to_other_branch_ignored(self):
+        self.assertEqual(
+            self.get_push_files(json.loads(load_payload('push_branch'))), [])
+
+    def test_processed_files_skipped(self):
+        for f, commit in self.get_push_files(self.payload):
+            models.ProcessedRepoFile.objects.create(
+                commit_sha=commit['sha'], filename=f['filename'])
+        session = FakeSession({})
+        with self.settings(
+                CHANGESET_REPO_URL=self.repo_url,
+                CHANGESET_PATH='changesets'):
+            changesets = repository_functions.process_push(
+                self.payload, session=session)
+        self.assertEqual(changesets, [])
+        self.assertEqual(session.requests, [])
+
+    def test_processed_files_fetched_when_reprocessing(self):
+        files = self.get_push_files(self.payload)
+        for f, commit in files:
+            models.ProcessedRepoFile.objects.create(
+                commit_sha=commit['sha'], filename=f['filename'])
+        session = FakeSession(dict(
+            (f['contents_url'], FakeResponse(404)) for f, commit in files))
+        repository_functions.fetch_contents(session, files, reprocess=True)
+        self.assertEqual(
+            [url for url, params, headers in session.requests],
+            [f['contents_url'] for f, commit in files])
+
+    def test_truncated_push_polls_repository(self):
+        self.payload['size'] = 21
+        polls = []
+        poll_repository = repository_functions.poll_repository
+        repository_functions.poll_repository = (
+            lambda **kwargs: polls.append(kwargs) or [])
+        try:
+            session = FakeSession({})
+            with self.settings(
+                    CHANGESET_REPO_URL=self.repo_url,
+                    CHANGESET_PATH='changesets'):
+                changesets = repository_functions.process_push(
+                    self.payload, session=session)
+        finally:
+            repository_functions.poll_repository = poll_repository
+        self.assertEqual(changesets, [])
+        self.assertEqual(polls, [{'path': 'changesets'}])
+        self.assertEqual(session.requests, [])
+
+
+class RepositoryWebhookTestCase(TestCase):
+
+    secret = 'webhook secret'
+
+    def setUp(self):
+        self.queued_payloads = []
+        self.process_repository_push = tasks.process_repository_push
+        test_case = self
+
+        class TaskStub(object):
+            def delay(self, payload):
+                test_case.queued_payloads.append(payload)
+
+        tasks.process_repository_push = TaskStub()
+
+    def tearDown(self):
+        tasks.process_repository_push = self.process_repository_push
+
+    def post(self, body, event='push', signature=None):
+        if signature is None:
+            signature = 'sha1=%s' % (
+                hmac.new(self.secret, body, hashlib.sha1).hexdigest(),)
+        with self.settings(GITHUB_WEBHOOK_SECRET=self.secret):
+            return self.client.post(
+                reverse('changesets_repository_webhook'), body,
+                content_type='application/json',
+                HTTP_X_GITHUB_EVENT=event,
+                HTTP_X_HUB_SIGNATURE=signature)
+
+    def test_push_queued(self):
+        body = load_payload('push')
+        response = self.post(body)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.queued_payloads, [json.loads(body)])
+
+    def test_invalid_signature(self):
+        response = self.post(load_payload('push'), signature='sha1=0')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.queued_payloads, [])
+
+    def test_other_event_ignored(self):
+        response = self.post('{"zen": "Keep it logically awesome."}', 'ping')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.queued_payloads, [])
+
+
+CHANGESET_YAML = """
+changeset:
+    database_schema: %(database_schema)s
+    type: 'DDL:Table:Create'
+    classification: painless
+    submitted_by: %(submitted_by)s
+
+changeset_details:
+    - description: create table %(table)s
+      apply_sql: "create table %(table)s (id int)"
+      revert_sql: "drop table %(table)s"
+"""
+
+
+class ChangesetImportTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        self.database_schema = (
+            schemaversions_models.DatabaseSchema.objects.create(
+                name='test_changeset_import'))
+        self.user_dev01 = users_models.User.objects.get(name='dev01')
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_content(self, table, database_schema=None, submitted_by='dev01'):
+        return CHANGESET_YAML % dict(
+            database_schema=database_schema or self.database_schema.name,
+            submitted_by=submitted_by, table=table)
+
+    def write_files(self, files):
+        for name, content in files:
+            path = os.path.join(self.temp_dir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(content)
+
+    def test_read_changeset_files(self):
+        self.write_files([
+            ('t02.yaml', self.get_content('t02')),
+            ('sub/t01.yml', self.get_content('t01')),
+            ('README.md', 'readme')])
+        files = import_functions.read_changeset_files(
+            self.temp_dir, prefix='changesets')
+        self.assertEqual(
+            [repo_filename for repo_filename, content in files],
+            ['changesets/sub/t01.yml', 'changesets/t02.yaml'])
+
+        tar_path = os.path.join(self.temp_dir, 'changesets.tar.gz')
+        tar = tarfile.open(tar_path, 'w:gz')
+        tar.add(os.path.join(self.temp_dir, 'sub'), arcname='./sub')
+        tar.close()
+        self.assertEqual(
+            import_functions.read_changeset_files(tar_path),
+            [('sub/t01.yml', self.get_content('t01'))])
+
+    def test_import_changesets(self):
+        files = [
+            ('changesets/t%02d.yaml' % (i,), self.get_content('t%02d' % (i,)))
+            for i in range(3)]
+        version = cache_functions.get_version('changesets')
+        changesets = import_functions.import_changesets(files, review=False)
+        self.assertNotEqual(cache_functions.get_version('changesets'), version)
+
+        self.assertEqual(
+            [changeset.repo_filename for changeset in changesets],
+            [repo_filename for repo_filename, content in files])
+        for changeset in changesets:
+            self.assertEqual(changeset.database_schema, self.database_schema)
+            self.assertEqual(changeset.submitted_by, self.user_dev01)
+            changeset_details = models.ChangesetDetail.objects.filter(
+                changeset=changeset)
+            self.assertEqual(changeset_details.count(), 1)
+            table = os.path.splitext(
+                os.path.basename(changeset.repo_filename))[0]
+            self.assertEqual(
+                changeset_details[0].apply_sql,
+                'create table %s (id int)' % (table,))
+            self.assertEqual(
+                models.ChangesetAction.objects.get(changeset=changeset).type,
+                models.ChangesetAction.TYPE_CREATED_WITH_DATA_FROM_GITHUB_REPO)
+        self.assertEqual(
+            events_models.Event.objects.filter(
+                type=events_models.Event.TYPE.changeset_submitted).count(),
+            3)
+
+        # files of existing changesets are skipped
+        self.assertEqual(
+            import_functions.import_changesets(files, review=False), [])
+        self.assertEqual(models.Changeset.objects.count(), 3)
+
+    def test_invalid_files_not_imported(self):
+        files = [
+            ('t00.yaml', self.get_content('t00')),
+            ('t01.yaml', self.get_content('t01', database_schema='unknown')),
+            ('t02.yaml', self.get_content('t02', submitted_by='unknown')),
+            ('t03.yaml', '- not a changeset'),
+        ]
+        with self.assertRaises(exceptions.ChangesetImportError) as cm:
+            import_functions.import_changesets(files, review=False)
+        self.assertEqual(
+            [error.split(':')[0] for error in cm.exception.errors],
+            ['t03.yaml', 't01.yaml', 't02.yaml'])
+        self.assertFalse(models.Changeset.objects.exists())
+
+
+class ChangesetListCachingTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        self.database_schema = (
+            schemaversions_models.DatabaseSchema.objects.create(
+                name='test_changeset_list_caching'))
+        self.client.login(username='dba01', password='dba')
+
+    def create_changeset(self):
+        return models.Changeset.objects.create(
+            database_schema=self.database_schema,
+            type=models.Changeset.DDL_TABLE_CREATE,
+            classification=models.Changeset.CLASSIFICATION_PAINLESS,
+            review_status=models.Changeset.REVIEW_STATUS_NEEDS)
+
+    def test_cached_list_invalidated_on_save(self):
+        url = reverse('changesets_changeset_list')
+        changeset = self.create_changeset()
+        response = self.client.get(url)
+        self.assertContains(
+            response, reverse('changesets_changeset_view', args=[changeset.pk]))
+
+        # the list is not rebuilt while no changeset changes
+        models.Changeset.objects.filter(pk=changeset.pk).update(
+            review_status=models.Changeset.REVIEW_STATUS_REJECTED)
+        response = self.client.get(url)
+        self.assertNotContains(
+            response, models.Changeset.REVIEW_STATUS_REJECTED)
+
+        other_changeset = self.create_changeset()
+        response = self.client.get(url)
+        self.assertContains(
+            response,
+            reverse('changesets_changeset_view', args=[other_changeset.pk]))
+        self.assertContains(response, models.Changeset.REVIEW_STATUS_REJECTED)
+
+
+class ChangesetListPaginationTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        self.database_schema = (
+            schemaversions_models.DatabaseSchema.objects.create(
+                name='test_changeset_list_pagination'))
+        self.changesets = [
+            models.Changeset.objects.create(
+                database_schema=self.database_schema,
+                type=models.Changeset.DDL_TABLE_CREATE,
+                classification=models.Changeset.CLASSIFICATION_PAINLESS,
+                review_status=review_status)
+            for review_status in (
+                models.Changeset.REVIEW_STATUS_NEEDS,
+                models.Changeset.REVIEW_STATUS_APPROVED,
+                models.Changeset.REVIEW_STATUS_NEEDS,
+                models.Changeset.REVIEW_STATUS_REJECTED,
+                models.Changeset.REVIEW_STATUS_NEEDS)]
+        self.client.login(username='dba01', password='dba')
+        self.url = reverse('changesets_changeset_list')
+
+    def get_pks(self, query_string):
+        """Returns IDs of changesets on all pages, starting at the page of
+        query_string."""
+
+        pks = []
+        while query_string:
+            response = self.client.get('%s?%s' % (self.url, query_string))
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page']
+            pks.extend(changeset.pk for changeset in page)
+            query_string = None
+            if page.next_cursor:
+                query_string = (
+                    response.context['view'].get_next_page_query_string())
+        return pks
+
+    @override_settings(LIST_PAGE_SIZE=2)
+    def test_pages(self):
+        pks = [changeset.pk for changeset in self.changesets]
+        self.assertEqual(
+            self.get_pks(
+                'database_schema_id=%s' % (self.database_schema.pk,)),
+            sorted(pks, reverse=True))
+        self.assertEqual(
+            self.get_pks(
+                'database_schema_id=%s&sort=oldest' % (
+                    self.database_schema.pk,)),
+            sorted(pks))
+
+    @override_settings(LIST_PAGE_SIZE=2)
+    def test_filter(self):
+        pks = [
+            changeset.pk for changeset in self.changesets
+            if changeset.review_status == models.Changeset.REVIEW_STATUS_NEEDS]
+        self.assertEqual(
+            self.get_pks(
+                'database_schema_id=%s&review_status=%s' % (
+                    self.database_schema.pk,
+                    models.Changeset.REVIEW_STATUS_NEEDS)),
+            sorted(pks, reverse=True))
+
+    def test_invalid_parameters(self):
+        response = self.client.get(
+            self.url, dict(cursor='invalid', database_schema_id='invalid'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page'].cursor)
+        self.assertEqual(response.context['view'].filters, [])
+        self.assertEqual(len(list(response.context['messages'])), 2)
+
+
+@unittest.skipUnless(
+    connection.vendor == 'mysql', 'Query plans are checked on MySQL only.')
+class QueryPlanTestCase(TestCase):
+    """Checks that hot lookups use the expected indexes on a seeded
+    dataset."""
+
+    def setUp(self):
+        now = timezone.now()
+        database_schemas = [
+            schemaversions_models.DatabaseSchema.objects.create(
+                name='test_query_plan_%s' % (i,))
+            for i in range(10)]
+        self.database_schema = database_schemas[0]
+        schemaversions_models.SchemaVersion.objects.bulk_create([
+            schemaversions_models.SchemaVersion(
+                database_schema=database_schema, updated_at=now,
+                checksum='checksum%s' % (i,))
+            for database_schema in database_schemas
+            for i in range(20)])
+        models.Changeset.objects.bulk_create([
+            models.Changeset(
+                database_schema=self.database_schema,
+                repo_filename='changesets/%s.yaml' % (i,),
+                repo_filename_hash=models.get_repo_filename_hash(
+                    'changesets/%s.yaml' % (i,)))
+            for i in range(200)])
+        self.servers = [
+            servers_models.Server.objects.create(
+                name='test_query_plan_%s' % (i,))
+            for i in range(10)]
+        changesets = list(models.Changeset.objects.all()[:10])
+        for changeset in changesets:
+            changeset_action = models.ChangesetAction.objects.create(
+                changeset=changeset,
+                type=models.ChangesetAction.TYPE_CREATED, timestamp=now)
+            changesetapplies_models.ChangesetApply.objects.bulk_create([
+                changesetapplies_models.ChangesetApply(
+                    changeset=changeset, server=server, applied_at=now,
+                    success=False, changeset_action=changeset_action)
+                for server in self.servers])
+        self.changeset = changesets[0]
+        # each task name has started and finished task states
+        djcelery_models.TaskState.objects.bulk_create([
+            djcelery_models.TaskState(
+                task_id='task-%s' % (i,), name='test.task_%s' % (i % 10,),
+                state=(states.STARTED, states.SUCCESS)[i // 10 % 2],
+                tstamp=now)
+            for i in range(200)])
+
+    def get_plan(self, queryset):
+        """Returns rows of the EXPLAIN output of queryset as dicts."""
+
+        sql, params = queryset.query.sql_with_params()
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN %s' % (sql,), params)
+        column_names = [column[0] for column in cursor.description]
+        return [dict(zip(column_names, row)) for row in cursor.fetchall()]
+
+    def get_index_columns(self, table, index_name):
+        cursor = connection.cursor()
+        cursor.execute(
+            'SHOW INDEX FROM %s' % (connection.ops.quote_name(table),))
+        column_names = [column[0] for column in cursor.description]
+        rows = [dict(zip(column_names, row)) for row in cursor.fetchall()]
+        return [
+            row['Column_name']
+            for row in sorted(rows, key=lambda row: row['Seq_in_index'])
+            if row['Key_name'] == index_name]
+
+    def assertUsesIndex(self, queryset, columns, sorted_by_index=False):
+        """Asserts that queryset reads its table with an index whose first
+        columns are columns."""
+
+        plan = self.get_plan(queryset)
+        self.assertEqual(len(plan), 1, plan)
+        row = plan[0]
+        self.assertNotEqual(row['type'], 'ALL', row)
+        self.assertIsNotNone(row['key'], row)
+        self.assertEqual(
+            self.get_index_columns(queryset.model._meta.db_table, row['key'])[
+                :len(columns)],
+            columns)
+        if sorted_by_index:
+            self.assertNotIn('filesort', row['Extra'] or '', row)
+
+    def test_schema_version_by_checksum(self):
+        self.assertUsesIndex(
+            schemaversions_models.SchemaVersion.objects.filter(
+                database_schema=self.database_schema, checksum='checksum1'),
+            ['database_schema_id', 'checksum'])
+
+    def test_latest_schema_version(self):
+        self.assertUsesIndex(
+            schemaversions_models.SchemaVersion.objects.filter(
+                database_schema=self.database_schema).order_by(
+                    '-updated_at', '-id')[:1],
+            ['database_schema_id', 'updated_at'], sorted_by_index=True)
+
+    def test_changeset_by_repo_filename(self):
+        self.assertUsesIndex(
+            models.filter_repo_filenames(
+                models.Changeset.objects.all(), ['changesets/1.yaml']),
+            ['repo_filename_hash'])
+
+    def test_successful_changeset_apply(self):
+        self.assertUsesIndex(
+            changesetapplies_models.ChangesetApply.objects.filter(
+                changeset=self.changeset, server=self.servers[0],
+                success=True),
+            ['changeset_id', 'server_id', 'success'])
+
+    def test_stale_task_states(self):
+        self.assertUsesIndex(
+            djcelery_models.TaskState.objects.filter(
+                name='test.task_1', state__in=states.UNREADY_STATES,
+                tstamp__lt=timezone.now()),
+            ['name', 'state'])
+
+    def test_repo_filename_hash(self):
+        changeset = models.Changeset.objects.create(
+            database_schema=self.database_schema,
+            repo_filename=u'changesets/new.yaml')
+        self.assertEqual(
+            changeset.repo_filename_hash,
+            models.get_repo_filename_hash('changesets/new.yaml'))
+        self.assertEqual(
+            list(models.filter_repo_filenames(
+                models.Changeset.objects.all(), [u'changesets/new.yaml'])),
+            [changeset])
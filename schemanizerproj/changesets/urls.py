@@ -22,4 +22,11 @@ urlpatterns = patterns('',
         r'^changeset/delete/(?P<pk>\d+)/$',
         'changesets.views.changeset_soft_delete',
         name='changesets_changeset_soft_delete'),
+
+    #
+    # Repository
+    #
+    url(
+        r'^repository/webhook/$', 'changesets.views.repository_webhook',
+        name='changesets_repository_webhook'),
 )
\ No newline at end of file
@@ -1,3 +1,4 @@
+import json
 import logging
 from pprint import pformat
 import urllib
@@ -5,14 +6,19 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.urlresolvers import reverse
 from django.forms.models import inlineformset_factory
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import redirect, render_to_response
 from django.template import RequestContext
 from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView, ListView
 from changesetapplies import models as changesetapplies_models
 from users import models as users_models
 from utils import decorators, exceptions
+from utils import views as utils_views
 from . import models, forms, changeset_functions, user_access
+from . import repository_functions, tasks
 from schemanizer.logic import privileges_logic
 
 log = logging.getLogger(__name__)
@@ -79,26 +85,39 @@ class ChangesetSubmit(TemplateView):
         return self.render_to_response(self.get_context_data(**local_vars))
 
 
-class ChangesetList(ListView):
+class ChangesetList(utils_views.KeysetListMixin, ListView):
+    filter_fields = (
+        ('database_schema_id', 'database_schema'),
+        ('review_status', 'review_status'),
+        ('classification', 'classification'),
+        ('type', 'type'),
+    )
+
     @method_decorator(login_required)
     @decorators.check_access(user_access.check_access)
     def dispatch(self, request, *args, **kwargs):
         return super(ChangesetList, self).dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        return models.Changeset.not_deleted_objects.all()
+        return models.Changeset.not_deleted_objects.select_related(
+            'database_schema', 'submitted_by', 'reviewed_by',
+            'approved_by').defer('repo_filename')
 
-    def get_context_data(self, **kwargs):
-        context = super(ChangesetList, self).get_context_data(**kwargs)
+    def get_changeset_list(self):
         user = self.request.user.schemanizer_user
-        changeset_qs = self.get_queryset()
         changeset_list = []
-        for changeset in changeset_qs:
+        for changeset in self.page:
             extra=dict(
                 can_apply=privileges_logic.can_user_apply_changeset(user, changeset),
                 can_review=privileges_logic.can_user_review_changeset(user, changeset))
             changeset_list.append(dict(changeset=changeset, extra=extra))
-        context['changeset_list'] = changeset_list
+        return changeset_list
+
+    def get_context_data(self, **kwargs):
+        context = super(ChangesetList, self).get_context_data(**kwargs)
+        # the list is built by the template, only if the cached fragment has
+        # expired
+        context['changeset_list'] = self.get_changeset_list
         return context
 
 
@@ -357,4 +376,31 @@ def changeset_soft_delete(request, pk,
         log.exception('EXCEPTION')
         messages.error(request, u'%s' % (e,))
     return render_to_response(
-        template, locals(), context_instance=RequestContext(request))
\ No newline at end of file
+        template, locals(), context_instance=RequestContext(request))
+
+
+@csrf_exempt
+@require_POST
+def repository_webhook(request):
+    """Receives Github push events for the changeset repository.
+
+    Requests are signed with settings.GITHUB_WEBHOOK_SECRET, changeset files
+    of pushed commits are processed by a task.
+    """
+
+    if not repository_functions.is_valid_signature(
+            request.body, request.META.get('HTTP_X_HUB_SIGNATURE')):
+        log.warn('Repository webhook request has invalid signature.')
+        return HttpResponseForbidden('Invalid signature.')
+
+    event = request.META.get('HTTP_X_GITHUB_EVENT')
+    if event != 'push':
+        return HttpResponse('Ignored %s event.' % (event,))
+    try:
+        payload = json.loads(request.body)
+    except ValueError, e:
+        msg = 'ERROR %s: %s' % (type(e), e)
+        log.exception(msg)
+        return HttpResponse(msg, status=400)
+    tasks.process_repository_push.delay(payload)
+    return HttpResponse('Push event was queued.', status=202)
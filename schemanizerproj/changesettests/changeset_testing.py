@@ -2,9 +2,8 @@ import logging
 import string
 import MySQLdb
 from django.utils import timezone
-import sqlparse
 from changesettests import models as changesettests_models
-from utils import mysql_functions, exceptions
+from utils import mysql_functions, exceptions, sql_functions
 from . import models
 
 log = logging.getLogger(__name__)
@@ -40,9 +39,9 @@ class ChangesetTestSyntax(object):
         if self.message_callback:
             self.message_callback(message, message_type)
 
-    def execute_query(self, cursor, query):
-        """Executes query."""
-        statements = sqlparse.split(query)
+    def execute_query(self, cursor, changeset_detail, field_name):
+        """Executes SQL of a changeset detail field."""
+        statements = changeset_detail.get_statements(field_name)
         for statement in statements:
             statement = statement.rstrip(unicode(string.whitespace + ';'))
             if statement:
@@ -105,7 +104,7 @@ class ChangesetTestSyntax(object):
             log.debug(
                 'Loading initial schema:\n%s',
                 self.schema_version.ddl)
-            ddls = sqlparse.split(self.schema_version.ddl)
+            ddls = sql_functions.split(self.schema_version.ddl)
             for ddl in ddls:
                 try:
                     ddl = ddl.rstrip(unicode(string.whitespace + ';'))
@@ -176,7 +175,7 @@ class ChangesetTestSyntax(object):
                     msg = u'Executing apply_sql:\n%s' % changeset_detail.apply_sql
                     log.info(msg)
                     self.store_message(msg)
-                    self.execute_query(cursor, changeset_detail.apply_sql)
+                    self.execute_query(cursor, changeset_detail, 'apply_sql')
                     cursor.execute('FLUSH TABLES')
 
                     #
@@ -199,8 +198,8 @@ class ChangesetTestSyntax(object):
                                 'Executing apply_verification_sql:\n%s',
                                 changeset_detail.apply_verification_sql)
                             self.execute_query(
-                                cursor,
-                                changeset_detail.apply_verification_sql)
+                                cursor, changeset_detail,
+                                'apply_verification_sql')
                     except Exception, e:
                         msg = (
                             u'Apply verification failed (Error %s: %s).' % (
@@ -213,7 +212,7 @@ class ChangesetTestSyntax(object):
                     log.debug(
                         u'Executing revert_sql:\n%s',
                         changeset_detail.revert_sql)
-                    self.execute_query(cursor, changeset_detail.revert_sql)
+                    self.execute_query(cursor, changeset_detail, 'revert_sql')
                     cursor.execute('FLUSH TABLES')
 
                     #
@@ -240,8 +239,8 @@ class ChangesetTestSyntax(object):
                                 'Executing revert_verification_sql: \n%s',
                                 changeset_detail.revert_verification_sql)
                             self.execute_query(
-                                cursor,
-                                changeset_detail.revert_verification_sql)
+                                cursor, changeset_detail,
+                                'revert_verification_sql')
                     except Exception, e:
                         msg = (
                             u'Revert verification failed (Error %s: %s).' % (
@@ -253,7 +252,7 @@ class ChangesetTestSyntax(object):
                     # apply_sql
                     #
                     log.debug('Reapplying apply_sql.')
-                    self.execute_query(cursor, changeset_detail.apply_sql)
+                    self.execute_query(cursor, changeset_detail, 'apply_sql')
 
                     #
                     # Update changeset_detail with info on schema versions.
@@ -1,5 +1,5 @@
 from django.db import models
-from utils import models as utils_models
+from utils import cache_functions, models as utils_models
 
 
 class TestTypeManager(models.Manager):
@@ -44,3 +44,4 @@ class ChangesetTest(utils_models.TimeStampedModel):
             return False
 
 
+cache_functions.register_model(ChangesetTest, 'changeset_results')
@@ -1,85 +1,486 @@
+"""Changeset validators.
+
+Validators check the SQL of changeset details without connecting to a MySQL
+server. The SQL of each changeset detail is parsed once and shared by all
+validators through ParsedChangesetDetails.
+
+A validator is a subclass of Validator registered with @register. It runs
+only if a ValidationType with the same name exists. Validators of a
+changeset run concurrently, so validate() must not access the database;
+anything that needs a query goes to prepare(), which runs beforehand.
+"""
+
 import logging
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+from django.conf import settings
 from django.utils import timezone
 import sqlparse
-from . import models
+from schemaversions import models as schemaversions_models
+from utils import sql_functions
+from . import models, schema_simulator
 
 log = logging.getLogger(__name__)
 
+# MySQL 5.5 reserved words.
+MYSQL_RESERVED_WORDS = frozenset("""
+    ACCESSIBLE ADD ALL ALTER ANALYZE AND AS ASC ASENSITIVE BEFORE BETWEEN
+    BIGINT BINARY BLOB BOTH BY CALL CASCADE CASE CHANGE CHAR CHARACTER CHECK
+    COLLATE COLUMN CONDITION CONSTRAINT CONTINUE CONVERT CREATE CROSS
+    CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP CURRENT_USER CURSOR DATABASE
+    DATABASES DAY_HOUR DAY_MICROSECOND DAY_MINUTE DAY_SECOND DEC DECIMAL
+    DECLARE DEFAULT DELAYED DELETE DESC DESCRIBE DETERMINISTIC DISTINCT
+    DISTINCTROW DIV DOUBLE DROP DUAL EACH ELSE ELSEIF ENCLOSED ESCAPED EXISTS
+    EXIT EXPLAIN FALSE FETCH FLOAT FLOAT4 FLOAT8 FOR FORCE FOREIGN FROM
+    FULLTEXT GRANT GROUP HAVING HIGH_PRIORITY HOUR_MICROSECOND HOUR_MINUTE
+    HOUR_SECOND IF IGNORE IN INDEX INFILE INNER INOUT INSENSITIVE INSERT INT
+    INT1 INT2 INT3 INT4 INT8 INTEGER INTERVAL INTO IS ITERATE JOIN KEY KEYS
+    KILL LEADING LEAVE LEFT LIKE LIMIT LINEAR LINES LOAD LOCALTIME
+    LOCALTIMESTAMP LOCK LONG LONGBLOB LONGTEXT LOOP LOW_PRIORITY
+    MASTER_SSL_VERIFY_SERVER_CERT MATCH MAXVALUE MEDIUMBLOB MEDIUMINT
+    MEDIUMTEXT MIDDLEINT MINUTE_MICROSECOND MINUTE_SECOND MOD MODIFIES
+    NATURAL NOT NO_WRITE_TO_BINLOG NULL NUMERIC ON OPTIMIZE OPTION
+    OPTIONALLY OR ORDER OUT OUTER OUTFILE PRECISION PRIMARY PROCEDURE PURGE
+    RANGE READ READS READ_WRITE REAL REFERENCES REGEXP RELEASE RENAME REPEAT
+    REPLACE REQUIRE RESIGNAL RESTRICT RETURN REVOKE RIGHT RLIKE SCHEMA
+    SCHEMAS SECOND_MICROSECOND SELECT SENSITIVE SEPARATOR SET SHOW SIGNAL
+    SMALLINT SPATIAL SPECIFIC SQL SQLEXCEPTION SQLSTATE SQLWARNING
+    SQL_BIG_RESULT SQL_CALC_FOUND_ROWS SQL_SMALL_RESULT SSL STARTING
+    STRAIGHT_JOIN TABLE TERMINATED THEN TINYBLOB TINYINT TINYTEXT TO
+    TRAILING TRIGGER TRUE UNDO UNION UNIQUE UNLOCK UNSIGNED UPDATE USAGE USE
+    USING UTC_DATE UTC_TIME UTC_TIMESTAMP VALUES VARBINARY VARCHAR
+    VARCHARACTER VARYING WHEN WHERE WHILE WITH WRITE XOR YEAR_MONTH ZEROFILL
+    """.split())
+
+# Keywords starting index and constraint definitions in CREATE TABLE.
+_NON_COLUMN_DEFINITION_KEYWORDS = frozenset([
+    'CONSTRAINT', 'PRIMARY', 'FOREIGN', 'UNIQUE', 'INDEX', 'KEY', 'FULLTEXT',
+    'SPATIAL', 'CHECK'])
+
+# ALTER TABLE operations that make MySQL copy the table.
+_TABLE_REBUILD_OPERATIONS = frozenset([
+    'ADD COLUMN', 'DROP COLUMN', 'MODIFY', 'CHANGE', 'ADD PRIMARY',
+    'DROP PRIMARY', 'ENGINE', 'CONVERT', 'ORDER', 'FORCE', 'ROW_FORMAT'])
+
+
+class ParsedChangesetDetails(object):
+    """SQL of changeset details, parsed once and shared by validators."""
+
+    FIELD_NAMES = ('apply_sql', 'revert_sql')
+
+    def __init__(self, changeset_details):
+        super(ParsedChangesetDetails, self).__init__()
+        self.changeset_details = list(changeset_details)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, changeset_detail, field_name, parse):
+        key = (kind, changeset_detail.id, field_name)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = parse(
+                    getattr(changeset_detail, field_name))
+            return self._cache[key]
+
+    def parsed_statements(self, changeset_detail, field_name):
+        """Returns sqlparse statements of a changeset detail field."""
+        return self._get(
+            'parsed', changeset_detail, field_name, sql_functions.parse)
+
+    def statement_tokens(self, changeset_detail, field_name):
+        """Returns token lists of statements of a changeset detail field."""
+        return self._get(
+            'tokens', changeset_detail, field_name,
+            lambda sql: tuple(schema_simulator.split_tokens(
+                schema_simulator.tokenize(sql))))
+
+    def iter_fields(self):
+        for changeset_detail in self.changeset_details:
+            for field_name in self.FIELD_NAMES:
+                yield changeset_detail, field_name
+
+
+validator_map = {}
+
+
+def register(klass):
+    """Class decorator registering a validator under its name."""
+    validator_map[klass.name] = klass
+    return klass
 
-class ChangesetValidatorNoUpdateWithWhereClause(object):
-    def __init__(self, changeset):
-        super(ChangesetValidatorNoUpdateWithWhereClause, self).__init__()
 
-        self.validation_type = models.ValidationType.objects.get(
-            name='no update with where clause')
+class Validator(object):
+    """Base class for changeset validators."""
+
+    # Name of the ValidationType this validator implements.
+    name = None
+
+    def __init__(self, changeset, parsed_details, validation_type=None,
+                 **kwargs):
+        super(Validator, self).__init__()
         self.changeset = changeset
+        self.parsed_details = parsed_details
+        self.validation_type = validation_type
         self.validation_log_items = []
-        self.where_clause_found = False
         self.has_errors = False
-        self.changeset_validation = None
-
-    def validate_statement(self, changeset_detail, field_name):
-        parsed = sqlparse.parse(getattr(changeset_detail, field_name))
-        where_clause_found_= False
-        for parsed_statement in parsed:
-            if parsed_statement.get_type() in [u'INSERT', u'UPDATE', u'DELETE']:
-                for token in parsed_statement.tokens:
-                    if type(token) in [sqlparse.sql.Where]:
+        self.duration = None
+
+    def prepare(self):
+        """Loads data needed by validate(), runs before validators start."""
+        pass
+
+    def validate(self):
+        """Validates changeset, appends problems to validation_log_items.
+
+        Must be overridden by subclasses.
+        """
+        raise NotImplementedError
+
+    def run_validator(self):
+        """Runs validate().
+
+        Only problems found by validate() reject the changeset. An
+        unexpected exception, for example a bug in the validator, is logged
+        and leaves the changeset to the changeset tests.
+        """
+
+        start_time = time.time()
+        try:
+            self.validate()
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            log.exception(u'Validator %s failed: %s' % (self.name, msg))
+        self.duration = time.time() - start_time
+        self.has_errors = bool(self.validation_log_items)
+
+    def add_log_item(self, message, changeset_detail, field_name):
+        self.validation_log_items.append(
+            u'%s on %s (changeset detail ID: %s).' % (
+                message, field_name, changeset_detail.id))
+
+
+@register
+class ChangesetValidatorWhereClauseRequired(Validator):
+    """UPDATE and DELETE statements should have a WHERE clause."""
+
+    name = 'no update or delete without where clause'
+
+    def validate(self):
+        for changeset_detail, field_name in self.parsed_details.iter_fields():
+            statements = self.parsed_details.parsed_statements(
+                changeset_detail, field_name)
+            for statement in statements:
+                statement_type = statement.get_type()
+                if statement_type not in (u'UPDATE', u'DELETE'):
+                    continue
+                where_clause_found = False
+                for token in statement.tokens:
+                    if isinstance(token, sqlparse.sql.Where):
                         where_clause_found = True
                         break
-            if where_clause_found:
-                break
-        if where_clause_found:
-            self.validation_log_items.append(
-                u'WHERE clause found on %s (changeset detail ID: %s).' % (
-                    field_name, changeset_detail.id,))
-            self.where_clause_found = True
-
-    def validate_changeset_detail(self, changeset_detail):
+                if not where_clause_found:
+                    self.add_log_item(
+                        u'%s without WHERE clause found' % (statement_type,),
+                        changeset_detail, field_name)
+
+
+@register
+class ChangesetValidatorPrimaryKeyRequired(Validator):
+    """Tables should have a primary key."""
+
+    name = 'tables have primary key'
+
+    def validate(self):
+        for changeset_detail, field_name in self.parsed_details.iter_fields():
+            statements = self.parsed_details.statement_tokens(
+                changeset_detail, field_name)
+            for tokens in statements:
+                keywords = [token.keyword for token in tokens]
+                if keywords[:2] == ['CREATE', 'TABLE']:
+                    if 'LIKE' in keywords[:6]:
+                        continue
+                    has_primary_key = 'PRIMARY' in keywords or any(
+                        keywords[i] == 'KEY' and keywords[i - 1] != 'UNIQUE'
+                        and tokens[i + 1].kind == 'punct'
+                        and tokens[i + 1].value in (',', ')')
+                        for i in range(1, len(tokens) - 1))
+                    if not has_primary_key:
+                        self.add_log_item(
+                            u'Table without primary key created',
+                            changeset_detail, field_name)
+                elif keywords[:2] == ['ALTER', 'TABLE']:
+                    drops = sum(
+                        1 for i in range(1, len(keywords))
+                        if keywords[i - 1] == 'DROP' and
+                        keywords[i] == 'PRIMARY')
+                    adds = sum(
+                        1 for i in range(1, len(keywords))
+                        if keywords[i - 1] == 'ADD' and
+                        keywords[i] == 'PRIMARY')
+                    if drops > adds:
+                        self.add_log_item(
+                            u'Primary key dropped',
+                            changeset_detail, field_name)
+
+
+@register
+class ChangesetValidatorTableRebuild(Validator):
+    """Reports ALTER TABLE statements that make MySQL copy the table."""
+
+    name = 'table rebuild'
+
+    def validate(self):
+        for changeset_detail, field_name in self.parsed_details.iter_fields():
+            statements = self.parsed_details.statement_tokens(
+                changeset_detail, field_name)
+            for tokens in statements:
+                keywords = [token.keyword for token in tokens]
+                if keywords[:2] != ['ALTER', 'TABLE']:
+                    continue
+                stream = schema_simulator._TokenStream(tokens[2:])
+                try:
+                    stream.identifier()
+                except schema_simulator.UnsupportedStatementError:
+                    continue
+                operations = set()
+                depth = 0
+                specification_start = 2 + stream.pos
+                for i, token in enumerate(tokens):
+                    if token.kind == 'punct':
+                        if token.value == '(':
+                            depth += 1
+                        elif token.value == ')':
+                            depth -= 1
+                        elif token.value == ',' and depth == 0:
+                            specification_start = i + 1
+                        continue
+                    if i != specification_start or depth:
+                        continue
+                    operation = token.keyword
+                    if operation in ('ADD', 'DROP'):
+                        next_keyword = (
+                            keywords[i + 1] if i + 1 < len(keywords)
+                            else None)
+                        if next_keyword in ('PRIMARY', 'COLUMN'):
+                            operation = u'%s %s' % (operation, next_keyword)
+                        elif (
+                                operation == 'ADD' and
+                                next_keyword not in (
+                                    _NON_COLUMN_DEFINITION_KEYWORDS)):
+                            operation = u'ADD COLUMN'
+                        elif (
+                                operation == 'DROP' and
+                                next_keyword not in (
+                                    'INDEX', 'KEY', 'FOREIGN')):
+                            operation = u'DROP COLUMN'
+                    if operation in _TABLE_REBUILD_OPERATIONS:
+                        operations.add(operation)
+                if operations:
+                    self.add_log_item(
+                        u'Table rebuild caused by %s' % (
+                            u', '.join(sorted(operations)),),
+                        changeset_detail, field_name)
+
+
+@register
+class ChangesetValidatorReservedWords(Validator):
+    """Tables and columns should not be named after reserved words.
+
+    Quoted identifiers are accepted by MySQL and are not reported.
+    """
+
+    name = 'no reserved words as identifiers'
+
+    def defined_identifiers(self, tokens):
+        """Returns tokens of names of tables and columns created by a
+        statement."""
+
+        keywords = [token.keyword for token in tokens]
+        identifiers = []
+        if keywords[:2] == ['CREATE', 'TABLE']:
+            stream = schema_simulator._TokenStream(tokens[2:])
+            if stream.accept('IF'):
+                stream.accept('NOT')
+                stream.accept('EXISTS')
+            stream.identifier()
+            # the name follows its schema qualifier
+            identifiers.append(stream.tokens[stream.pos - 1])
+            if stream.peek_punct('('):
+                for definition in schema_simulator._split_commas(
+                        stream.group()):
+                    if (
+                            definition and
+                            definition[0].keyword not in (
+                                _NON_COLUMN_DEFINITION_KEYWORDS)):
+                        identifiers.append(definition[0])
+        elif keywords[:2] == ['ALTER', 'TABLE']:
+            for i in range(2, len(tokens) - 1):
+                if keywords[i] == 'ADD':
+                    j = i + 1
+                    if keywords[j] == 'COLUMN':
+                        j += 1
+                    if (
+                            j < len(tokens) and
+                            keywords[j] not in (
+                                _NON_COLUMN_DEFINITION_KEYWORDS)):
+                        identifiers.append(tokens[j])
+                elif keywords[i] == 'CHANGE':
+                    j = i + 2
+                    if keywords[i + 1] == 'COLUMN':
+                        j += 1
+                    if j < len(tokens):
+                        identifiers.append(tokens[j])
+                elif keywords[i] == 'RENAME':
+                    j = i + 1
+                    if keywords[j] in ('INDEX', 'KEY'):
+                        continue
+                    if keywords[j] in ('TO', 'AS'):
+                        j += 1
+                    if j < len(tokens):
+                        identifiers.append(tokens[j])
+        elif keywords[:2] == ['RENAME', 'TABLE']:
+            for i in range(3, len(tokens)):
+                if keywords[i - 1] == 'TO':
+                    identifiers.append(tokens[i])
+        return identifiers
+
+    def validate(self):
+        for changeset_detail, field_name in self.parsed_details.iter_fields():
+            statements = self.parsed_details.statement_tokens(
+                changeset_detail, field_name)
+            for tokens in statements:
+                try:
+                    identifiers = self.defined_identifiers(tokens)
+                except schema_simulator.UnsupportedStatementError:
+                    continue
+                for identifier in identifiers:
+                    if (
+                            identifier.kind == 'word' and
+                            identifier.keyword in MYSQL_RESERVED_WORDS):
+                        self.add_log_item(
+                            u"Reserved word '%s' used as identifier" % (
+                                identifier.value,),
+                            changeset_detail, field_name)
+
+
+@register
+class ChangesetValidatorSchemaSimulation(Validator):
+    """Simulates changeset details against an in-memory schema model.
+
+    Changeset details are applied and reverted on a model built from the DDL
+    of the schema version, without connecting to a MySQL server. Simulation
+    stops silently at the first statement the model does not support, leaving
+    it to the changeset tests.
+    """
+
+    name = 'schema simulation'
+
+    def __init__(self, changeset, parsed_details, schema_version=None,
+                 **kwargs):
+        super(ChangesetValidatorSchemaSimulation, self).__init__(
+            changeset, parsed_details, **kwargs)
+        self.schema_version = schema_version
+
+    def prepare(self):
+        if self.schema_version is None:
+            schema_version = schemaversions_models.SchemaVersion.objects.filter(
+                database_schema=self.changeset.database_schema).order_by(
+                    '-updated_at', '-id')[:1]
+            self.schema_version = (
+                schema_version[0] if schema_version else None)
+        if self.schema_version is not None:
+            # Load DDL now, validate() must not query the database.
+            self.schema_version.ddl
+
+    def validate(self):
+        if self.schema_version is None:
+            return
         try:
-            self.validate_statement(changeset_detail, 'apply_sql')
-            self.validate_statement(changeset_detail, 'revert_sql')
+            schema_model = schema_simulator.SchemaModel.from_ddl(
+                self.schema_version.ddl)
+        except schema_simulator.UnsupportedStatementError, e:
+            # Schema versions that cannot be modeled are left to the
+            # changeset tests.
+            log.info(
+                'Schema version [id=%s] cannot be simulated: %s',
+                self.schema_version.id, e)
+            return
+        self.validation_log_items.extend(
+            schema_simulator.simulate_changeset_details(
+                schema_model, self.parsed_details.changeset_details))
 
-        except Exception, e:
-            self.has_errors = True
-            msg = 'ERROR %s: %s' % (type(e), e)
-            self.validation_log_items.append(msg)
-            log.exception(msg)
 
-    def run_validator(self):
-        """Changeset validate no update with where clause."""
+def _run_validator(validator):
+    validator.run_validator()
+    return validator
+
+
+def run_validators(changeset, **kwargs):
+    """Runs validators for all validation types.
 
-        models.ChangesetValidation.objects.filter(
-            changeset=self.changeset).delete()
-        for changeset_detail in self.changeset.changesetdetail_set.all():
-            self.validate_changeset_detail(changeset_detail)
+    Keyword arguments are passed to the validators, e.g. schema_version.
+    Validators run concurrently in a pool of
+    settings.CHANGESET_VALIDATION_THREADS threads. Results are saved with a
+    single insert.
+    """
 
-        validation_log = u'\n'.join(self.validation_log_items)
-        self.changeset_validation = models.ChangesetValidation.objects.create(
-            changeset=self.changeset,
-            validation_type=self.validation_type,
-            timestamp=timezone.now(),
-            result=validation_log)
+    models.ChangesetValidation.objects.filter(changeset=changeset).delete()
+    validation_types = [
+        validation_type
+        for validation_type in models.ValidationType.objects.all()
+        if validation_type.name in validator_map]
+    if not validation_types:
+        return []
 
-        self.has_errors = self.has_errors or self.where_clause_found
+    parsed_details = ParsedChangesetDetails(
+        changeset.changesetdetail_set.order_by('id'))
+    validators = []
+    for validation_type in validation_types:
+        klass = validator_map[validation_type.name]
+        validator = klass(
+            changeset, parsed_details, validation_type=validation_type,
+            **kwargs)
+        validator.prepare()
+        validators.append(validator)
 
+    pool_size = min(len(validators), settings.CHANGESET_VALIDATION_THREADS)
+    if pool_size > 1:
+        pool = ThreadPool(pool_size)
+        try:
+            pool.map(_run_validator, validators)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for validator in validators:
+            validator.run_validator()
 
-validator_map = {
-    #'no update with where clause': ChangesetValidatorNoUpdateWithWhereClause
-}
+    for validator in validators:
+        log.debug(
+            'Validator %s took %.3fs.', validator.name, validator.duration)
 
+    now = timezone.now()
+    models.ChangesetValidation.objects.bulk_create([
+        models.ChangesetValidation(
+            changeset=changeset,
+            validation_type=validator.validation_type,
+            timestamp=now,
+            result=u'\n'.join(validator.validation_log_items),
+            duration=validator.duration)
+        for validator in validators])
 
-def run_validators(changeset):
-    validation_types = models.ValidationType.objects.all()
+    # bulk_create() does not set primary keys on MySQL.
+    changeset_validations = dict(
+        (changeset_validation.validation_type_id, changeset_validation)
+        for changeset_validation in (
+            models.ChangesetValidation.objects.filter(changeset=changeset)))
     validation_results = []
-    for validation_type in validation_types:
-        if validation_type.name in validator_map:
-            klass = validator_map[validation_type.name]
-            instance = klass(changeset)
-            instance.run_validator()
-            validation_results.append(dict(
-                has_errors=instance.has_errors,
-                changeset_validation=instance.changeset_validation,
-                validation_type=validation_type))
+    for validator in validators:
+        validation_results.append(dict(
+            has_errors=validator.has_errors,
+            changeset_validation=changeset_validations.get(
+                validator.validation_type.id),
+            validation_type=validator.validation_type,
+            duration=validator.duration))
     return validation_results
-
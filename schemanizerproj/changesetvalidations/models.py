@@ -1,5 +1,5 @@
 from django.db import models
-from utils import models as utils_models
+from utils import cache_functions, models as utils_models
 
 
 class ValidationType(utils_models.TimeStampedModel):
@@ -19,6 +19,8 @@ class ChangesetValidation(utils_models.TimeStampedModel):
     validation_type = models.ForeignKey('changesetvalidations.ValidationType')
     timestamp = models.DateTimeField(null=True, blank=True, default=None)
     result = models.TextField(blank=True, default='')
+    # time taken by the validator, in seconds
+    duration = models.FloatField(null=True, blank=True, default=None)
 
     class Meta:
         db_table = 'changeset_validations'
@@ -30,4 +32,7 @@ class ChangesetValidation(utils_models.TimeStampedModel):
         if self.result and self.result.strip():
             return True
         else:
-            return False
\ No newline at end of file
+            return False
+
+
+cache_functions.register_model(ChangesetValidation, 'changeset_results')
@@ -0,0 +1,949 @@
+"""In-memory schema model for simulating DDL statements.
+
+Only a subset of MySQL DDL is understood: CREATE/ALTER/DROP/RENAME TABLE
+and CREATE/DROP INDEX. DML statements have no effect on the model. Any other
+statement raises UnsupportedStatementError so that callers can fall back to
+running the changeset against a real MySQL server.
+
+The structure and checksum produced by a SchemaModel describe tables, columns,
+indexes and foreign keys only. They are used to compare simulated states with
+each other and are not comparable to checksums of mysqldump output.
+"""
+
+import copy
+import logging
+import re
+from utils import exceptions, hash_functions
+
+log = logging.getLogger(__name__)
+
+
+class SimulationError(exceptions.Error):
+    """Statement would fail when executed against the simulated schema."""
+    pass
+
+
+class UnsupportedStatementError(exceptions.Error):
+    """Statement cannot be simulated."""
+    pass
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+    | (?P<comment>--(?:[ \t][^\n]*)?(?=\n|$)|\#[^\n]*|/\*(?!!).*?\*/)
+    | (?P<cond_start>/\*!\d*)
+    | (?P<cond_end>\*/)
+    | (?P<quoted>`(?:[^`]|``)*`)
+    | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    | (?P<word>[A-Za-z0-9_$@]+)
+    | (?P<punct>[(),;.=])
+    | (?P<other>.)
+    """, re.VERBOSE | re.DOTALL)
+
+# Statements that do not change the structure of tables.
+_NO_EFFECT_STATEMENTS = frozenset([
+    'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'SELECT', 'SET', 'USE',
+    'TRUNCATE', 'LOCK', 'UNLOCK', 'ANALYZE', 'OPTIMIZE', 'FLUSH',
+    'START', 'BEGIN', 'COMMIT', 'ROLLBACK', 'DO', 'LOAD'])
+
+_INDEX_KINDS = frozenset(['INDEX', 'KEY', 'UNIQUE', 'FULLTEXT', 'SPATIAL'])
+
+_TYPE_ALIASES = {
+    'integer': 'int',
+    'bool': 'tinyint',
+    'boolean': 'tinyint',
+    'dec': 'decimal',
+    'numeric': 'decimal',
+    'fixed': 'decimal',
+    'real': 'double',
+    'character': 'char',
+}
+
+_INTEGER_TYPES = frozenset([
+    'tinyint', 'smallint', 'mediumint', 'int', 'bigint'])
+
+
+class Token(object):
+    """SQL token."""
+
+    def __init__(self, kind, value):
+        super(Token, self).__init__()
+        self.kind = kind
+        self.value = value
+        if kind == 'word':
+            self.keyword = value.upper()
+        else:
+            self.keyword = None
+
+    def __repr__(self):
+        return 'Token(%s, %r)' % (self.kind, self.value)
+
+
+def tokenize(sql):
+    """Returns the list of significant tokens of SQL text.
+
+    Contents of conditional comments (/*!...*/) are treated as code.
+    """
+
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind in ('ws', 'comment', 'cond_start', 'cond_end'):
+            continue
+        value = match.group(kind)
+        if kind == 'quoted':
+            value = value[1:-1].replace('``', '`')
+        tokens.append(Token(kind, value))
+    return tokens
+
+
+def split_tokens(tokens):
+    """Splits a token list into statements at top level semicolons."""
+
+    statements = []
+    current = []
+    for token in tokens:
+        if token.kind == 'punct' and token.value == ';':
+            if current:
+                statements.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        statements.append(current)
+    return statements
+
+
+class _TokenStream(object):
+    """Cursor over the tokens of a single statement."""
+
+    def __init__(self, tokens):
+        super(_TokenStream, self).__init__()
+        self.tokens = tokens
+        self.pos = 0
+
+    def at_end(self):
+        return self.pos >= len(self.tokens)
+
+    def peek(self, offset=0):
+        pos = self.pos + offset
+        if pos < len(self.tokens):
+            return self.tokens[pos]
+        return None
+
+    def peek_keyword(self, offset=0):
+        token = self.peek(offset)
+        if token is None:
+            return None
+        return token.keyword
+
+    def peek_punct(self, value):
+        token = self.peek()
+        return (
+            token is not None and token.kind == 'punct' and
+            token.value == value)
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise UnsupportedStatementError('Unexpected end of statement.')
+        self.pos += 1
+        return token
+
+    def accept(self, *keywords):
+        """Consumes the next token if it is one of the keywords."""
+        keyword = self.peek_keyword()
+        if keyword is not None and keyword in keywords:
+            self.pos += 1
+            return keyword
+        return None
+
+    def accept_punct(self, value):
+        if self.peek_punct(value):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, *keywords):
+        keyword = self.accept(*keywords)
+        if keyword is None:
+            raise UnsupportedStatementError(
+                'Expected %s near %r.' % (
+                    ' or '.join(keywords), self._near()))
+        return keyword
+
+    def expect_punct(self, value):
+        if not self.accept_punct(value):
+            raise UnsupportedStatementError(
+                'Expected %r near %r.' % (value, self._near()))
+
+    def identifier(self):
+        """Consumes an identifier, ignoring any schema qualifier."""
+        token = self.next()
+        if token.kind not in ('word', 'quoted'):
+            raise UnsupportedStatementError(
+                'Expected identifier near %r.' % (token.value,))
+        name = token.value
+        if self.accept_punct('.'):
+            return self.identifier()
+        return name
+
+    def group(self):
+        """Consumes a parenthesized group and returns its inner tokens."""
+        self.expect_punct('(')
+        depth = 1
+        start = self.pos
+        while True:
+            token = self.next()
+            if token.kind == 'punct':
+                if token.value == '(':
+                    depth += 1
+                elif token.value == ')':
+                    depth -= 1
+                    if depth == 0:
+                        return self.tokens[start:self.pos - 1]
+
+    def until_comma(self):
+        """Consumes tokens up to a top level comma or the end."""
+        depth = 0
+        start = self.pos
+        while not self.at_end():
+            token = self.peek()
+            if token.kind == 'punct':
+                if token.value == '(':
+                    depth += 1
+                elif token.value == ')':
+                    if depth == 0:
+                        break
+                    depth -= 1
+                elif token.value == ',' and depth == 0:
+                    break
+            self.pos += 1
+        return self.tokens[start:self.pos]
+
+    def _near(self):
+        return u' '.join(t.value for t in self.tokens[self.pos:self.pos + 5])
+
+
+def _split_commas(tokens):
+    """Splits tokens at top level commas."""
+    parts = []
+    stream = _TokenStream(tokens)
+    while not stream.at_end():
+        parts.append(stream.until_comma())
+        stream.accept_punct(',')
+    return parts
+
+
+def _normalize_type(type_name, args, unsigned):
+    type_name = type_name.lower()
+    type_name = _TYPE_ALIASES.get(type_name, type_name)
+    if type_name in _INTEGER_TYPES:
+        # Display width has no effect on the stored values.
+        args = u''
+    elif type_name == 'decimal' and not args:
+        args = u'10,0'
+    elif type_name in ('char', 'binary') and not args:
+        args = u'1'
+    signature = type_name
+    if args:
+        signature = u'%s(%s)' % (signature, args)
+    if unsigned:
+        signature = u'%s unsigned' % (signature,)
+    return signature
+
+
+class Column(object):
+    """Column of a simulated table."""
+
+    def __init__(self, name, signature, inline_primary=False,
+                 inline_unique=False):
+        super(Column, self).__init__()
+        self.name = name
+        self.signature = signature
+        self.inline_primary = inline_primary
+        self.inline_unique = inline_unique
+
+    @classmethod
+    def parse(cls, tokens):
+        """Parses a column definition (name, data type and attributes)."""
+
+        stream = _TokenStream(tokens)
+        name = stream.identifier()
+        type_token = stream.next()
+        if type_token.kind != 'word':
+            raise UnsupportedStatementError(
+                'Invalid data type for column %s.' % (name,))
+        type_name = type_token.value
+        if type_name.upper() == 'DOUBLE':
+            stream.accept('PRECISION')
+        elif type_name.upper() in ('NATIONAL',):
+            type_name = stream.next().value
+        args = u''
+        if stream.peek_punct('('):
+            args = u','.join(
+                u''.join(t.value for t in part).strip().lower()
+                for part in _split_commas(stream.group()))
+        unsigned = False
+        not_null = False
+        inline_primary = False
+        inline_unique = False
+        while not stream.at_end():
+            token = stream.next()
+            keyword = token.keyword
+            if keyword == 'UNSIGNED':
+                unsigned = True
+            elif keyword == 'NOT' and stream.accept('NULL'):
+                not_null = True
+            elif keyword == 'PRIMARY':
+                stream.accept('KEY')
+                inline_primary = True
+            elif keyword == 'UNIQUE':
+                stream.accept('KEY', 'INDEX')
+                inline_unique = True
+            elif keyword == 'KEY':
+                # "KEY" alone in a column definition means PRIMARY KEY.
+                inline_primary = True
+            elif keyword == 'REFERENCES':
+                raise UnsupportedStatementError(
+                    'Inline column references are not supported.')
+            elif token.kind == 'punct' and token.value == '(':
+                # skip expression groups, e.g. DEFAULT (expr)
+                stream.pos -= 1
+                stream.group()
+        if inline_primary:
+            not_null = True
+        signature = _normalize_type(type_name, args, unsigned)
+        if not_null and signature.split('(')[0] != 'timestamp':
+            # Nullability of timestamp columns depends on server settings.
+            signature = u'%s not null' % (signature,)
+        return cls(name, signature, inline_primary, inline_unique)
+
+
+class Index(object):
+    """Index of a simulated table."""
+
+    def __init__(self, kind, name, columns):
+        super(Index, self).__init__()
+        self.kind = kind
+        self.name = name
+        self.columns = columns
+
+    def describe(self):
+        return u'%s %s (%s)' % (
+            self.kind, self.name, u','.join(self.columns))
+
+
+class ForeignKey(object):
+    """Foreign key constraint of a simulated table."""
+
+    def __init__(self, name, columns, references):
+        super(ForeignKey, self).__init__()
+        self.name = name
+        self.columns = columns
+        self.references = references
+
+    def describe(self):
+        return u'FOREIGN KEY %s (%s) REFERENCES %s' % (
+            self.name, u','.join(self.columns), self.references)
+
+
+def _index_columns(tokens):
+    """Returns lower case column names of an index column list."""
+    columns = []
+    for part in _split_commas(tokens):
+        if not part or part[0].kind not in ('word', 'quoted'):
+            raise UnsupportedStatementError('Invalid index column list.')
+        columns.append(part[0].value.lower())
+    return columns
+
+
+class Table(object):
+    """Simulated table."""
+
+    def __init__(self, name):
+        super(Table, self).__init__()
+        self.name = name
+        self.columns = []
+        self.indexes = []
+        self.foreign_keys = []
+        self.auto_fk_count = 0
+
+    def find_column(self, name):
+        name = name.lower()
+        for i, column in enumerate(self.columns):
+            if column.name.lower() == name:
+                return i
+        return None
+
+    def find_index(self, name):
+        name = name.lower()
+        for i, index in enumerate(self.indexes):
+            if index.name.lower() == name:
+                return i
+        return None
+
+    def find_foreign_key(self, name):
+        name = name.lower()
+        for i, foreign_key in enumerate(self.foreign_keys):
+            if foreign_key.name.lower() == name:
+                return i
+        return None
+
+    def check_columns_exist(self, columns):
+        for column_name in columns:
+            if self.find_column(column_name) is None:
+                raise SimulationError(
+                    "Key column '%s' doesn't exist in table '%s'." % (
+                        column_name, self.name))
+
+    def add_column(self, column, position=None):
+        if self.find_column(column.name) is not None:
+            raise SimulationError(
+                "Duplicate column name '%s' in table '%s'." % (
+                    column.name, self.name))
+        self._insert_column(column, position)
+        if column.inline_primary:
+            self.add_index('PRIMARY', None, [column.name.lower()])
+        if column.inline_unique:
+            self.add_index('UNIQUE', None, [column.name.lower()])
+
+    def _insert_column(self, column, position):
+        if position is None:
+            self.columns.append(column)
+        elif position == '':
+            self.columns.insert(0, column)
+        else:
+            i = self.find_column(position)
+            if i is None:
+                raise SimulationError(
+                    "Unknown column '%s' in table '%s'." % (
+                        position, self.name))
+            self.columns.insert(i + 1, column)
+
+    def drop_column(self, name):
+        i = self.find_column(name)
+        if i is None:
+            raise SimulationError(
+                "Can't DROP '%s'; check that column exists in table '%s'." % (
+                    name, self.name))
+        if len(self.columns) == 1:
+            raise SimulationError(
+                "You can't delete all columns with ALTER TABLE; use DROP "
+                "TABLE instead (table '%s')." % (self.name,))
+        del self.columns[i]
+        name = name.lower()
+        for index in list(self.indexes):
+            if name in index.columns:
+                index.columns = [c for c in index.columns if c != name]
+                if not index.columns:
+                    self.indexes.remove(index)
+
+    def change_column(self, old_name, column, position=None):
+        i = self.find_column(old_name)
+        if i is None:
+            raise SimulationError(
+                "Unknown column '%s' in table '%s'." % (old_name, self.name))
+        if (old_name.lower() != column.name.lower() and
+                self.find_column(column.name) is not None):
+            raise SimulationError(
+                "Duplicate column name '%s' in table '%s'." % (
+                    column.name, self.name))
+        del self.columns[i]
+        if position is None:
+            self.columns.insert(i, column)
+        else:
+            self._insert_column(column, position)
+        old_name = old_name.lower()
+        new_name = column.name.lower()
+        for index in self.indexes:
+            index.columns = [
+                new_name if c == old_name else c for c in index.columns]
+        if column.inline_primary:
+            self.add_index('PRIMARY', None, [new_name])
+        if column.inline_unique:
+            self.add_index('UNIQUE', None, [new_name])
+
+    def _generate_index_name(self, columns):
+        name = columns[0]
+        suffix = 2
+        while self.find_index(name) is not None:
+            name = u'%s_%s' % (columns[0], suffix)
+            suffix += 1
+        return name
+
+    def add_index(self, kind, name, columns):
+        self.check_columns_exist(columns)
+        if kind == 'PRIMARY':
+            if self.find_index('PRIMARY') is not None:
+                raise SimulationError(
+                    "Multiple primary key defined in table '%s'." % (
+                        self.name,))
+            name = u'PRIMARY'
+        elif name is None:
+            name = self._generate_index_name(columns)
+        elif self.find_index(name) is not None:
+            raise SimulationError(
+                "Duplicate key name '%s' in table '%s'." % (name, self.name))
+        index = Index(kind, name, columns)
+        if kind == 'PRIMARY':
+            self.indexes.insert(0, index)
+        else:
+            self.indexes.append(index)
+
+    def drop_index(self, name):
+        i = self.find_index(name)
+        if i is None:
+            raise SimulationError(
+                "Can't DROP '%s'; check that column/key exists in "
+                "table '%s'." % (name, self.name))
+        del self.indexes[i]
+
+    def add_foreign_key(self, name, index_name, columns, references):
+        self.check_columns_exist(columns)
+        if index_name is None:
+            index_name = name
+        if name is None:
+            self.auto_fk_count += 1
+            name = u'%s_ibfk_%s' % (self.name, self.auto_fk_count)
+        elif self.find_foreign_key(name) is not None:
+            raise SimulationError(
+                "Duplicate foreign key constraint name '%s'." % (name,))
+        self.foreign_keys.append(ForeignKey(name, columns, references))
+        # InnoDB creates an index for the foreign key columns if there is
+        # no index starting with them.
+        for index in self.indexes:
+            if index.columns[:len(columns)] == columns:
+                return
+        if index_name is None or self.find_index(index_name) is not None:
+            index_name = self._generate_index_name(columns)
+        self.indexes.append(Index('INDEX', index_name, columns))
+
+    def drop_foreign_key(self, name):
+        i = self.find_foreign_key(name)
+        if i is None:
+            if self.auto_fk_count:
+                # The name may have been generated by the server in a way
+                # that was not simulated.
+                raise UnsupportedStatementError(
+                    'Cannot resolve foreign key %s.' % (name,))
+            raise SimulationError(
+                "Can't DROP '%s'; check that foreign key exists in "
+                "table '%s'." % (name, self.name))
+        del self.foreign_keys[i]
+
+    def describe(self):
+        lines = [u'TABLE %s' % (self.name,)]
+        for column in self.columns:
+            lines.append(u'  COLUMN %s %s' % (
+                column.name.lower(), column.signature))
+        for index in sorted(
+                self.indexes, key=lambda index: index.name.lower()):
+            lines.append(u'  %s' % (index.describe(),))
+        for foreign_key in sorted(
+                self.foreign_keys,
+                key=lambda foreign_key: foreign_key.name.lower()):
+            lines.append(u'  %s' % (foreign_key.describe(),))
+        return u'\n'.join(lines)
+
+
+class SchemaModel(object):
+    """In-memory model of the tables of a database schema."""
+
+    def __init__(self):
+        super(SchemaModel, self).__init__()
+        self.tables = {}
+
+    @classmethod
+    def from_ddl(cls, ddl):
+        """Creates model from a schema dump.
+
+        Statements wrapped in conditional comments are skipped, the same way
+        they are skipped when normalizing a schema dump.
+        """
+
+        model = cls()
+        for statement in _split_dump(ddl):
+            model.apply_statement(statement)
+        return model
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def structure(self):
+        """Returns canonical text representation of the model."""
+        return u'\n'.join(
+            self.tables[name].describe() for name in sorted(self.tables))
+
+    def checksum(self):
+        return hash_functions.generate_hash(
+            self.structure().encode('utf-8'))
+
+    def get_table(self, name):
+        if name not in self.tables:
+            raise SimulationError("Table '%s' doesn't exist." % (name,))
+        return self.tables[name]
+
+    def apply_sql(self, sql):
+        """Applies all statements in SQL text."""
+        for statement in split_tokens(tokenize(sql)):
+            self.apply_statement(statement)
+
+    def apply_statement(self, tokens):
+        """Applies a single tokenized statement."""
+
+        stream = _TokenStream(tokens)
+        keyword = stream.peek_keyword()
+        if keyword in _NO_EFFECT_STATEMENTS:
+            return
+        elif keyword == 'CREATE':
+            stream.next()
+            self._create(stream)
+        elif keyword == 'ALTER':
+            stream.next()
+            stream.accept('ONLINE', 'OFFLINE')
+            stream.accept('IGNORE')
+            stream.expect('TABLE')
+            self._alter_table(stream)
+        elif keyword == 'DROP':
+            stream.next()
+            self._drop(stream)
+        elif keyword == 'RENAME':
+            stream.next()
+            stream.expect('TABLE')
+            self._rename_tables(stream)
+        else:
+            raise UnsupportedStatementError(
+                'Unsupported statement: %s' % (
+                    u' '.join(t.value for t in tokens[:3]),))
+
+    def _create(self, stream):
+        if stream.accept('TEMPORARY'):
+            # Temporary tables are not part of the schema dump.
+            return
+        if stream.accept('TABLE'):
+            self._create_table(stream)
+            return
+        kind = stream.accept('UNIQUE', 'FULLTEXT', 'SPATIAL') or 'INDEX'
+        if stream.accept('INDEX'):
+            name = stream.identifier()
+            if stream.accept('USING'):
+                stream.next()
+            stream.expect('ON')
+            table = self.get_table(stream.identifier())
+            table.add_index(kind, name, _index_columns(stream.group()))
+            return
+        raise UnsupportedStatementError('Unsupported CREATE statement.')
+
+    def _create_table(self, stream):
+        if_not_exists = False
+        if stream.accept('IF'):
+            stream.expect('NOT')
+            stream.expect('EXISTS')
+            if_not_exists = True
+        name = stream.identifier()
+        if name in self.tables:
+            if if_not_exists:
+                return
+            raise SimulationError("Table '%s' already exists." % (name,))
+        if stream.accept('LIKE'):
+            source = self.get_table(stream.identifier())
+            table = copy.deepcopy(source)
+            table.name = name
+            self.tables[name] = table
+            return
+        if not stream.peek_punct('('):
+            raise UnsupportedStatementError(
+                'CREATE TABLE ... SELECT is not supported.')
+        table = Table(name)
+        for definition in _split_commas(stream.group()):
+            self._add_definition(table, _TokenStream(definition))
+        if not table.columns:
+            raise SimulationError(
+                "A table must have at least 1 column ('%s')." % (name,))
+        # the rest of the statement contains table options
+        if stream.accept('AS', 'SELECT', 'IGNORE', 'REPLACE'):
+            raise UnsupportedStatementError(
+                'CREATE TABLE ... SELECT is not supported.')
+        self.tables[name] = table
+
+    def _add_definition(self, table, stream, allow_column=True):
+        """Adds a column, index or constraint definition to table."""
+
+        constraint_name = None
+        if stream.accept('CONSTRAINT'):
+            if stream.peek_keyword() not in (
+                    'PRIMARY', 'UNIQUE', 'FOREIGN', 'CHECK'):
+                constraint_name = stream.identifier()
+        keyword = stream.peek_keyword()
+        if keyword == 'PRIMARY':
+            stream.next()
+            stream.expect('KEY')
+            self._skip_index_type(stream)
+            table.add_index('PRIMARY', None, _index_columns(stream.group()))
+        elif keyword == 'FOREIGN':
+            stream.next()
+            stream.expect('KEY')
+            index_name = None
+            if not stream.peek_punct('('):
+                index_name = stream.identifier()
+            columns = _index_columns(stream.group())
+            stream.expect('REFERENCES')
+            references = stream.identifier()
+            table.add_foreign_key(
+                constraint_name, index_name, columns, references)
+        elif keyword == 'CHECK':
+            # CHECK constraints are parsed but ignored by MySQL.
+            pass
+        elif keyword in _INDEX_KINDS:
+            stream.next()
+            kind = keyword
+            if kind == 'KEY':
+                kind = 'INDEX'
+            if kind != 'INDEX':
+                stream.accept('INDEX', 'KEY')
+            # the index is named after its constraint, unless it is named
+            name = constraint_name
+            if not stream.peek_punct('(') and stream.peek_keyword() != 'USING':
+                name = stream.identifier()
+            self._skip_index_type(stream)
+            table.add_index(kind, name, _index_columns(stream.group()))
+        elif allow_column:
+            table.add_column(Column.parse(stream.tokens[stream.pos:]))
+        else:
+            raise UnsupportedStatementError('Unsupported table definition.')
+
+    def _skip_index_type(self, stream):
+        if stream.accept('USING'):
+            stream.next()
+
+    def _column_definition(self, stream):
+        """Parses a column definition followed by an optional position."""
+        tokens = stream.until_comma()
+        position = None
+        if tokens and tokens[-1].keyword == 'FIRST':
+            position = ''
+            tokens = tokens[:-1]
+        elif len(tokens) > 2 and tokens[-2].keyword == 'AFTER':
+            position = tokens[-1].value
+            tokens = tokens[:-2]
+        return Column.parse(tokens), position
+
+    def _alter_table(self, stream):
+        name = stream.identifier()
+        table = copy.deepcopy(self.get_table(name))
+        new_name = None
+        while not stream.at_end():
+            new_name = self._alter_specification(
+                table, stream) or new_name
+            if not stream.accept_punct(','):
+                break
+        if not stream.at_end():
+            raise UnsupportedStatementError(
+                'Unsupported ALTER TABLE specification near %r.' % (
+                    stream._near(),))
+        if new_name is not None and new_name != name:
+            if new_name in self.tables:
+                raise SimulationError(
+                    "Table '%s' already exists." % (new_name,))
+            del self.tables[name]
+            table.name = new_name
+            name = new_name
+        self.tables[name] = table
+
+    def _alter_specification(self, table, stream):
+        """Applies a single ALTER TABLE specification.
+
+        Returns the new table name for RENAME specifications.
+        """
+
+        keyword = stream.next().keyword
+        if keyword == 'ADD':
+            if stream.accept('COLUMN') or stream.peek_keyword() not in (
+                    'CONSTRAINT', 'PRIMARY', 'FOREIGN', 'CHECK', 'INDEX',
+                    'KEY', 'UNIQUE', 'FULLTEXT', 'SPATIAL', 'PARTITION'):
+                if stream.peek_punct('('):
+                    for definition in _split_commas(stream.group()):
+                        table.add_column(Column.parse(definition))
+                else:
+                    column, position = self._column_definition(stream)
+                    table.add_column(column, position)
+            elif stream.peek_keyword() == 'PARTITION':
+                raise UnsupportedStatementError(
+                    'Partitioning is not supported.')
+            else:
+                self._add_definition(
+                    table, _TokenStream(stream.until_comma()),
+                    allow_column=False)
+        elif keyword == 'DROP':
+            if stream.accept('PRIMARY'):
+                stream.expect('KEY')
+                table.drop_index('PRIMARY')
+            elif stream.accept('INDEX', 'KEY'):
+                table.drop_index(stream.identifier())
+            elif stream.accept('FOREIGN'):
+                stream.expect('KEY')
+                table.drop_foreign_key(stream.identifier())
+            elif stream.peek_keyword() == 'PARTITION':
+                raise UnsupportedStatementError(
+                    'Partitioning is not supported.')
+            else:
+                stream.accept('COLUMN')
+                table.drop_column(stream.identifier())
+        elif keyword == 'MODIFY':
+            stream.accept('COLUMN')
+            column, position = self._column_definition(stream)
+            table.change_column(column.name, column, position)
+        elif keyword == 'CHANGE':
+            stream.accept('COLUMN')
+            old_name = stream.identifier()
+            column, position = self._column_definition(stream)
+            table.change_column(old_name, column, position)
+        elif keyword == 'ALTER':
+            stream.accept('COLUMN')
+            name = stream.identifier()
+            if table.find_column(name) is None:
+                raise SimulationError(
+                    "Unknown column '%s' in table '%s'." % (
+                        name, table.name))
+            # SET DEFAULT / DROP DEFAULT does not change the column type.
+            stream.until_comma()
+        elif keyword == 'RENAME':
+            if stream.accept('INDEX', 'KEY'):
+                old_name = stream.identifier()
+                stream.expect('TO')
+                new_name = stream.identifier()
+                i = table.find_index(old_name)
+                if i is None:
+                    raise SimulationError(
+                        "Key '%s' doesn't exist in table '%s'." % (
+                            old_name, table.name))
+                if table.find_index(new_name) is not None:
+                    raise SimulationError(
+                        "Duplicate key name '%s'." % (new_name,))
+                table.indexes[i].name = new_name
+            else:
+                stream.accept('TO', 'AS')
+                return stream.identifier()
+        elif keyword in (
+                'ENGINE', 'AUTO_INCREMENT', 'COMMENT', 'ROW_FORMAT',
+                'ALGORITHM', 'LOCK', 'FORCE', 'KEY_BLOCK_SIZE',
+                'AVG_ROW_LENGTH', 'MAX_ROWS', 'MIN_ROWS', 'PACK_KEYS',
+                'CHECKSUM', 'DELAY_KEY_WRITE', 'STATS_PERSISTENT',
+                'STATS_AUTO_RECALC', 'STATS_SAMPLE_PAGES'):
+            # Table options do not change columns or indexes.
+            stream.until_comma()
+        else:
+            raise UnsupportedStatementError(
+                'Unsupported ALTER TABLE specification: %s' % (keyword,))
+        return None
+
+    def _drop(self, stream):
+        if stream.accept('TEMPORARY'):
+            return
+        if stream.accept('INDEX'):
+            name = stream.identifier()
+            stream.expect('ON')
+            table = self.get_table(stream.identifier())
+            table.drop_index(name)
+            return
+        stream.expect('TABLE')
+        if_exists = False
+        if stream.accept('IF'):
+            stream.expect('EXISTS')
+            if_exists = True
+        names = [stream.identifier()]
+        while stream.accept_punct(','):
+            names.append(stream.identifier())
+        missing = [name for name in names if name not in self.tables]
+        if missing and not if_exists:
+            raise SimulationError(
+                "Unknown table '%s'." % (u','.join(missing),))
+        for name in names:
+            self.tables.pop(name, None)
+
+    def _rename_tables(self, stream):
+        while True:
+            old_name = stream.identifier()
+            stream.expect('TO')
+            new_name = stream.identifier()
+            table = self.get_table(old_name)
+            if new_name in self.tables:
+                raise SimulationError(
+                    "Table '%s' already exists." % (new_name,))
+            del self.tables[old_name]
+            table.name = new_name
+            self.tables[new_name] = table
+            if not stream.accept_punct(','):
+                break
+
+
+def _split_dump(ddl):
+    """Yields tokenized statements of a schema dump.
+
+    Statements that are entirely wrapped in conditional comments are skipped.
+    """
+
+    for statement_match in _iter_statement_texts(ddl):
+        text = statement_match.strip()
+        if not text or text.startswith(u'/*!'):
+            continue
+        tokens = tokenize(text)
+        if tokens:
+            yield tokens
+
+
+def _iter_statement_texts(sql):
+    """Yields statement texts split at top level semicolons."""
+    start = 0
+    for match in _TOKEN_RE.finditer(sql):
+        if match.lastgroup == 'punct' and match.group('punct') == ';':
+            yield sql[start:match.start()]
+            start = match.end()
+    yield sql[start:]
+
+
+def simulate_changeset_details(schema_model, changeset_details):
+    """Simulates changeset details in order.
+
+    Returns a list of error messages. Simulation stops at the first detail
+    that fails or contains statements that cannot be simulated.
+    """
+
+    errors = []
+    model = schema_model
+    for changeset_detail in changeset_details:
+        before_structure = model.structure()
+        try:
+            after_model = model.copy()
+            try:
+                after_model.apply_sql(changeset_detail.apply_sql)
+            except SimulationError, e:
+                errors.append(
+                    u'apply_sql failed (changeset detail ID: %s): %s' % (
+                        changeset_detail.id, e))
+                break
+
+            revert_model = after_model.copy()
+            try:
+                revert_model.apply_sql(changeset_detail.revert_sql)
+            except SimulationError, e:
+                errors.append(
+                    u'revert_sql failed (changeset detail ID: %s): %s' % (
+                        changeset_detail.id, e))
+                break
+
+            if revert_model.structure() != before_structure:
+                errors.append(
+                    u'revert_sql does not undo apply_sql '
+                    u'(changeset detail ID: %s).' % (changeset_detail.id,))
+                break
+
+        except UnsupportedStatementError, e:
+            log.info(
+                u'Simulation stopped at changeset detail [id=%s]: %s',
+                changeset_detail.id, e)
+            break
+
+        model = after_model
+    return errors
@@ -1,16 +1,315 @@
-"""
-This file demonstrates writing tests using the unittest module. These will pass
-when you run "manage.py test".
+import logging
+
+from django.test import TestCase
+
+from changesets import models as changesets_models
+from schemaversions import models as schemaversions_models
+from . import changeset_validation, models, schema_simulator
+
+log = logging.getLogger(__name__)
 
-Replace this with more appropriate tests for your application.
+DDL = u"""
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `t01` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(255) DEFAULT NULL,
+  `parent_id` int(11) DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `name` (`name`),
+  KEY `parent_id` (`parent_id`),
+  CONSTRAINT `t01_ibfk_1` FOREIGN KEY (`parent_id`) REFERENCES `t01` (`id`)
+) ENGINE=InnoDB AUTO_INCREMENT=10 DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
 """
 
-from django.test import TestCase
 
+class ChangesetDetailStub(object):
+
+    def __init__(self, id, apply_sql, revert_sql):
+        self.id = id
+        self.apply_sql = apply_sql
+        self.revert_sql = revert_sql
+
+
+class SchemaModelTestCase(TestCase):
+
+    def setUp(self):
+        self.schema_model = schema_simulator.SchemaModel.from_ddl(DDL)
+
+    def test_from_ddl(self):
+        self.assertEqual(self.schema_model.tables.keys(), [u't01'])
+        table = self.schema_model.tables[u't01']
+        self.assertEqual(
+            [column.name for column in table.columns],
+            [u'id', u'name', u'parent_id'])
+        self.assertEqual(
+            sorted(index.name for index in table.indexes),
+            [u'PRIMARY', u'name', u'parent_id'])
+
+    def test_checksum_depends_on_structure(self):
+        schema_model = self.schema_model.copy()
+        checksum = schema_model.checksum()
+        schema_model.apply_sql(u'insert into t01 (name) values (1)')
+        self.assertEqual(schema_model.checksum(), checksum)
+        schema_model.apply_sql(u'alter table t01 add column c int')
+        self.assertNotEqual(schema_model.checksum(), checksum)
+
+    def test_apply_create_alter_drop(self):
+        schema_model = self.schema_model.copy()
+        schema_model.apply_sql(
+            u'create table t02 (id int primary key, t01_id int, '
+            u'foreign key (t01_id) references t01 (id));'
+            u'alter table t02 add column c varchar(10) not null after id, '
+            u'add index c (c);'
+            u'create unique index t02_c on t02 (c, t01_id)')
+        table = schema_model.tables[u't02']
+        self.assertEqual(
+            [column.name for column in table.columns],
+            [u'id', u'c', u't01_id'])
+        self.assertEqual(
+            sorted(index.name for index in table.indexes),
+            [u'PRIMARY', u'c', u't01_id', u't02_c'])
+        schema_model.apply_sql(u'drop table t02')
+        self.assertEqual(
+            schema_model.structure(), self.schema_model.structure())
+
+    def test_constraint_names_unique_index(self):
+        schema_model = self.schema_model.copy()
+        schema_model.apply_sql(
+            u'alter table t01 add column c int, '
+            u'add constraint uq_c unique (c), '
+            u'add constraint unique key c_parent (c, parent_id)')
+        self.assertEqual(
+            sorted(index.name for index in schema_model.tables[u't01'].indexes),
+            [u'PRIMARY', u'c_parent', u'name', u'parent_id', u'uq_c'])
+        schema_model.apply_sql(
+            u'alter table t01 drop index uq_c, drop index c_parent, '
+            u'drop column c')
+        self.assertEqual(
+            schema_model.structure(), self.schema_model.structure())
+
+    def test_errors(self):
+        statements = [
+            u'create table t01 (id int)',
+            u'alter table t01 add column name int',
+            u'alter table t01 drop column c',
+            u'alter table t01 add primary key (name)',
+            u'alter table t02 add column c int',
+            u'create index name on t01 (id)',
+            u'drop table t02',
+            u'rename table t01 to t01',
+        ]
+        for statement in statements:
+            schema_model = self.schema_model.copy()
+            self.assertRaises(
+                schema_simulator.SimulationError,
+                schema_model.apply_sql, statement)
+
+    def test_unsupported_statement(self):
+        self.assertRaises(
+            schema_simulator.UnsupportedStatementError,
+            self.schema_model.copy().apply_sql,
+            u'create procedure p01() begin end')
+
+    def test_simulate_changeset_details(self):
+        changeset_details = [
+            ChangesetDetailStub(
+                1, u'alter table t01 add column c int',
+                u'alter table t01 drop column c'),
+            ChangesetDetailStub(
+                2, u'alter table t01 change c d int',
+                u'alter table t01 change d c int'),
+        ]
+        self.assertEqual(
+            schema_simulator.simulate_changeset_details(
+                self.schema_model, changeset_details),
+            [])
+
+    def test_simulate_changeset_details_errors(self):
+        errors = schema_simulator.simulate_changeset_details(
+            self.schema_model, [ChangesetDetailStub(
+                1, u'alter table t01 add column name int',
+                u'alter table t01 drop column name')])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith(u'apply_sql failed'))
+
+        errors = schema_simulator.simulate_changeset_details(
+            self.schema_model, [ChangesetDetailStub(
+                1, u'alter table t01 add column c int, add index c (c)',
+                u'alter table t01 drop index c')])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith(u'revert_sql does not undo'))
+
+    def test_simulation_stops_at_unsupported_statement(self):
+        errors = schema_simulator.simulate_changeset_details(
+            self.schema_model, [
+                ChangesetDetailStub(
+                    1, u'create procedure p01() begin end',
+                    u'drop procedure p01'),
+                ChangesetDetailStub(
+                    2, u'alter table t01 add column name int',
+                    u'alter table t01 drop column name'),
+            ])
+        self.assertEqual(errors, [])
+
+
+class ChangesetValidatorSchemaSimulationTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        self.database_schema = (
+            schemaversions_models.DatabaseSchema.objects.create(
+                name='test_schema_simulation'))
+        self.schema_version = (
+            schemaversions_models.SchemaVersion.objects.create(
+                database_schema=self.database_schema,
+                ddl=DDL,
+                checksum='checksum'))
+
+    def create_changeset(self, apply_sql, revert_sql):
+        changeset = changesets_models.Changeset.objects.create(
+            database_schema=self.database_schema,
+            type=changesets_models.Changeset.DDL_TABLE_ALTER,
+            classification=changesets_models.Changeset.CLASSIFICATION_PAINLESS,
+        )
+        changesets_models.ChangesetDetail.objects.create(
+            changeset=changeset,
+            description='changeset detail',
+            apply_sql=apply_sql,
+            revert_sql=revert_sql
+        )
+        return changeset
+
+    def get_schema_simulation_result(self, changeset):
+        validation_results = changeset_validation.run_validators(
+            changeset, schema_version=self.schema_version)
+        for validation_result in validation_results:
+            if validation_result['validation_type'].name == 'schema simulation':
+                return validation_result
+        self.fail('No schema simulation result.')
+
+    def test_valid_changeset(self):
+        changeset = self.create_changeset(
+            'alter table t01 add column c int',
+            'alter table t01 drop column c')
+        validation_result = self.get_schema_simulation_result(changeset)
+        self.assertFalse(validation_result['has_errors'])
+        self.assertFalse(
+            validation_result['changeset_validation'].has_errors())
+
+    def test_invalid_changeset(self):
+        changeset = self.create_changeset(
+            'alter table t02 add column c int',
+            'alter table t02 drop column c')
+        validation_result = self.get_schema_simulation_result(changeset)
+        self.assertTrue(validation_result['has_errors'])
+        self.assertTrue(
+            validation_result['changeset_validation'].has_errors())
+        self.assertEqual(
+            models.ChangesetValidation.objects.filter(
+                changeset=changeset,
+                validation_type__name='schema simulation').count(),
+            1)
+
+    def test_results_saved(self):
+        changeset = self.create_changeset(
+            'alter table t01 add column c int',
+            'alter table t01 drop column c')
+        validation_results = changeset_validation.run_validators(
+            changeset, schema_version=self.schema_version)
+        self.assertTrue(validation_results)
+        for validation_result in validation_results:
+            changeset_validation_obj = validation_result[
+                'changeset_validation']
+            self.assertEqual(
+                changeset_validation_obj.validation_type,
+                validation_result['validation_type'])
+            self.assertTrue(changeset_validation_obj.duration is not None)
+
+
+class ValidatorsTestCase(TestCase):
+
+    def run_validator(self, name, changeset_details):
+        parsed_details = changeset_validation.ParsedChangesetDetails(
+            changeset_details)
+        validator = changeset_validation.validator_map[name](
+            None, parsed_details)
+        validator.run_validator()
+        self.assertTrue(validator.duration is not None)
+        return validator
+
+    def test_validator_exception_does_not_reject(self):
+        class FailingValidator(changeset_validation.Validator):
+            name = 'failing'
+
+            def validate(self):
+                raise RuntimeError('validator bug')
+
+        validator = FailingValidator(
+            None, changeset_validation.ParsedChangesetDetails([]))
+        validator.run_validator()
+        self.assertFalse(validator.has_errors)
+        self.assertEqual(validator.validation_log_items, [])
+
+    def test_where_clause_required(self):
+        validator = self.run_validator(
+            'no update or delete without where clause', [
+                ChangesetDetailStub(
+                    1, u'update t01 set name = 1 where id = 1',
+                    u'delete from t01 where id = 1'),
+                ChangesetDetailStub(
+                    2, u'update t01 set name = 1', u'delete from t01'),
+            ])
+        self.assertTrue(validator.has_errors)
+        self.assertEqual(len(validator.validation_log_items), 2)
+        for validation_log_item in validator.validation_log_items:
+            self.assertTrue(u'changeset detail ID: 2' in validation_log_item)
+
+    def test_primary_key_required(self):
+        validator = self.run_validator(
+            'tables have primary key', [
+                ChangesetDetailStub(
+                    1, u'create table t02 (id int primary key)',
+                    u'drop table t02'),
+                ChangesetDetailStub(
+                    2, u'create table t03 (id int, key (id))',
+                    u'drop table t03'),
+            ])
+        self.assertEqual(len(validator.validation_log_items), 1)
+        self.assertTrue(
+            u'changeset detail ID: 2' in validator.validation_log_items[0])
+
+    def test_table_rebuild(self):
+        validator = self.run_validator(
+            'table rebuild', [
+                ChangesetDetailStub(
+                    1, u'alter table t01 add index c (name)',
+                    u'alter table t01 drop index c'),
+                ChangesetDetailStub(
+                    2, u'alter table t01 add column c int',
+                    u'alter table t01 drop index c'),
+            ])
+        self.assertEqual(len(validator.validation_log_items), 1)
+        self.assertTrue(
+            u'changeset detail ID: 2' in validator.validation_log_items[0])
 
-class SimpleTest(TestCase):
-    def test_basic_addition(self):
-        """
-        Tests that 1 + 1 always equals 2.
-        """
-        self.assertEqual(1 + 1, 2)
+    def test_reserved_words(self):
+        validator = self.run_validator(
+            'no reserved words as identifiers', [
+                ChangesetDetailStub(
+                    1, u'create table `order` (id int, `key` int)',
+                    u'drop table `order`'),
+            ])
+        # quoted identifiers are accepted by MySQL
+        self.assertEqual(validator.validation_log_items, [])
+        validator = self.run_validator(
+            'no reserved words as identifiers', [
+                ChangesetDetailStub(
+                    1, u'create table order (id int, `key` int, desc int)',
+                    u'drop table `order`'),
+            ])
+        self.assertEqual(len(validator.validation_log_items), 2)
+        self.assertTrue(u"'order'" in validator.validation_log_items[0])
+        self.assertTrue(u"'desc'" in validator.validation_log_items[1])
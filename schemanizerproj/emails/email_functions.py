@@ -1,17 +1,69 @@
 """Email functions."""
 
+from collections import OrderedDict
 import logging
 from django.conf import settings
 from django.contrib.sites.models import Site
-from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
 from django.core.urlresolvers import reverse
+from django.db import transaction
+from django.template.loader import render_to_string
 from changesetreviews import models as changesetreviews_models
 from servers import models as servers_models
 from users import models as users_models
-from users.models import User, Role
+from users.models import User
+from . import models
 
 log = logging.getLogger(__name__)
 
+DIGEST_SCHEDULED_CACHE_KEY = 'emails:digest_scheduled'
+
+
+def get_dba_emails():
+    """Returns list of emails of DBAs.
+
+    The list is cached until a user or role is changed, see
+    models.invalidate_recipients().
+    """
+
+    emails = cache.get(models.DBA_EMAILS_CACHE_KEY)
+    if emails is None:
+        emails = list(
+            users_models.User.objects.filter(
+                role__name=users_models.Role.NAME.dba).values_list(
+                    'email', flat=True))
+        cache.set(
+            models.DBA_EMAILS_CACHE_KEY, emails,
+            settings.EMAIL_RECIPIENTS_CACHE_TIMEOUT)
+    return list(emails)
+
+
+def get_changeset_recipients(changeset):
+    """Returns emails of DBAs and of the submitter of the changeset."""
+
+    to = get_dba_emails()
+    if changeset.submitted_by.email not in to:
+        to.append(changeset.submitted_by.email)
+    return to
+
+
+def get_site_url(viewname, args):
+    # the current site is cached by the sites framework
+    site = Site.objects.get_current()
+    return 'http://%s%s' % (site.domain, reverse(viewname, args=args))
+
+
+def get_changeset_url(changeset):
+    return get_site_url('changesets_changeset_view', [changeset.pk])
+
+
+def render_body(template_name, context):
+    """Renders email body from a template in templates/emails."""
+
+    return render_to_string(
+        'emails/%s' % (template_name,), context).rstrip('\n')
+
 
 def send_mail(
         subject='', body='', from_email=None, to=None, bcc=None,
@@ -35,64 +87,123 @@ def send_mail(
     msg.send()
 
 
-def send_mail_unknown_schema(server_data_list):
-    # recipients
-    to = list(
-        users_models.User.objects.values_list('email', flat=True)
-        .filter(role__name=users_models.Role.NAME.dba))
+def send_changeset_mail(changeset, subject, body, to):
+    """Sends changeset notification email.
+
+    If settings.EMAIL_DIGEST_WINDOW is not 0, the email is not sent right
+    away. Notifications of a changeset to a recipient within the window are
+    sent together as one digest email by send_notification_digests().
+    """
+
+    if settings.DISABLE_SEND_MAIL:
+        return
+    if not settings.EMAIL_DIGEST_WINDOW:
+        send_mail(subject=subject, body=body, to=to)
+        return
+
+    models.PendingNotification.objects.bulk_create([
+        models.PendingNotification(
+            changeset=changeset, recipient=recipient, subject=subject,
+            body=body)
+        for recipient in OrderedDict.fromkeys(to)])
+    schedule_notification_digests()
+
+
+def schedule_notification_digests():
+    """Queues sending of digests at the end of the digest window, if it
+    has not been queued yet."""
+
+    # imported here, tasks imports this module
+    from . import tasks
+    if cache.add(
+            DIGEST_SCHEDULED_CACHE_KEY, True, settings.EMAIL_DIGEST_WINDOW):
+        tasks.send_notification_digests.apply_async(
+            countdown=settings.EMAIL_DIGEST_WINDOW)
+
+
+def render_digest(notifications):
+    """Returns email message for pending notifications of a changeset to a
+    recipient."""
+
+    if len(notifications) == 1:
+        subject = notifications[0].subject
+        body = notifications[0].body
+    else:
+        subject_counts = OrderedDict()
+        for notification in notifications:
+            subject_counts[notification.subject] = (
+                subject_counts.get(notification.subject, 0) + 1)
+        subject = u'Changeset [id=%s] notifications: %s' % (
+            notifications[0].changeset_id,
+            u', '.join(
+                u'%s (%s)' % (k, v) if v > 1 else k
+                for k, v in subject_counts.iteritems()))
+        separator = u'\n\n%s\n\n' % (u'-' * 70,)
+        body = separator.join(
+            u'%s\n\n%s' % (notification.subject, notification.body)
+            for notification in notifications)
+    return EmailMessage(
+        subject, body, to=[notifications[0].recipient])
+
+
+def send_notification_digests():
+    """Sends pending notifications as one digest per changeset and
+    recipient, through a single SMTP connection.
+
+    Notifications are claimed by deleting them in a short transaction, and
+    sent after it is committed. They are queued again if sending fails.
+    Returns number of digests sent.
+    """
+
+    # notifications queued from now on schedule the next digests
+    cache.delete(DIGEST_SCHEDULED_CACHE_KEY)
+    with transaction.commit_on_success():
+        notifications = list(
+            models.PendingNotification.objects.select_for_update().order_by(
+                'id'))
+        models.PendingNotification.objects.filter(
+            pk__in=[notification.pk for notification in notifications]
+        ).delete()
+
+    groups = OrderedDict()
+    for notification in notifications:
+        groups.setdefault(
+            (notification.changeset_id, notification.recipient),
+            []).append(notification)
+    messages = [
+        render_digest(group_notifications)
+        for group_notifications in groups.itervalues()]
+    if messages and not settings.DISABLE_SEND_MAIL:
+        try:
+            connection = get_connection()
+            connection.send_messages(messages)
+        except Exception:
+            # notifications are sent with the next digests
+            models.PendingNotification.objects.bulk_create(notifications)
+            schedule_notification_digests()
+            raise
+    log.info(u'%s notification digest(s) sent.' % (len(messages),))
+    return len(messages)
+
 
+def send_mail_unknown_schema(server_data_list):
+    to = get_dba_emails()
     subject = 'Unknown schema versions'
-    lines = [
-        u'The following is a list of hosts that have unknown schema versions:',
-        u''
-    ]
-
-    for server_data in server_data_list:
-        lines.append(u'Host: %s' % server_data.server.hostname)
-        if server_data.schema_exists:
-            lines.append(u'Database schema: %s' % server_data.database_schema.name)
-        else:
-            lines.append(
-                u'Database schema: %s (does not exist on host)' %
-                server_data.database_schema.name)
-        lines.append(u'Schema version diff:')
-        lines.append(server_data.schema_version_diff)
-        lines.append(u'')
-
-    send_mail(subject=subject, body=u'\n'.join(lines), to=to)
+    body = render_body(
+        'unknown_schema.txt', dict(server_data_list=server_data_list))
+    send_mail(subject=subject, body=body, to=to)
 
 
 def send_mail_changeset_submitted(changeset):
     """Sends changeset submitted email."""
 
-    # urls
-    site = Site.objects.get_current()
-    changeset_url = 'http://%s%s' % (
-        site.domain,
-        reverse(
-            'changesets_changeset_view', args=[changeset.id]))
-
-    # recipients
-    to = list(
-        users_models.User.objects.values_list('email', flat=True)
-        .filter(role__name=users_models.Role.NAME.dba))
-    if changeset.submitted_by.email not in to:
-        to.append(changeset.submitted_by.email)
-
+    to = get_changeset_recipients(changeset)
     if to:
         subject = u'Changeset submitted.'
-
-        lines = []
-        lines.append(u'New changeset was submitted by %s:' % (
-            changeset.submitted_by.name,))
-        lines.append(changeset_url)
-        lines.append(u'')
-        lines.append(u'Changeset review process has been started.')
-        lines.append(
-            u'The result will be emailed to interested parties once the '
-            u'process has completed.')
-
-        send_mail(subject=subject, body=u'\n'.join(lines), to=to)
+        body = render_body('changeset_submitted.txt', dict(
+            changeset=changeset,
+            changeset_url=get_changeset_url(changeset)))
+        send_changeset_mail(changeset, subject, body, to)
     else:
         log.warn('Changeset submitted email has no recipients.')
 
@@ -103,54 +214,19 @@ def send_mail_changeset_reviewed(changeset):
     changeset_review = changesetreviews_models.ChangesetReview.objects.get(
         changeset=changeset)
 
-    # urls
-    site = Site.objects.get_current()
-    changeset_url = 'http://%s%s' % (
-        site.domain,
-        reverse('changesets_changeset_view', args=[changeset.id]))
-    review_results_url = 'http://%s%s' % (
-        site.domain,
-        reverse(
-            'changesetreviews_result', args=[changeset.id]))
-    schema_version_url = 'http://%s%s' % (
-        site.domain,
-        reverse(
-            'schemaversions_schema_version',
-            args=[changeset_review.schema_version.pk]))
-
-    # recipients
-    to = list(
-        users_models.User.objects.values_list('email', flat=True).filter(
-            role__name=users_models.Role.NAME.dba))
-    if changeset.submitted_by.email not in to:
-        to.append(changeset.submitted_by.email)
-
+    to = get_changeset_recipients(changeset)
     if to:
         subject = 'Changeset reviewed'
-        lines = []
-
-        if changeset_review.success:
-            lines.append(
-                u"The following changeset has been reviewed without errors "
-                u"and is ready for approval:")
-        else:
-            lines.append(
-                u"The following changeset has errors and was rejected:")
-        lines.append(changeset_url)
-        lines.append(u'')
-        lines.append(
-            u'The results of changeset review process can be viewed at:')
-        lines.append(review_results_url)
-        lines.append(u'')
-
-        lines.append(u'The changeset was tested against schema version:')
-        lines.append(schema_version_url)
-
-        if changeset_review.results_log:
-            lines.append(u'Results log:')
-            lines.append(u'%s' % (changeset_review.results_log,))
-
-        send_mail(subject=subject, body=u'\n'.join(lines), to=to)
+        body = render_body('changeset_reviewed.txt', dict(
+            changeset=changeset,
+            changeset_review=changeset_review,
+            changeset_url=get_changeset_url(changeset),
+            review_results_url=get_site_url(
+                'changesetreviews_result', [changeset.pk]),
+            schema_version_url=get_site_url(
+                'schemaversions_schema_version',
+                [changeset_review.schema_version_id])))
+        send_changeset_mail(changeset, subject, body, to)
 
         log.debug(u'Reviewed changeset email sent to: %s' % (to,))
     else:
@@ -160,26 +236,13 @@ def send_mail_changeset_reviewed(changeset):
 def send_mail_changeset_approved(changeset):
     """Sends changeset approved email."""
 
-    # urls
-    site = Site.objects.get_current()
-    changeset_url = 'http://%s%s' % (
-        site.domain,
-        reverse('changesets_changeset_view', args=[changeset.id]))
-
-    # recipients
-    to = list(
-        users_models.User.objects.values_list('email', flat=True)
-        .filter(role__name=users_models.Role.NAME.dba))
-    if changeset.submitted_by.email not in to:
-        to.append(changeset.submitted_by.email)
-
+    to = get_changeset_recipients(changeset)
     if to:
         subject = u'Changeset approved'
-        body = (
-            u'The following is the URL of the changeset that was approved '
-            u'by %s: \n%s' % (
-                changeset.approved_by.name, changeset_url,))
-        send_mail(subject=subject, body=body, to=to)
+        body = render_body('changeset_approved.txt', dict(
+            changeset=changeset,
+            changeset_url=get_changeset_url(changeset)))
+        send_changeset_mail(changeset, subject, body, to)
         log.info(u'Changeset approved email sent to: %s' % (to,))
     else:
         log.warn('Changeset approved email has no recipients.')
@@ -188,27 +251,13 @@ def send_mail_changeset_approved(changeset):
 def send_mail_changeset_updated(changeset):
     """Sends changeset updated email."""
 
-    # urls
-    site = Site.objects.get_current()
-    changeset_url = 'http://%s%s' % (
-        site.domain,
-        reverse('changesets_changeset_view', args=[changeset.id]))
-
-    # recipients
-    to = list(
-        users_models.User.objects.values_list('email', flat=True)
-        .filter(role__name=users_models.Role.NAME.dba))
-    if changeset.submitted_by.email not in to:
-        to.append(changeset.submitted_by.email)
-
+    to = get_changeset_recipients(changeset)
     if to:
         subject = u'Changeset updated'
-        body_lines = [
-            u'The following is the URL for the changeset that was updated:',
-            changeset_url
-        ]
-        body = u'\n'.join(body_lines)
-        send_mail(subject=subject, body=body, to=to)
+        body = render_body('changeset_updated.txt', dict(
+            changeset=changeset,
+            changeset_url=get_changeset_url(changeset)))
+        send_changeset_mail(changeset, subject, body, to)
         log.info(u'Changeset updated email sent to: %s' % (to,))
     else:
         log.warn('Changeset updated mail has no recipients.')
@@ -217,25 +266,13 @@ def send_mail_changeset_updated(changeset):
 def send_mail_changeset_rejected(changeset):
     """Sends changeset rejected mail."""
 
-    # urls
-    site = Site.objects.get_current()
-    changeset_url = 'http://%s%s' % (
-        site.domain,
-        reverse('changesets_changeset_view', args=[changeset.id]))
-
-    to = list(
-        users_models.User.objects.values_list('email', flat=True)
-        .filter(role__name=users_models.Role.NAME.dba))
-    if changeset.submitted_by.email not in to:
-        to.append(changeset.submitted_by.email)
-
+    to = get_changeset_recipients(changeset)
     if to:
         subject = u'Changeset rejected'
-        body = (
-            u'The following is the URL of the changeset that was rejected '
-            u'by %s: \n%s' % (
-                changeset.approved_by.name, changeset_url,))
-        send_mail(subject=subject, body=body, to=to)
+        body = render_body('changeset_rejected.txt', dict(
+            changeset=changeset,
+            changeset_url=get_changeset_url(changeset)))
+        send_changeset_mail(changeset, subject, body, to)
         log.info(u'Changeset rejected email sent to: %s' % (to,))
     else:
         log.warn('Changeset rejected email has no recipients.')
@@ -245,32 +282,13 @@ def send_mail_changeset_applied(changeset_apply):
     """Sends changeset applied email."""
 
     changeset = changeset_apply.changeset
-
-    # urls
-    site = Site.objects.get_current()
-    changeset_url = 'http://%s%s' % (
-        site.domain,
-        reverse(
-            'changesets_changeset_view',
-            args=[changeset.pk]))
-
-    # recipients
-    to = list(
-        users_models.User.objects.values_list('email', flat=True)
-        .filter(role__name=users_models.Role.NAME.dba))
-    if changeset.submitted_by.email not in to:
-        to.append(changeset.submitted_by.email)
-
+    to = get_changeset_recipients(changeset)
     if to:
         subject = 'Changeset applied'
-        body_lines = []
-        body_lines.append(
-            u"The following changeset has been applied at server '%s' "
-            u"by %s:" % (
-                changeset_apply.server.name, changeset_apply.applied_by))
-        body_lines.append(changeset_url)
-        body = u'\n'.join(body_lines)
-        send_mail(subject=subject, body=body, to=to)
+        body = render_body('changeset_applied.txt', dict(
+            changeset_apply=changeset_apply,
+            changeset_url=get_changeset_url(changeset)))
+        send_changeset_mail(changeset, subject, body, to)
         log.debug(u'Applied changeset email sent to: %s' % (to,))
     else:
         log.warn('Changeset applied email has no recipients.')
@@ -280,10 +298,7 @@ def send_changeset_submission_through_repo_failed_mail(
         changeset_content, error_message, file_data, commit_data):
     """Sends changeset-submission-through-repo-failed email."""
 
-    # recipients
-    to = list(
-        User.objects.values_list('email', flat=True)
-        .filter(role__name=Role.ROLE_DBA))
+    to = get_dba_emails()
 
     committer_user = None
     if 'committer' in commit_data and 'login' in commit_data['committer']:
@@ -296,27 +311,12 @@ def send_changeset_submission_through_repo_failed_mail(
 
     if to:
         subject = u'Changeset submission through repository failed.'
-        lines = []
-
-        lines.append(u'Changeset data from repo')
-        lines.append(u'========================')
-        lines.append(u'')
-        lines.append(u'Filename: %s' % (file_data['filename'],))
-        lines.append(u'')
-        lines.append(u'Content')
-        lines.append(u'-------')
-        lines.append(u'%s' % (changeset_content,))
-        lines.append(u'')
-        lines.append(
-            u'Changeset submission process failed with the following '
-            u'message:')
-        lines.append(
-            u'-------------------------------------------------------'
-            u'--------')
-
-        lines.append(u'%s' % (error_message,))
-
-        send_mail(subject=subject, body=u'\n'.join(lines), to=to)
+        body = render_body(
+            'changeset_submission_through_repo_failed.txt', dict(
+                changeset_content=changeset_content,
+                error_message=error_message,
+                file_data=file_data))
+        send_mail(subject=subject, body=body, to=to)
 
         log.info(
             u"New changeset-sumission-through-repository-failed email sent "
@@ -325,4 +325,4 @@ def send_changeset_submission_through_repo_failed_mail(
     else:
         log.warn(
             'Changeset-submission-through-repo-failed email has no '
-            'recipients.')
\ No newline at end of file
+            'recipients.')
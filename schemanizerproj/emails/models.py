@@ -1,3 +1,38 @@
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from users import models as users_models
+from utils import models as utils_models
 
-# Create your models here.
+# cache key of the list of DBA emails, see email_functions.get_dba_emails()
+DBA_EMAILS_CACHE_KEY = 'emails:dba_emails'
+
+
+class PendingNotification(utils_models.TimeStampedModel):
+    """Changeset notification email to a recipient that has not been sent.
+
+    Pending notifications of a changeset and recipient are sent together
+    as a single digest email.
+    """
+
+    changeset = models.ForeignKey('changesets.Changeset')
+    recipient = models.EmailField(max_length=255)
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'pending_notifications'
+
+    def __unicode__(self):
+        return u'PendingNotification [id=%s]' % self.pk
+
+
+def invalidate_recipients(sender, **kwargs):
+    """Clears cached recipients when a user or role changes."""
+
+    cache.delete(DBA_EMAILS_CACHE_KEY)
+
+
+for sender in (users_models.User, users_models.Role):
+    post_save.connect(invalidate_recipients, sender=sender)
+    post_delete.connect(invalidate_recipients, sender=sender)
@@ -0,0 +1,39 @@
+"""Subscribers that send emails for events."""
+
+from events import event_bus
+from events import models as events_models
+from . import tasks
+
+TYPE = events_models.Event.TYPE
+
+
+@event_bus.subscriber(TYPE.changeset_submitted)
+def on_changeset_submitted(event):
+    if event.data.get('notify', True):
+        tasks.send_mail_changeset_submitted.delay(event.data['changeset_pk'])
+
+
+@event_bus.subscriber(TYPE.changeset_reviewed)
+def on_changeset_reviewed(event):
+    tasks.send_mail_changeset_reviewed.delay(event.data['changeset_pk'])
+
+
+@event_bus.subscriber(TYPE.changeset_approved)
+def on_changeset_approved(event):
+    tasks.send_mail_changeset_approved.delay(event.data['changeset_pk'])
+
+
+@event_bus.subscriber(TYPE.changeset_updated)
+def on_changeset_updated(event):
+    tasks.send_mail_changeset_updated.delay(event.data['changeset_pk'])
+
+
+@event_bus.subscriber(TYPE.changeset_rejected)
+def on_changeset_rejected(event):
+    tasks.send_mail_changeset_rejected.delay(event.data['changeset_pk'])
+
+
+@event_bus.subscriber(TYPE.changeset_applied)
+def on_changeset_applied(event):
+    tasks.send_mail_changeset_applied.delay(
+        event.data['changeset_apply_pk'])
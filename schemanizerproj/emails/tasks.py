@@ -69,6 +69,16 @@ def send_mail_changeset_applied(changeset_apply_pk):
         raise
 
 
+@task(ignore_result=True)
+def send_notification_digests():
+    """Sends digests of pending changeset notifications."""
+    try:
+        email_functions.send_notification_digests()
+    except:
+        log.exception('EXCEPTION')
+        raise
+
+
 @task(ignore_result=True)
 def send_changeset_submission_through_repo_failed_mail(
         changeset_content, error_message, file_data, commit_data):
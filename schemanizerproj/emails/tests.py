@@ -5,7 +5,17 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import asyncore
+import email
+import smtpd
+import threading
+from django.core import mail
+from django.core.cache import cache
 from django.test import TestCase
+from changesets import models as changesets_models
+from schemaversions import models as schemaversions_models
+from users import models as users_models
+from . import email_functions, models, tasks
 
 
 class SimpleTest(TestCase):
@@ -14,3 +24,175 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class SMTPSink(smtpd.SMTPServer):
+    """Local SMTP server that keeps the messages it receives."""
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.messages = []
+        self.connection_count = 0
+        self.thread = threading.Thread(
+            target=asyncore.loop, kwargs={'timeout': 0.1})
+
+    def handle_accept(self):
+        self.connection_count += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.messages.append((rcpttos, email.message_from_string(data)))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.close()
+        self.thread.join(5)
+
+
+class NotificationDigestTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        cache.delete(email_functions.DIGEST_SCHEDULED_CACHE_KEY)
+        self.scheduled = []
+        self.send_notification_digests = tasks.send_notification_digests
+        test_case = self
+
+        class TaskStub(object):
+            def apply_async(self, countdown=None):
+                test_case.scheduled.append(countdown)
+
+        tasks.send_notification_digests = TaskStub()
+
+        database_schema = schemaversions_models.DatabaseSchema.objects.create(
+            name='test_notification_digest')
+        self.user_dev01 = users_models.User.objects.get(name='dev01')
+        self.changesets = [
+            changesets_models.Changeset.objects.create(
+                database_schema=database_schema,
+                submitted_by=self.user_dev01)
+            for i in range(2)]
+        self.recipients = set(
+            users_models.User.objects.filter(
+                role__name=users_models.Role.NAME.dba).values_list(
+                    'email', flat=True))
+        self.recipients.add(self.user_dev01.email)
+
+        self.sink = SMTPSink()
+        self.sink.start()
+
+    def tearDown(self):
+        self.sink.stop()
+        tasks.send_notification_digests = self.send_notification_digests
+
+    def send_digests(self):
+        with self.settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.sink.port,
+                EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+                EMAIL_USE_TLS=False):
+            return email_functions.send_notification_digests()
+
+    def test_digests(self):
+        with self.settings(EMAIL_DIGEST_WINDOW=60):
+            for i in range(3):
+                email_functions.send_mail_changeset_updated(
+                    self.changesets[0])
+            email_functions.send_mail_changeset_updated(self.changesets[1])
+        # sending is scheduled once per window
+        self.assertEqual(self.scheduled, [60])
+        self.assertEqual(len(mail.outbox), 0)
+
+        count = self.send_digests()
+
+        self.assertEqual(count, len(self.recipients) * 2)
+        self.assertEqual(self.sink.connection_count, 1)
+        self.assertEqual(len(self.sink.messages), count)
+        subjects = set()
+        for rcpttos, message in self.sink.messages:
+            self.assertEqual(len(rcpttos), 1)
+            self.assertTrue(rcpttos[0] in self.recipients)
+            subjects.add(message['Subject'])
+        self.assertEqual(
+            subjects,
+            set([
+                u'Changeset [id=%s] notifications: Changeset updated (3)' % (
+                    self.changesets[0].pk,),
+                u'Changeset updated']))
+        self.assertFalse(models.PendingNotification.objects.exists())
+
+    def test_notifications_queued_again_if_sending_fails(self):
+
+        class FailingConnection(object):
+            def send_messages(self, messages):
+                raise IOError('Connection refused.')
+
+        get_connection = email_functions.get_connection
+        email_functions.get_connection = FailingConnection
+        try:
+            with self.settings(
+                    EMAIL_DIGEST_WINDOW=60, DISABLE_SEND_MAIL=False):
+                email_functions.send_mail_changeset_updated(
+                    self.changesets[0])
+                notification_ids = list(
+                    models.PendingNotification.objects.order_by(
+                        'id').values_list('id', flat=True))
+                self.assertRaises(
+                    IOError, email_functions.send_notification_digests)
+        finally:
+            email_functions.get_connection = get_connection
+        self.assertEqual(
+            list(models.PendingNotification.objects.order_by(
+                'id').values_list('id', flat=True)),
+            notification_ids)
+        self.assertEqual(self.scheduled, [60, 60])
+
+    def test_no_digest_window(self):
+        with self.settings(EMAIL_DIGEST_WINDOW=0):
+            email_functions.send_mail_changeset_updated(self.changesets[0])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.scheduled, [])
+        self.assertFalse(models.PendingNotification.objects.exists())
+
+
+class RecipientCacheTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        cache.delete(models.DBA_EMAILS_CACHE_KEY)
+
+    def test_dba_emails_cached(self):
+        emails = email_functions.get_dba_emails()
+        self.assertEqual(
+            set(emails),
+            set(users_models.User.objects.filter(
+                role__name=users_models.Role.NAME.dba).values_list(
+                    'email', flat=True)))
+        with self.assertNumQueries(0):
+            self.assertEqual(email_functions.get_dba_emails(), emails)
+
+    def test_cache_invalidated_on_user_change(self):
+        email_functions.get_dba_emails()
+        user = users_models.User.objects.get(name='dev01')
+        user.role = users_models.Role.objects.get(
+            name=users_models.Role.NAME.dba)
+        user.save()
+        self.assertTrue(user.email in email_functions.get_dba_emails())
+
+    def test_render_body(self):
+        database_schema = schemaversions_models.DatabaseSchema.objects.create(
+            name='test_render_body')
+        changeset = changesets_models.Changeset.objects.create(
+            database_schema=database_schema,
+            submitted_by=users_models.User.objects.get(name='dev01'))
+        changeset_url = email_functions.get_changeset_url(changeset)
+        self.assertEqual(
+            email_functions.render_body('changeset_updated.txt', dict(
+                changeset=changeset, changeset_url=changeset_url)),
+            u'The following is the URL for the changeset that was '
+            u'updated:\n%s' % (changeset_url,))
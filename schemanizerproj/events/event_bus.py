@@ -0,0 +1,161 @@
+"""Event bus.
+
+Events are recorded with record(). While events are buffered, in a request
+or a Celery task, they are kept in memory and inserted with a single query
+when the request or task finishes. Otherwise they are inserted right away.
+
+Subscribers of an event type are called after the event has been inserted.
+They are registered with subscribe() or the subscriber() decorator by the
+modules listed in settings.EVENT_SUBSCRIBER_MODULES, which are imported when
+the first event is dispatched.
+"""
+
+import importlib
+import logging
+import threading
+from celery import signals
+from django.conf import settings
+from django.utils import timezone
+from . import models
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+_subscribers = {}
+_subscriber_modules_loaded = False
+_subscriber_modules_lock = threading.Lock()
+
+
+def subscribe(event_type, func):
+    """Registers func to be called with each inserted event of event_type.
+
+    The event has a data attribute, the dict of keyword arguments passed to
+    record().
+    """
+
+    _subscribers.setdefault(event_type, []).append(func)
+
+
+def subscriber(*event_types):
+    """Decorator that subscribes a function to event types."""
+
+    def decorator(func):
+        for event_type in event_types:
+            subscribe(event_type, func)
+        return func
+    return decorator
+
+
+def _load_subscriber_modules():
+    global _subscriber_modules_loaded
+    if _subscriber_modules_loaded:
+        return
+    with _subscriber_modules_lock:
+        if not _subscriber_modules_loaded:
+            for module_name in settings.EVENT_SUBSCRIBER_MODULES:
+                importlib.import_module(module_name)
+            _subscriber_modules_loaded = True
+
+
+def get_subscribers(event_type):
+    _load_subscriber_modules()
+    return list(_subscribers.get(event_type, []))
+
+
+def _dispatch(event):
+    for func in get_subscribers(event.type):
+        try:
+            func(event)
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            log.exception(msg)
+
+
+def _insert(events):
+    if not events:
+        return
+    if len(events) == 1:
+        events[0].save()
+    else:
+        models.Event.objects.bulk_create(events)
+    for event in events:
+        _dispatch(event)
+
+
+def begin():
+    """Starts buffering events recorded by the current thread.
+
+    Calls can be nested, buffered events are inserted by the end() call of
+    the outermost begin().
+    """
+
+    depth = getattr(_local, 'depth', 0)
+    if depth == 0:
+        _local.events = []
+    _local.depth = depth + 1
+
+
+def end():
+    """Inserts buffered events if buffering was started by the matching
+    begin() call."""
+
+    depth = getattr(_local, 'depth', 0)
+    if depth == 0:
+        return
+    _local.depth = depth - 1
+    if _local.depth == 0:
+        events = _local.events
+        _local.events = None
+        _insert(events)
+
+
+def end_all():
+    """Inserts buffered events and stops buffering, whatever the number of
+    unmatched begin() calls."""
+
+    if getattr(_local, 'depth', 0):
+        _local.depth = 1
+        end()
+
+
+class buffered(object):
+    """Context manager that buffers events recorded within it."""
+
+    def __enter__(self):
+        begin()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # events of actions that were done before an error are still saved
+        end()
+
+
+def record(event_type, description='', user=None, **data):
+    """Records event and returns it.
+
+    Keyword arguments are not saved, they are passed to subscribers as the
+    data attribute of the event.
+    """
+
+    event = models.Event(
+        datetime=timezone.now(), type=event_type, description=description,
+        user=user)
+    event.data = data
+    events = getattr(_local, 'events', None)
+    if events is None:
+        _insert([event])
+    else:
+        events.append(event)
+        if len(events) >= settings.EVENT_BUFFER_MAX_SIZE:
+            _local.events = []
+            _insert(events)
+    return event
+
+
+@signals.task_prerun.connect
+def _on_task_prerun(**kwargs):
+    begin()
+
+
+@signals.task_postrun.connect
+def _on_task_postrun(**kwargs):
+    end()
@@ -0,0 +1,88 @@
+"""Event retention functions."""
+
+import gzip
+import json
+import logging
+import os
+from django.db import transaction
+from . import models
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def get_archive_filename(dt):
+    """Returns name of the archive file of events of the month of dt."""
+
+    return 'events-%04d-%02d.json.gz' % (dt.year, dt.month)
+
+
+def _to_archive_record(values):
+    return {
+        'id': values['id'],
+        'datetime': values['datetime'].isoformat(),
+        'type': values['type'],
+        'description': values['description'],
+        'user_id': values['user_id'],
+        'user_name': values['user__name'],
+    }
+
+
+def archive_events(before, archive_dir, batch_size=ARCHIVE_BATCH_SIZE):
+    """Moves events older than before to monthly archive files.
+
+    Events are appended to gzip compressed files in archive_dir, one JSON
+    object per line, and are deleted only after they have been written. If
+    archiving is interrupted, events of the last batch may be archived
+    again on the next run, they have the same id.
+
+    Returns number of archived events.
+    """
+
+    if not os.path.isdir(archive_dir):
+        os.makedirs(archive_dir)
+    count = 0
+    while True:
+        # the oldest events are read from the datetime index, rows of
+        # previous batches have been deleted
+        rows = list(
+            models.Event.objects.filter(datetime__lt=before).order_by(
+                'datetime', 'id').values(
+                    'id', 'datetime', 'type', 'description', 'user_id',
+                    'user__name')[:batch_size])
+        if not rows:
+            break
+
+        records_by_filename = {}
+        for row in rows:
+            records_by_filename.setdefault(
+                get_archive_filename(row['datetime']), []).append(
+                    _to_archive_record(row))
+        for filename, records in sorted(records_by_filename.iteritems()):
+            f = gzip.open(os.path.join(archive_dir, filename), 'ab')
+            try:
+                for record in records:
+                    f.write(json.dumps(record))
+                    f.write('\n')
+            finally:
+                f.close()
+
+        with transaction.commit_on_success():
+            models.Event.objects.filter(
+                pk__in=[row['id'] for row in rows]).delete()
+        count += len(rows)
+        log.debug('%s event(s) were archived.' % (count,))
+    return count
+
+
+def iter_archived_events(path):
+    """Yields events, as dicts, of an archive file."""
+
+    f = gzip.open(path, 'rb')
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        f.close()
@@ -0,0 +1,22 @@
+from . import event_bus
+
+
+class EventBusMiddleware(object):
+    """Buffers events recorded while handling a request, they are inserted
+    when the response is returned.
+
+    process_response() is not called if a response middleware before it
+    raises an exception, buffering left over by an earlier request of the
+    thread is then ended when the next request starts.
+    """
+
+    def process_request(self, request):
+        event_bus.end_all()
+        event_bus.begin()
+        request._event_bus_buffering = True
+
+    def process_response(self, request, response):
+        if getattr(request, '_event_bus_buffering', False):
+            request._event_bus_buffering = False
+            event_bus.end()
+        return response
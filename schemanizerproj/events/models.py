@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import model_utils
 
 
@@ -15,7 +16,8 @@ class Event(models.Model):
         'changeset_updated', 'changeset_soft_deleted',
         'changeset_applied', 'changeset_apply_failed')
 
-    datetime = models.DateTimeField(auto_now_add=True, blank=True)
+    datetime = models.DateTimeField(
+        default=timezone.now, blank=True, db_index=True)
     type = models.CharField(choices=TYPE, max_length=255)
     description = models.TextField(blank=True, default='')
     user = models.ForeignKey(
@@ -24,6 +26,8 @@ class Event(models.Model):
 
     class Meta:
         db_table = 'events'
+        # audit queries filter by type or user within a time range
+        index_together = (('type', 'datetime'), ('user', 'datetime'))
 
     def __unicode__(self):
         """Returns the unicode representation of the object."""
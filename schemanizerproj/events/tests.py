@@ -5,11 +5,19 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import base64
+import datetime
+import json
+import shutil
+import tempfile
+from django.core.urlresolvers import reverse
+from django.http import HttpRequest, HttpResponse
 from django.test import TestCase
 from django.utils import timezone
 import factory
+from utils import pagination
 from schemanizer import models as schemanizer_models
-from . import models
+from . import event_bus, event_functions, middleware, models
 from users.models import User
 
 
@@ -19,7 +27,7 @@ class EventFactory(factory.DjangoModelFactory):
     datetime = factory.LazyAttribute(lambda obj: timezone.now())
     type = factory.Sequence(lambda n: 'type%d' % (n,))
     description = factory.Sequence(lambda n: 'description%d' % (n,))
-    user = User.objects.get(name='admin')
+    user = factory.LazyAttribute(lambda obj: User.objects.get(name='admin'))
 
 
 class SimpleTest(TestCase):
@@ -28,3 +36,174 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class EventTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        # the tests only count events they create
+        models.Event.objects.all().delete()
+
+    def create_events(self, start, count, days=1):
+        return [
+            EventFactory.create(
+                datetime=start + datetime.timedelta(days=i * days))
+            for i in range(count)]
+
+
+class EventPaginationTestCase(EventTestCase):
+
+    def setUp(self):
+        super(EventPaginationTestCase, self).setUp()
+        start = timezone.now() - datetime.timedelta(days=10)
+        # events with the same datetime are ordered by id
+        self.events = self.create_events(start, 3) + self.create_events(
+            start + datetime.timedelta(days=3), 2, days=0)
+        self.ordering = ('-datetime', '-id')
+
+    def test_get_page(self):
+        expected = sorted(
+            self.events, key=lambda event: (event.datetime, event.pk),
+            reverse=True)
+        pages = []
+        cursor = None
+        while True:
+            objects, cursor = pagination.get_page(
+                models.Event.objects.all(), self.ordering, 2, cursor=cursor)
+            pages.append([event.pk for event in objects])
+            if cursor is None:
+                break
+        self.assertEqual(
+            pages,
+            [[event.pk for event in expected[i:i + 2]]
+                for i in range(0, len(expected), 2)])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(pagination.InvalidCursorError):
+            pagination.get_page(
+                models.Event.objects.all(), self.ordering, 2, cursor='x')
+
+    def test_event_api(self):
+        authorization = 'Basic %s' % (base64.b64encode('admin:admin'),)
+        url = reverse(
+            'api_dispatch_list',
+            kwargs={'api_name': 'v1', 'resource_name': 'event'})
+        response = self.client.get(
+            url, {'limit': 3, 'format': 'json'},
+            HTTP_AUTHORIZATION=authorization)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['objects']), 3)
+        self.assertFalse('total_count' in data['meta'])
+
+        response = self.client.get(
+            data['meta']['next'], HTTP_AUTHORIZATION=authorization)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['objects']), 2)
+        self.assertEqual(data['meta']['next'], None)
+
+
+class ArchiveEventsTestCase(EventTestCase):
+
+    def setUp(self):
+        super(ArchiveEventsTestCase, self).setUp()
+        self.archive_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.archive_dir)
+
+    def test_archive_events(self):
+        old_events = self.create_events(
+            datetime.datetime(2013, 1, 30, tzinfo=timezone.utc), 3)
+        new_events = self.create_events(timezone.now(), 1)
+        before = datetime.datetime(2013, 3, 1, tzinfo=timezone.utc)
+
+        count = event_functions.archive_events(
+            before, self.archive_dir, batch_size=2)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            list(models.Event.objects.values_list('pk', flat=True)),
+            [event.pk for event in new_events])
+        archived = list(event_functions.iter_archived_events(
+            '%s/events-2013-01.json.gz' % (self.archive_dir,)))
+        archived += list(event_functions.iter_archived_events(
+            '%s/events-2013-02.json.gz' % (self.archive_dir,)))
+        self.assertEqual(
+            [event['id'] for event in archived],
+            [event.pk for event in old_events])
+        self.assertEqual(archived[0]['user_name'], 'admin')
+        self.assertEqual(archived[0]['type'], old_events[0].type)
+
+
+class EventBusTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    event_type = 'event_bus_test'
+
+    def setUp(self):
+        self.user = User.objects.get(name='admin')
+        self.dispatched = []
+        event_bus.subscribe(self.event_type, self.dispatched.append)
+
+    def tearDown(self):
+        event_bus._subscribers[self.event_type].remove(
+            self.dispatched.append)
+
+    def test_record(self):
+        event = event_bus.record(
+            self.event_type, 'description', self.user, changeset_pk=1)
+        self.assertTrue(event.pk)
+        self.assertEqual(self.dispatched, [event])
+        self.assertEqual(self.dispatched[0].data, {'changeset_pk': 1})
+
+    def test_buffered(self):
+        with event_bus.buffered():
+            for i in range(3):
+                event_bus.record(self.event_type, 'description%s' % (i,))
+            with event_bus.buffered():
+                event_bus.record(self.event_type, 'description3')
+            # events are inserted by the outermost buffered()
+            self.assertFalse(
+                models.Event.objects.filter(type=self.event_type).exists())
+            self.assertEqual(self.dispatched, [])
+
+        self.assertEqual(
+            list(models.Event.objects.filter(
+                type=self.event_type).order_by('id').values_list(
+                    'description', flat=True)),
+            ['description%s' % (i,) for i in range(4)])
+        self.assertEqual(len(self.dispatched), 4)
+
+    def test_buffer_max_size(self):
+        with self.settings(EVENT_BUFFER_MAX_SIZE=2):
+            with event_bus.buffered():
+                for i in range(3):
+                    event_bus.record(self.event_type)
+                self.assertEqual(
+                    models.Event.objects.filter(
+                        type=self.event_type).count(), 2)
+        self.assertEqual(
+            models.Event.objects.filter(type=self.event_type).count(), 3)
+
+    def test_middleware_after_failed_response(self):
+        event_bus_middleware = middleware.EventBusMiddleware()
+        request = HttpRequest()
+        event_bus_middleware.process_request(request)
+        event_bus.record(self.event_type, 'description0')
+        # process_response() is skipped when a response middleware fails
+
+        request = HttpRequest()
+        event_bus_middleware.process_request(request)
+        self.assertEqual(len(self.dispatched), 1)
+        event_bus.record(self.event_type, 'description1')
+        response = HttpResponse()
+        event_bus_middleware.process_response(request, response)
+        event_bus_middleware.process_response(request, response)
+        self.assertEqual(len(self.dispatched), 2)
+        self.assertEqual(getattr(event_bus._local, 'depth', 0), 0)
+        event_bus.record(self.event_type, 'description2')
+        self.assertEqual(len(self.dispatched), 3)
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from . import models
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'task_id', 'type', 'state', 'started_at', 'ended_at',
+        'heartbeat_at', 'cancel_requested', 'ec2_instance_ids')
+    list_filter = ('type', 'state')
+
+
+admin.site.register(models.Job, JobAdmin)
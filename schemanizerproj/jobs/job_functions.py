@@ -0,0 +1,310 @@
+"""Functions for running long-running tasks as jobs.
+
+Jobs are created by queue_job() when their task is queued. A task runs its
+work inside a JobRunner, which records the state, messages and result of the
+job and sends heartbeats from a background thread. Cancellation is
+cooperative: cancel_job() sets a flag on the job, and the task raises
+JobCancelledError at its next checkpoint().
+
+Jobs of worker processes that were killed, for example after exceeding the
+hard time limit of their task, stop sending heartbeats and are cleaned up by
+reap_jobs().
+"""
+
+import datetime
+import json
+import logging
+import threading
+from celery import states
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.task.control import revoke
+from celery.utils import uuid
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from djcelery import models as djcelery_models
+from utils import ec2_functions, exceptions
+from . import models
+
+log = logging.getLogger(__name__)
+
+
+class _HeartbeatThread(threading.Thread):
+    """Calls beat() of a job runner every interval seconds until stopped."""
+
+    def __init__(self, job_runner, interval):
+        super(_HeartbeatThread, self).__init__()
+        self.daemon = True
+        self.job_runner = job_runner
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stop_event.wait(self.interval):
+                try:
+                    self.job_runner.beat()
+                except Exception, e:
+                    msg = 'ERROR %s: %s' % (type(e), e)
+                    log.exception(msg)
+        finally:
+            # the thread has its own database connection
+            connection.close()
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+class JobRunner(object):
+    """Context manager that records the execution of a task as a job.
+
+    On exit, the state of the job is set to SUCCESS, or to REVOKED if the
+    job was cancelled, or to FAILURE. JobCancelledError is not propagated.
+
+    If heartbeat_interval is 0, no thread is started and heartbeats are
+    sent by checkpoint() instead. If max_messages is set, only that number
+    of the latest messages are kept.
+    """
+
+    def __init__(
+            self, task_id, job_type, changeset_id=None, server_id=None,
+            heartbeat_interval=None, max_messages=None):
+        if heartbeat_interval is None:
+            heartbeat_interval = settings.JOB_HEARTBEAT_INTERVAL
+        self.task_id = task_id
+        self.job_type = job_type
+        self.changeset_id = changeset_id
+        self.server_id = server_id
+        self.heartbeat_interval = heartbeat_interval
+        self.max_messages = max_messages
+        self.job = None
+        self.messages = []
+        self.cancel_requested = False
+        self._heartbeat_thread = None
+
+    def __enter__(self):
+        now = timezone.now()
+        # the job is created here if the task was not queued by queue_job()
+        self.job, created = models.Job.objects.get_or_create(
+            task_id=self.task_id,
+            defaults=dict(
+                type=self.job_type, changeset_id=self.changeset_id,
+                server_id=self.server_id))
+        self.job.state = states.STARTED
+        self.job.started_at = now
+        self.job.heartbeat_at = now
+        self.job.save()
+        self.cancel_requested = self.job.cancel_requested
+
+        if self.heartbeat_interval:
+            self._heartbeat_thread = _HeartbeatThread(
+                self, self.heartbeat_interval)
+            self._heartbeat_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._heartbeat_thread:
+            self._heartbeat_thread.stop()
+            self._heartbeat_thread = None
+
+        cancelled = False
+        if exc_type is None:
+            state = states.SUCCESS
+            results_log = ''
+        elif issubclass(exc_type, exceptions.JobCancelledError):
+            cancelled = True
+            state = states.REVOKED
+            results_log = u'Job was cancelled.'
+        elif issubclass(exc_type, SoftTimeLimitExceeded):
+            state = states.FAILURE
+            results_log = u'Job has exceeded its time limit.'
+        else:
+            state = states.FAILURE
+            results_log = u'ERROR %s: %s' % (exc_type, exc_value)
+
+        self.job.state = state
+        self.job.ended_at = timezone.now()
+        self.job.results_log = results_log
+        # other fields may have been changed by cancel_job()
+        models.Job.objects.filter(pk=self.job.pk).update(
+            state=self.job.state, ended_at=self.job.ended_at,
+            results_log=self.job.results_log)
+        log.info(u'Job [id=%s] ended, state=%s.' % (self.job.pk, state))
+        return cancelled
+
+    def beat(self):
+        """Records a heartbeat and reads whether cancellation of the job was
+        requested."""
+
+        job_qs = models.Job.objects.filter(pk=self.job.pk)
+        job_qs.update(heartbeat_at=timezone.now())
+        if job_qs.filter(cancel_requested=True).exists():
+            self.cancel_requested = True
+
+    def checkpoint(self):
+        """Raises JobCancelledError if cancellation of the job was
+        requested."""
+
+        if not self._heartbeat_thread:
+            self.beat()
+        if self.cancel_requested:
+            raise exceptions.JobCancelledError(
+                u'Job [id=%s] was cancelled.' % (self.job.pk,))
+
+    def add_message(self, message, message_type='info', extra=None):
+        """Records message of the job, can be used as message_callback."""
+
+        self.messages.append(dict(
+            message=message, message_type=message_type, extra=extra))
+        if self.max_messages:
+            del self.messages[:-self.max_messages]
+        self.job.messages = json.dumps(self.messages)
+        models.Job.objects.filter(pk=self.job.pk).update(
+            messages=self.job.messages)
+
+    def set_result(self, **kwargs):
+        """Records values returned by the job."""
+
+        self.job.result = json.dumps(kwargs)
+        models.Job.objects.filter(pk=self.job.pk).update(
+            result=self.job.result)
+
+    def add_ec2_instances(self, instances):
+        """Records EC2 instances started by the job, so that they can be
+        terminated by reap_jobs() if the worker is killed."""
+
+        instance_ids = self.job.get_ec2_instance_ids()
+        instance_ids.extend(instance.id for instance in instances)
+        self.job.ec2_instance_ids = u','.join(instance_ids)
+        models.Job.objects.filter(pk=self.job.pk).update(
+            ec2_instance_ids=self.job.ec2_instance_ids)
+
+
+def queue_job(
+        task, job_type, kwargs, changeset_id=None, server_id=None):
+    """Creates a pending job and queues its task with kwargs.
+
+    The job is saved before the task is queued, so that it is listed by
+    status views and can be cancelled right away.
+    Returns the job.
+    """
+
+    job = models.Job.objects.create(
+        task_id=uuid(), type=job_type, changeset_id=changeset_id,
+        server_id=server_id)
+    task.apply_async(kwargs=kwargs, task_id=job.task_id)
+    return job
+
+
+def cancel_job(task_id):
+    """Requests cancellation of the job of a task.
+
+    Tasks that have not started yet are revoked, running jobs stop at their
+    next checkpoint. Returns False if the job has already ended.
+    """
+
+    revoke(task_id)
+    job_qs = models.Job.objects.filter(task_id=task_id)
+    if job_qs.filter(state__in=states.READY_STATES).exists():
+        return False
+    job_qs.update(cancel_requested=True)
+    # revoked tasks do not start, if the task has started already it
+    # sets the state of the job again
+    job_qs.filter(state=states.PENDING).update(
+        state=states.REVOKED, ended_at=timezone.now())
+    log.info(u'Cancellation of task %s was requested.' % (task_id,))
+    return True
+
+
+def get_task_time_limits():
+    """Returns dict of task names and hard time limits of jobs."""
+
+    return {
+        'changesetreviews.tasks.review_changeset':
+            settings.REVIEW_TASK_TIME_LIMIT,
+        'changesetapplies.tasks.apply_changeset':
+            settings.APPLY_TASK_TIME_LIMIT,
+    }
+
+
+def get_job_time_limits():
+    """Returns dict of job types and hard time limits of their tasks."""
+
+    return {
+        models.Job.TYPE_CHANGESET_REVIEW: settings.REVIEW_TASK_TIME_LIMIT,
+        models.Job.TYPE_CHANGESET_APPLY: settings.APPLY_TASK_TIME_LIMIT,
+    }
+
+
+def terminate_ec2_instances(job):
+    """Terminates EC2 instances started by job."""
+
+    instance_ids = job.get_ec2_instance_ids()
+    if not instance_ids:
+        return
+    ec2_functions.terminate_instances(
+        settings.AWS_REGION, settings.AWS_ACCESS_KEY_ID,
+        settings.AWS_SECRET_ACCESS_KEY, instance_ids)
+
+
+def reap_jobs(now=None):
+    """Cleans up jobs whose workers have stopped sending heartbeats.
+
+    Jobs that have never sent a heartbeat, for example because their task
+    was lost before a worker started it, are cleaned up once they are older
+    than the hard time limit of their task. EC2 instances started by these jobs are terminated, and the jobs and
+    their task states are marked as failed. Unready task states of review
+    and apply tasks older than the hard time limit of the task are marked
+    as failed as well.
+
+    Returns list of reaped jobs.
+    """
+
+    if now is None:
+        now = timezone.now()
+    heartbeat_timeout = datetime.timedelta(
+        seconds=settings.JOB_HEARTBEAT_TIMEOUT)
+
+    stale = Q(heartbeat_at__lt=now - heartbeat_timeout)
+    for job_type, time_limit in get_job_time_limits().iteritems():
+        stale |= Q(
+            type=job_type, heartbeat_at__isnull=True,
+            created_at__lt=(
+                now - datetime.timedelta(seconds=time_limit) -
+                heartbeat_timeout))
+    jobs = list(models.Job.objects.filter(
+        stale, state__in=states.UNREADY_STATES))
+    for job in jobs:
+        if job.heartbeat_at is None:
+            results_log = u'Job did not start within its time limit.'
+        else:
+            results_log = u'Worker stopped sending heartbeats.'
+        try:
+            terminate_ec2_instances(job)
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            log.exception(msg)
+            results_log = u'%s\n%s' % (results_log, msg)
+        job.state = states.FAILURE
+        job.ended_at = now
+        job.results_log = results_log
+        job.save()
+        log.warn(u'Job [id=%s] was reaped.' % (job.pk,))
+
+    if jobs:
+        djcelery_models.TaskState.objects.filter(
+            task_id__in=[job.task_id for job in jobs],
+            state__in=states.UNREADY_STATES).update(state=states.FAILURE)
+    for task_name, time_limit in get_task_time_limits().iteritems():
+        stale_before = (
+            now - datetime.timedelta(seconds=time_limit) - heartbeat_timeout)
+        count = djcelery_models.TaskState.objects.filter(
+            name=task_name, state__in=states.UNREADY_STATES,
+            tstamp__lt=stale_before).update(state=states.FAILURE)
+        if count:
+            log.warn(u'%s stale %s task state(s) were marked as failed.' % (
+                count, task_name))
+
+    return jobs
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'Job'
+        db.create_table('jobs', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('created_at', self.gf('django.db.models.fields.DateTimeField')(auto_now_add=True, null=True, blank=True)),
+            ('updated_at', self.gf('django.db.models.fields.DateTimeField')(auto_now=True, auto_now_add=True, null=True, blank=True)),
+            ('task_id', self.gf('django.db.models.fields.CharField')(unique=True, max_length=36)),
+            ('type', self.gf('django.db.models.fields.CharField')(max_length=32)),
+            ('state', self.gf('django.db.models.fields.CharField')(default='PENDING', max_length=16)),
+            ('started_at', self.gf('django.db.models.fields.DateTimeField')(default=None, null=True, blank=True)),
+            ('ended_at', self.gf('django.db.models.fields.DateTimeField')(default=None, null=True, blank=True)),
+            ('heartbeat_at', self.gf('django.db.models.fields.DateTimeField')(default=None, null=True, blank=True)),
+            ('cancel_requested', self.gf('django.db.models.fields.BooleanField')(default=False)),
+            ('ec2_instance_ids', self.gf('django.db.models.fields.TextField')(default='', blank=True)),
+            ('results_log', self.gf('django.db.models.fields.TextField')(default='', blank=True)),
+        ))
+        db.send_create_signal(u'jobs', ['Job'])
+
+
+    def backwards(self, orm):
+        # Deleting model 'Job'
+        db.delete_table('jobs')
+
+
+    models = {
+        u'jobs.job': {
+            'Meta': {'object_name': 'Job', 'db_table': "'jobs'"},
+            'cancel_requested': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            'ec2_instance_ids': ('django.db.models.fields.TextField', [], {'default': "''", 'blank': 'True'}),
+            'ended_at': ('django.db.models.fields.DateTimeField', [], {'default': 'None', 'null': 'True', 'blank': 'True'}),
+            'heartbeat_at': ('django.db.models.fields.DateTimeField', [], {'default': 'None', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'results_log': ('django.db.models.fields.TextField', [], {'default': "''", 'blank': 'True'}),
+            'started_at': ('django.db.models.fields.DateTimeField', [], {'default': 'None', 'null': 'True', 'blank': 'True'}),
+            'state': ('django.db.models.fields.CharField', [], {'default': "'PENDING'", 'max_length': '16'}),
+            'task_id': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '36'}),
+            'type': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'auto_now_add': 'True', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['jobs']
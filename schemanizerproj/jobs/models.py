@@ -0,0 +1,75 @@
+import json
+from celery import states
+from django.db import models
+from utils import models as utils_models
+
+
+class Job(utils_models.TimeStampedModel):
+    """Execution of a long-running task.
+
+    Jobs are written by the tasks themselves, status views query them
+    instead of the task states of djcelery. While a job runs, its worker
+    updates heartbeat_at regularly, so that jobs of workers that were killed
+    can be told apart from jobs that are still running.
+    """
+
+    TYPE_CHANGESET_REVIEW = u'changeset_review'
+    TYPE_CHANGESET_APPLY = u'changeset_apply'
+    TYPE_CHOICES = (
+        (TYPE_CHANGESET_REVIEW, u'changeset review'),
+        (TYPE_CHANGESET_APPLY, u'changeset apply'),
+    )
+
+    task_id = models.CharField(max_length=36, unique=True)
+    type = models.CharField(max_length=32, choices=TYPE_CHOICES)
+    state = models.CharField(max_length=16, default=states.PENDING)
+    changeset = models.ForeignKey(
+        'changesets.Changeset', null=True, blank=True, default=None,
+        on_delete=models.SET_NULL)
+    server = models.ForeignKey(
+        'servers.Server', null=True, blank=True, default=None,
+        on_delete=models.SET_NULL)
+    started_at = models.DateTimeField(null=True, blank=True, default=None)
+    ended_at = models.DateTimeField(null=True, blank=True, default=None)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, default=None)
+    cancel_requested = models.BooleanField(default=False)
+    # comma separated IDs of EC2 instances started by the job
+    ec2_instance_ids = models.TextField(blank=True, default='')
+    results_log = models.TextField(blank=True, default='')
+    # JSON list of messages, objects with message, message_type and extra
+    messages = models.TextField(blank=True, default='')
+    # JSON object of values returned by the task
+    result = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'jobs'
+        index_together = (
+            ('type', 'state'),
+        )
+
+    def __unicode__(self):
+        return u'Job [id=%s]' % self.pk
+
+    def get_ec2_instance_ids(self):
+        return [
+            instance_id for instance_id in self.ec2_instance_ids.split(',')
+            if instance_id]
+
+    def get_messages(self):
+        if not self.messages:
+            return []
+        return json.loads(self.messages)
+
+    def get_last_message(self):
+        messages = self.get_messages()
+        if messages:
+            return messages[-1]
+        return None
+
+    def get_result(self):
+        if not self.result:
+            return {}
+        return json.loads(self.result)
+
+    def is_ready(self):
+        return self.state in states.READY_STATES
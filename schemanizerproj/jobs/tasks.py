@@ -0,0 +1,15 @@
+import logging
+from celery import task
+from . import job_functions
+
+log = logging.getLogger(__name__)
+
+
+@task(ignore_result=True)
+def reap_jobs():
+    """Cleans up jobs of killed workers."""
+    try:
+        job_functions.reap_jobs()
+    except:
+        log.exception('EXCEPTION')
+        raise
@@ -0,0 +1,289 @@
+import base64
+import datetime
+import json
+from celery import states
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.utils import timezone
+from djcelery import models as djcelery_models
+from changesets import models as changesets_models
+from schemaversions import models as schemaversions_models
+from utils import exceptions
+from . import job_functions, models
+
+
+class JobRunnerTestCase(TestCase):
+
+    def create_runner(self, task_id='task-1'):
+        return job_functions.JobRunner(
+            task_id, models.Job.TYPE_CHANGESET_REVIEW, heartbeat_interval=0)
+
+    def test_success(self):
+        with self.create_runner() as job_runner:
+            job_runner.checkpoint()
+        job = models.Job.objects.get(task_id='task-1')
+        self.assertEqual(job.state, states.SUCCESS)
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.ended_at)
+        self.assertIsNotNone(job.heartbeat_at)
+
+    def test_cancel(self):
+        steps = []
+        with self.create_runner() as job_runner:
+            steps.append(1)
+            job_runner.checkpoint()
+            models.Job.objects.filter(task_id='task-1').update(
+                cancel_requested=True)
+            job_runner.checkpoint()
+            steps.append(2)
+        self.assertEqual(steps, [1])
+        job = models.Job.objects.get(task_id='task-1')
+        self.assertEqual(job.state, states.REVOKED)
+        self.assertTrue(job.cancel_requested)
+
+    def test_failure(self):
+        def run():
+            with self.create_runner():
+                raise exceptions.Error('failed')
+        self.assertRaises(exceptions.Error, run)
+        job = models.Job.objects.get(task_id='task-1')
+        self.assertEqual(job.state, states.FAILURE)
+        self.assertIn('failed', job.results_log)
+
+    def test_add_ec2_instances(self):
+        class InstanceStub(object):
+            def __init__(self, id):
+                self.id = id
+
+        with self.create_runner() as job_runner:
+            job_runner.add_ec2_instances([InstanceStub('i-1')])
+            job_runner.add_ec2_instances([InstanceStub('i-2')])
+        job = models.Job.objects.get(task_id='task-1')
+        self.assertEqual(job.get_ec2_instance_ids(), ['i-1', 'i-2'])
+
+    def test_messages(self):
+        job_runner = job_functions.JobRunner(
+            'task-1', models.Job.TYPE_CHANGESET_APPLY, heartbeat_interval=0,
+            max_messages=2)
+        with job_runner:
+            job_runner.add_message('message 1')
+            job_runner.add_message('message 2', 'error')
+            job_runner.add_message('message 3', 'error', dict(delta='-'))
+            job_runner.set_result(changeset_detail_apply_ids=[1, 2])
+        job = models.Job.objects.get(task_id='task-1')
+        self.assertEqual(
+            [message['message'] for message in job.get_messages()],
+            ['message 2', 'message 3'])
+        self.assertEqual(job.get_last_message()['extra'], dict(delta='-'))
+        self.assertEqual(
+            job.get_result(), dict(changeset_detail_apply_ids=[1, 2]))
+
+
+class ReapJobsTestCase(TestCase):
+
+    def setUp(self):
+        self.terminated_instance_ids = []
+        self.orig_terminate_instances = (
+            job_functions.ec2_functions.terminate_instances)
+
+        def terminate_instances(
+                region, aws_access_key_id, aws_secret_access_key,
+                instance_ids):
+            self.terminated_instance_ids.extend(instance_ids)
+        job_functions.ec2_functions.terminate_instances = terminate_instances
+
+    def tearDown(self):
+        job_functions.ec2_functions.terminate_instances = (
+            self.orig_terminate_instances)
+
+    def test_reap_jobs(self):
+        now = timezone.now()
+        with self.settings(JOB_HEARTBEAT_TIMEOUT=60):
+            stale_job = models.Job.objects.create(
+                task_id='task-1', type=models.Job.TYPE_CHANGESET_REVIEW,
+                state=states.STARTED,
+                heartbeat_at=now - datetime.timedelta(seconds=120),
+                ec2_instance_ids='i-1')
+            models.Job.objects.create(
+                task_id='task-2', type=models.Job.TYPE_CHANGESET_REVIEW,
+                state=states.STARTED,
+                heartbeat_at=now - datetime.timedelta(seconds=30),
+                ec2_instance_ids='i-2')
+            models.Job.objects.create(
+                task_id='task-3', type=models.Job.TYPE_CHANGESET_APPLY,
+                state=states.SUCCESS,
+                heartbeat_at=now - datetime.timedelta(seconds=120))
+            djcelery_models.TaskState.objects.create(
+                task_id='task-1', state=states.STARTED, tstamp=now,
+                name='changesetreviews.tasks.review_changeset')
+
+            jobs = job_functions.reap_jobs(now=now)
+
+        self.assertEqual([job.pk for job in jobs], [stale_job.pk])
+        self.assertEqual(self.terminated_instance_ids, ['i-1'])
+        self.assertEqual(
+            models.Job.objects.get(task_id='task-1').state, states.FAILURE)
+        self.assertEqual(
+            models.Job.objects.get(task_id='task-2').state, states.STARTED)
+        self.assertEqual(
+            djcelery_models.TaskState.objects.get(task_id='task-1').state,
+            states.FAILURE)
+
+    def test_reap_jobs_without_heartbeat(self):
+        now = timezone.now()
+        with self.settings(
+                JOB_HEARTBEAT_TIMEOUT=60, APPLY_TASK_TIME_LIMIT=600):
+            lost_job = models.Job.objects.create(
+                task_id='task-1', type=models.Job.TYPE_CHANGESET_APPLY)
+            pending_job = models.Job.objects.create(
+                task_id='task-2', type=models.Job.TYPE_CHANGESET_APPLY)
+            models.Job.objects.filter(pk=lost_job.pk).update(
+                created_at=now - datetime.timedelta(seconds=900))
+            models.Job.objects.filter(pk=pending_job.pk).update(
+                created_at=now - datetime.timedelta(seconds=300))
+
+            jobs = job_functions.reap_jobs(now=now)
+
+        self.assertEqual([job.pk for job in jobs], [lost_job.pk])
+        lost_job = models.Job.objects.get(pk=lost_job.pk)
+        self.assertEqual(lost_job.state, states.FAILURE)
+        self.assertEqual(
+            lost_job.results_log, u'Job did not start within its time limit.')
+        self.assertEqual(
+            models.Job.objects.get(pk=pending_job.pk).state, states.PENDING)
+
+    def test_reap_stale_task_states(self):
+        now = timezone.now()
+        with self.settings(
+                JOB_HEARTBEAT_TIMEOUT=60, REVIEW_TASK_TIME_LIMIT=600):
+            djcelery_models.TaskState.objects.create(
+                task_id='task-1', state=states.STARTED,
+                tstamp=now - datetime.timedelta(seconds=900),
+                name='changesetreviews.tasks.review_changeset')
+            djcelery_models.TaskState.objects.create(
+                task_id='task-2', state=states.STARTED,
+                tstamp=now - datetime.timedelta(seconds=300),
+                name='changesetreviews.tasks.review_changeset')
+
+            job_functions.reap_jobs(now=now)
+
+        self.assertEqual(
+            djcelery_models.TaskState.objects.get(task_id='task-1').state,
+            states.FAILURE)
+        self.assertEqual(
+            djcelery_models.TaskState.objects.get(task_id='task-2').state,
+            states.STARTED)
+
+
+class JobStatusTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        database_schema = schemaversions_models.DatabaseSchema.objects.create(
+            name='test_job_status')
+        self.changeset = changesets_models.Changeset.objects.create(
+            database_schema=database_schema,
+            type=changesets_models.Changeset.DDL_TABLE_CREATE,
+            classification=changesets_models.Changeset.CLASSIFICATION_PAINLESS)
+
+    def create_review_job(self, task_id, message):
+        return models.Job.objects.create(
+            task_id=task_id, type=models.Job.TYPE_CHANGESET_REVIEW,
+            state=states.STARTED, changeset=self.changeset,
+            messages=json.dumps([dict(
+                message=message, message_type='info', extra=None)]))
+
+    def test_queue_job(self):
+        calls = []
+
+        class TaskStub(object):
+            def apply_async(self, kwargs=None, task_id=None):
+                calls.append((kwargs, task_id))
+
+        job = job_functions.queue_job(
+            TaskStub(), models.Job.TYPE_CHANGESET_REVIEW,
+            kwargs=dict(changeset_pk=self.changeset.pk),
+            changeset_id=self.changeset.pk)
+        self.assertEqual(job.state, states.PENDING)
+        self.assertEqual(job.changeset_id, self.changeset.pk)
+        self.assertEqual(
+            calls, [(dict(changeset_pk=self.changeset.pk), job.task_id)])
+
+    def test_ajax_changeset_reviews(self):
+        self.create_review_job('task-1', 'Checking MySQL server status.')
+        models.Job.objects.create(
+            task_id='task-2', type=models.Job.TYPE_CHANGESET_REVIEW,
+            state=states.SUCCESS, changeset=self.changeset)
+
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(
+            reverse('changesetreviews_ajax_changeset_reviews'),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        data = json.loads(response.content)
+        self.assertIn('Checking MySQL server status.', data['html'])
+        self.assertIn('Changeset ID: %s' % (self.changeset.pk,), data['html'])
+
+    def test_changeset_review_status_api(self):
+        self.create_review_job('task-1', 'Running changeset validations...')
+        response = self.client.get(
+            reverse(
+                'api_changeset_review_status',
+                kwargs={
+                    'api_name': 'v1', 'resource_name': 'changeset',
+                    'task_id': 'task-1'}),
+            {'format': 'json'},
+            HTTP_AUTHORIZATION='Basic %s' % (
+                base64.b64encode('admin:admin'),))
+        data = json.loads(response.content)
+        self.assertTrue(data['task_active'])
+        self.assertEqual(data['message'], 'Running changeset validations...')
+
+    def test_task_status_api(self):
+        self.create_review_job('task-1', 'Running changeset validations...')
+        models.Job.objects.create(
+            task_id='task-2', type=models.Job.TYPE_CHANGESET_APPLY,
+            state=states.SUCCESS, changeset=self.changeset,
+            result=json.dumps(dict(changeset_detail_apply_ids=[1, 2])))
+        response = self.client.get(
+            reverse(
+                'api_changeset_task_status',
+                kwargs={'api_name': 'v1', 'resource_name': 'changeset'}),
+            {'format': 'json', 'task_ids': 'task-1,task-2,task-3'},
+            HTTP_AUTHORIZATION='Basic %s' % (
+                base64.b64encode('admin:admin'),))
+        tasks = json.loads(response.content)['tasks']
+        self.assertEqual(sorted(tasks.keys()), ['task-1', 'task-2'])
+        self.assertTrue(tasks['task-1']['task_active'])
+        self.assertEqual(
+            tasks['task-1']['messages'][0]['message'],
+            'Running changeset validations...')
+        self.assertFalse(tasks['task-2']['task_active'])
+        self.assertEqual(tasks['task-2']['state'], states.SUCCESS)
+        self.assertEqual(
+            tasks['task-2']['result'],
+            dict(changeset_detail_apply_ids=[1, 2]))
+
+    def test_task_status_api_post(self):
+        self.create_review_job('task-1', 'Running changeset validations...')
+        task_ids = ['task-%s' % (i,) for i in range(1, 201)]
+        response = self.client.post(
+            '%s?format=json' % (reverse(
+                'api_changeset_task_status',
+                kwargs={'api_name': 'v1', 'resource_name': 'changeset'}),),
+            json.dumps({'task_ids': task_ids}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Basic %s' % (
+                base64.b64encode('admin:admin'),))
+        tasks = json.loads(response.content)['tasks']
+        self.assertEqual(tasks.keys(), ['task-1'])
+
+        # longer query strings are rejected by some proxies
+        response = self.client.get(
+            reverse(
+                'api_changeset_task_status',
+                kwargs={'api_name': 'v1', 'resource_name': 'changeset'}),
+            {'format': 'json', 'task_ids': ','.join(task_ids)},
+            HTTP_AUTHORIZATION='Basic %s' % (
+                base64.b64encode('admin:admin'),))
+        self.assertIn('error_message', json.loads(response.content))
@@ -0,0 +1,114 @@
+"""API authentication.
+
+Requests are authenticated with an API key in the header
+'Authorization: ApiKey <username>:<api_key>', or with HTTP basic
+authentication. API keys are compared as SHA-256 hashes and the hash and
+user of a key are cached, so that authenticated requests normally do not run
+the password hasher nor query the database. Neither the key nor the password
+hash of the user is stored in the cache, which may be kept in files.
+"""
+
+import hashlib
+import logging
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.utils.crypto import constant_time_compare
+from tastypie.authentication import (
+    ApiKeyAuthentication, BasicAuthentication, MultiAuthentication)
+from tastypie.models import ApiKey
+from users import user_cache
+
+log = logging.getLogger(__name__)
+
+
+def get_api_key_cache_key(username):
+    return 'api:api_key_hash:%s' % (username,)
+
+
+def get_api_key_hash(api_key):
+    if isinstance(api_key, unicode):
+        api_key = api_key.encode('utf-8')
+    return hashlib.sha256(api_key).hexdigest()
+
+
+def get_cached_user_fields(user):
+    """Returns dict of the fields of user that are cached, all but the
+    password."""
+
+    return dict(
+        (field.attname, getattr(user, field.attname))
+        for field in User._meta.fields if field.attname != 'password')
+
+
+class CachedApiKeyAuthentication(ApiKeyAuthentication):
+    """ApiKeyAuthentication that caches hashes of API keys and their users
+    for API_KEY_CACHE_TIMEOUT seconds.
+
+    Users returned from the cache have no password, they are not meant to be
+    saved.
+    """
+
+    def get_user(self, username, api_key):
+        """Returns active user of an API key, None if the key is invalid."""
+
+        cache_key = get_api_key_cache_key(username)
+        cached = cache.get(cache_key)
+        if cached is None:
+            try:
+                api_key_obj = ApiKey.objects.select_related('user').get(
+                    user__username=username)
+            except ApiKey.DoesNotExist:
+                return None
+            key_hash = ''
+            if api_key_obj.key:
+                key_hash = get_api_key_hash(api_key_obj.key)
+            cached = (key_hash, get_cached_user_fields(api_key_obj.user))
+            cache.set(cache_key, cached, settings.API_KEY_CACHE_TIMEOUT)
+
+        key_hash, user_fields = cached
+        if not key_hash or not constant_time_compare(
+                key_hash, get_api_key_hash(api_key)):
+            return None
+        return User(password=None, **user_fields)
+
+    def is_authenticated(self, request, **kwargs):
+        try:
+            username, api_key = self.extract_credentials(request)
+        except ValueError:
+            return self._unauthorized()
+        if not username or not api_key:
+            return self._unauthorized()
+
+        user = self.get_user(username, api_key)
+        if user is None:
+            return self._unauthorized()
+        if not self.check_active(user):
+            return False
+        user_cache.attach_schemanizer_user(user)
+        request.user = user
+        return True
+
+
+def default_authentication():
+    """Returns authentication of API resources, API key authentication is
+    tried first."""
+
+    return MultiAuthentication(
+        CachedApiKeyAuthentication(), BasicAuthentication())
+
+
+def invalidate_api_key(sender, instance, **kwargs):
+    """Clears cached API key when the key or its user changes."""
+
+    if sender is ApiKey:
+        user = instance.user
+    else:
+        user = instance
+    cache.delete(get_api_key_cache_key(user.username))
+
+
+for sender in (ApiKey, User):
+    post_save.connect(invalidate_api_key, sender=sender)
+    post_delete.connect(invalidate_api_key, sender=sender)
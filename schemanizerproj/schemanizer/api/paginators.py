@@ -0,0 +1,56 @@
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
+from utils import pagination
+
+
+class KeysetPaginator(Paginator):
+    """Paginator that selects pages with a cursor instead of an offset.
+
+    The cursor of the next page is in the next link of the response meta
+    data. No total count is returned, counting rows of large tables is as
+    slow as reading them.
+    """
+
+    # fields the objects are ordered by, the last field must be unique
+    ordering = ('-id',)
+
+    def get_limit(self):
+        limit = super(KeysetPaginator, self).get_limit()
+        if not limit:
+            # pages are always limited
+            limit = self.max_limit or self.limit or 20
+        return limit
+
+    def _generate_cursor_uri(self, limit, cursor):
+        if self.resource_uri is None:
+            return None
+        request_params = self.request_data.copy()
+        for k in ('limit', 'offset', 'cursor'):
+            if k in request_params:
+                del request_params[k]
+        request_params['limit'] = limit
+        request_params['cursor'] = cursor
+        return '%s?%s' % (self.resource_uri, request_params.urlencode())
+
+    def page(self):
+        limit = self.get_limit()
+        try:
+            objects, next_cursor = pagination.get_page(
+                self.objects, self.ordering, limit,
+                cursor=self.request_data.get('cursor'))
+        except pagination.InvalidCursorError, e:
+            raise BadRequest(u'%s' % (e,))
+        meta = {
+            'limit': limit,
+            'next': None,
+        }
+        if next_cursor:
+            meta['next'] = self._generate_cursor_uri(limit, next_cursor)
+        return {
+            self.collection_name: objects,
+            'meta': meta,
+        }
+
+
+class EventPaginator(KeysetPaginator):
+    ordering = ('-datetime', '-id')
@@ -0,0 +1,94 @@
+"""Helpers for keeping API representations small.
+
+Clients can select the fields of a response with the query parameters
+'fields' and 'exclude', both are comma separated lists of field names,
+for example: ?fields=id,checksum or ?exclude=ddl
+"""
+
+from django.views.decorators.gzip import gzip_page
+from tastypie import fields
+from tastypie.bundle import Bundle
+
+
+class LazyForeignKey(fields.ForeignKey):
+    """ForeignKey field whose URI is built from the value of the foreign key
+    column, the related object is loaded only if full is set."""
+
+    def dehydrate(self, bundle, for_list=True):
+        if (
+                self.full or not isinstance(self.attribute, basestring) or
+                '__' in self.attribute):
+            return super(LazyForeignKey, self).dehydrate(
+                bundle, for_list=for_list)
+
+        model_field = bundle.obj._meta.get_field(self.attribute)
+        related_pk = getattr(bundle.obj, model_field.attname)
+        if related_pk is None:
+            return super(LazyForeignKey, self).dehydrate(
+                bundle, for_list=for_list)
+
+        related_obj = model_field.rel.to(pk=related_pk)
+        self.fk_resource = self.get_related_resource(related_obj)
+        return self.fk_resource.get_resource_uri(
+            Bundle(obj=related_obj, request=bundle.request))
+
+
+def _split_field_names(value):
+    return set(name.strip() for name in value.split(',') if name.strip())
+
+
+class SparseFieldsMixin(object):
+    """ModelResource mixin that supports the fields and exclude query
+    parameters and gzip-compresses responses."""
+
+    def get_sparse_field_names(self, request):
+        """Returns set of names of fields requested by the client, None if
+        all fields are requested."""
+
+        if request is None:
+            return None
+        field_names = None
+        if request.GET.get('fields'):
+            field_names = _split_field_names(request.GET['fields'])
+            # the URI identifies the object
+            field_names.add('resource_uri')
+        if request.GET.get('exclude'):
+            if field_names is None:
+                field_names = set(self.fields.keys())
+            field_names -= _split_field_names(request.GET['exclude'])
+        return field_names
+
+    def full_dehydrate(self, bundle, for_list=False):
+        field_names = self.get_sparse_field_names(bundle.request)
+        if field_names is None:
+            return super(SparseFieldsMixin, self).full_dehydrate(
+                bundle, for_list=for_list)
+
+        # mirrors ModelResource.full_dehydrate(), fields that were not
+        # requested are not dehydrated, so related objects of these fields
+        # are not loaded
+        use_in = ['all', 'list' if for_list else 'detail']
+        for field_name, field_object in self.fields.items():
+            if field_name not in field_names:
+                continue
+            field_use_in = getattr(field_object, 'use_in', 'all')
+            if callable(field_use_in):
+                if not field_use_in(bundle):
+                    continue
+            elif field_use_in not in use_in:
+                continue
+
+            if getattr(field_object, 'dehydrated_type', None) == 'related':
+                field_object.api_name = self._meta.api_name
+                field_object.resource_name = self._meta.resource_name
+
+            bundle.data[field_name] = field_object.dehydrate(
+                bundle, for_list=for_list)
+            method = getattr(self, 'dehydrate_%s' % (field_name,), None)
+            if method:
+                bundle.data[field_name] = method(bundle)
+
+        return self.dehydrate(bundle)
+
+    def wrap_view(self, view):
+        return gzip_page(super(SparseFieldsMixin, self).wrap_view(view))
@@ -1,18 +1,16 @@
 import json
 import logging
-from celery import states
-from celery.result import AsyncResult
 from django.conf.urls import url
 from django.contrib.auth.models import User as AuthUser
 from django.contrib.sites.models import Site
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
-from djcelery import models as djcelery_models
-from tastypie.authentication import BasicAuthentication
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from tastypie.authorization import Authorization, ReadOnlyAuthorization
 from tastypie.resources import ModelResource, ALL, ALL_WITH_RELATIONS
 from tastypie import fields
-import time
 from changesetapplies import (
     models as changesetapplies_models,
     tasks as changesetapplies_tasks)
@@ -23,23 +21,33 @@ from changesetreviews import (
     tasks as changesetreviews_tasks)
 from changesettests import models as changesettests_models
 from changesetvalidations import models as changesetvalidations_models
+from events import models as events_models
+from jobs import models as jobs_models
 from schemaversions import (
     models as schemaversions_models,
     schema_functions)
 from servers import models as servers_models
 from users import models as users_models
 from users import user_functions
-from . import authorizations
+from . import (
+    authentications, authorizations, paginators, representations)
 
 log = logging.getLogger(__name__)
 
+# maximum number of task IDs of a changeset/task_status/ request
+MAX_TASK_STATUS_TASK_IDS = 500
+
+# maximum number of task IDs in the query string of a changeset/task_status/
+# GET request, some proxies reject longer URLs
+MAX_TASK_STATUS_QUERY_TASK_IDS = 100
+
 
 class AuthUserResource(ModelResource):
     class Meta:
         queryset = AuthUser.objects.all()
         resource_name = 'auth_user'
         fields = ['username', 'first_name', 'last_name', 'last_login']
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -49,7 +57,7 @@ class RoleResource(ModelResource):
     class Meta:
         queryset = users_models.Role.objects.all()
         resource_name = 'role'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -62,7 +70,7 @@ class UserResource(ModelResource):
     class Meta:
         queryset = users_models.User.objects.all()
         resource_name = 'user'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -184,7 +192,7 @@ class EnvironmentResource(ModelResource):
     class Meta:
         queryset = servers_models.Environment.objects.all()
         resource_name = 'environment'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = authorizations.EnvironmentAuthorization()
         list_allowed_methods = ['get', 'post']
         detail_allowed_methods = ['get', 'post', 'put', 'delete', 'patch']
@@ -197,7 +205,7 @@ class ServerResource(ModelResource):
     class Meta:
         queryset = servers_models.Server.objects.all()
         resource_name = 'server'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = Authorization()
         list_allowed_methods = ['get', 'post']
         detail_allowed_methods = ['get', 'post', 'put', 'delete', 'patch']
@@ -207,7 +215,7 @@ class DatabaseSchemaResource(ModelResource):
     class Meta:
         queryset = schemaversions_models.DatabaseSchema.objects.all()
         resource_name = 'database_schema'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -217,16 +225,21 @@ class DatabaseSchemaResource(ModelResource):
         }
 
 
-class SchemaVersionResource(ModelResource):
-    database_schema = fields.ForeignKey(
+class SchemaVersionResource(
+        representations.SparseFieldsMixin, ModelResource):
+    database_schema = representations.LazyForeignKey(
         DatabaseSchemaResource, 'database_schema', null=True, blank=True)
-    pulled_from = fields.ForeignKey(
+    pulled_from = representations.LazyForeignKey(
         ServerResource, 'pulled_from', null=True, blank=True)
+    # list responses leave out the DDL, it is retrieved from the detail or
+    # DDL endpoints
+    ddl = fields.CharField(
+        attribute='ddl', blank=True, default='', use_in='detail')
 
     class Meta:
         queryset = schemaversions_models.SchemaVersion.objects.all()
         resource_name = 'schema_version'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -242,8 +255,44 @@ class SchemaVersionResource(ModelResource):
                 self.wrap_view('save_schema_dump'),
                 name='api_save_schema_dump',
             ),
+            url(
+                r'^(?P<resource_name>%s)/(?P<schema_version_id>\d+)/ddl/$' % (
+                    self._meta.resource_name,),
+                self.wrap_view('schema_version_ddl'),
+                name='api_schema_version_ddl',
+            ),
         ]
 
+    def apply_filters(self, request, applicable_filters):
+        # only used by list requests
+        return super(SchemaVersionResource, self).apply_filters(
+            request, applicable_filters).defer('ddl')
+
+    def schema_version_ddl(self, request, **kwargs):
+        """Returns DDL of schema version as plain text.
+
+        The checksum of the schema version is the ETag of the response.
+        """
+        self.method_check(request, allowed=['get'])
+        self.is_authenticated(request)
+        self.throttle_check(request)
+
+        schema_versions = schemaversions_models.SchemaVersion.objects.filter(
+            pk=int(kwargs.get('schema_version_id')))
+        checksum = schema_versions.values_list('checksum', flat=True).get()
+        self.log_throttled_access(request)
+        if checksum and checksum in parse_etags(
+                request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            ddl = schema_versions.values_list('ddl', flat=True).get()
+            response = HttpResponse(
+                ddl, content_type='text/plain; charset=utf-8')
+        if checksum:
+            response['ETag'] = quote_etag(checksum)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def save_schema_dump(self, request, **kwargs):
         """Creates database schema (if needed) and schema version..
 
@@ -280,26 +329,26 @@ class SchemaVersionResource(ModelResource):
         return self.create_response(request, bundle)
 
 
-class ChangesetResource(ModelResource):
-    database_schema = fields.ForeignKey(
+class ChangesetResource(representations.SparseFieldsMixin, ModelResource):
+    database_schema = representations.LazyForeignKey(
         DatabaseSchemaResource, 'database_schema', null=True, blank=True)
-    reviewed_by = fields.ForeignKey(
+    reviewed_by = representations.LazyForeignKey(
         UserResource, 'reviewed_by', null=True, blank=True)
-    approved_by = fields.ForeignKey(
+    approved_by = representations.LazyForeignKey(
         UserResource, 'approved_by', null=True, blank=True)
-    submitted_by = fields.ForeignKey(
+    submitted_by = representations.LazyForeignKey(
         UserResource, 'submitted_by', null=True, blank=True)
-    before_version = fields.ForeignKey(
+    before_version = representations.LazyForeignKey(
         SchemaVersionResource, 'before_version', null=True, blank=True)
-    after_version = fields.ForeignKey(
+    after_version = representations.LazyForeignKey(
         SchemaVersionResource, 'after_version', null=True, blank=True)
-    review_version = fields.ForeignKey(
+    review_version = representations.LazyForeignKey(
         SchemaVersionResource, 'review_version', null=True, blank=True)
 
     class Meta:
         queryset = changesets_models.Changeset.objects.all()
         resource_name = 'changeset'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
         authorization = ReadOnlyAuthorization()
@@ -361,7 +410,13 @@ class ChangesetResource(ModelResource):
                     self._meta.resource_name,),
                 self.wrap_view('changeset_apply_status'),
                 name='api_changeset_apply_status',
-            )
+            ),
+            url(
+                r'^(?P<resource_name>%s)/task_status/$' % (
+                    self._meta.resource_name,),
+                self.wrap_view('changeset_task_status'),
+                name='api_changeset_task_status',
+            ),
         ]
 
     def changeset_apply(self, request, **kwargs):
@@ -383,9 +438,9 @@ class ChangesetResource(ModelResource):
             changeset_id = int(post_data['changeset_id'])
             server_id = int(post_data['server_id'])
 
-            async_result = changesetapplies_tasks.apply_changeset.delay(
+            job = changesetapplies_tasks.queue_apply_changeset(
                 changeset_id, request.user.schemanizer_user.pk, server_id)
-            data['task_id'] = async_result.id
+            data['task_id'] = job.task_id
 
         except Exception, e:
             log.exception('EXCEPTION')
@@ -403,21 +458,18 @@ class ChangesetResource(ModelResource):
         data = {}
         try:
             task_id = kwargs['task_id']
-            task_states = djcelery_models.TaskState.objects.filter(task_id=task_id)
+            jobs = list(jobs_models.Job.objects.filter(
+                task_id=task_id, type=jobs_models.Job.TYPE_CHANGESET_APPLY))
 
             messages = []
             changeset_detail_apply_ids = []
 
-            if task_states.exists():
-                task_state = task_states[0]
-                data['task_active'] = task_state.state in states.UNREADY_STATES
-                async_result = AsyncResult(task_state.task_id)
-                result = async_result.result
-
-                if result:
-                    messages = result.get('messages', [])
-                    changeset_detail_apply_ids = result.get(
-                        'changeset_detail_apply_ids', [])
+            if jobs:
+                job = jobs[0]
+                data['task_active'] = not job.is_ready()
+                messages = job.get_messages()
+                changeset_detail_apply_ids = job.get_result().get(
+                    'changeset_detail_apply_ids', [])
 
             data['messages'] = messages
             data['changeset_detail_apply_ids'] = changeset_detail_apply_ids
@@ -435,6 +487,58 @@ class ChangesetResource(ModelResource):
 
         return self.create_response(request, bundle)
 
+    def changeset_task_status(self, request, **kwargs):
+        """Returns status of many review and apply tasks.
+
+        Task IDs are passed as a comma separated list in the task_ids query
+        parameter of a GET request, or as a list in the task_ids key of the
+        JSON object posted in a POST request:
+        {
+            "task_ids": ["<task_id>", "<task_id>"]
+        }
+        Successful call would have the key tasks in the return value, a dict
+        of task IDs and their status, tasks that are not found are left out.
+        """
+
+        self.method_check(request, allowed=['get', 'post'])
+        self.is_authenticated(request)
+
+        data = {}
+        try:
+            if request.method == 'POST':
+                post_data = json.loads(request.raw_post_data)
+                task_ids = post_data.get('task_ids', [])
+                max_task_ids = MAX_TASK_STATUS_TASK_IDS
+            else:
+                task_ids = request.GET.get('task_ids', '').split(',')
+                max_task_ids = MAX_TASK_STATUS_QUERY_TASK_IDS
+            task_ids = [
+                task_id.strip() for task_id in task_ids if task_id.strip()]
+            if len(task_ids) > max_task_ids:
+                raise Exception(
+                    'Status of at most %s tasks can be requested.' % (
+                        max_task_ids,))
+
+            tasks = {}
+            for job in jobs_models.Job.objects.filter(task_id__in=task_ids):
+                tasks[job.task_id] = dict(
+                    type=job.type,
+                    state=job.state,
+                    task_active=not job.is_ready(),
+                    messages=job.get_messages(),
+                    result=job.get_result(),
+                    results_log=job.results_log,
+                    changeset_id=job.changeset_id,
+                    server_id=job.server_id)
+            data['tasks'] = tasks
+
+        except Exception, e:
+            log.exception('EXCEPTION')
+            data['error_message'] = '%s' % (e,)
+        bundle = self.build_bundle(data=data, request=request)
+
+        return self.create_response(request, bundle)
+
     def changeset_review_status(self, request, **kwargs):
         """Checks review status."""
 
@@ -446,28 +550,13 @@ class ChangesetResource(ModelResource):
             task_id = kwargs['task_id']
             log.debug('task_id = %s', task_id)
 
-            task_state = None
-            max_tries = 3
-            tries = 0
-            while True:
-                tries += 1
-                log.debug('tries = %s', tries)
-                try:
-                    task_state = djcelery_models.TaskState.objects.get(
-                        task_id=task_id)
-                    break
-                except:
-                    if tries >= max_tries:
-                        log.exception('EXCEPTION')
-                        raise
-                    else:
-                        time.sleep(3)
-
-            data['task_active'] = task_state.state in states.UNREADY_STATES
-            ar = AsyncResult(task_id)
-            result = ar.result
-            if result and isinstance(result, dict) and 'message' in result:
-                data['message'] = result['message']
+            # jobs are saved before their tasks are queued
+            job = jobs_models.Job.objects.get(
+                task_id=task_id, type=jobs_models.Job.TYPE_CHANGESET_REVIEW)
+            data['task_active'] = not job.is_ready()
+            last_message = job.get_last_message()
+            if last_message:
+                data['message'] = last_message['message']
 
             changeset_review_qs = (
                 changesetreviews_models.ChangesetReview.objects.filter(
@@ -523,12 +612,12 @@ class ChangesetResource(ModelResource):
             post_data = json.loads(request.raw_post_data)
             schema_version_id = int(post_data['schema_version_id'])
 
-            async_result = changesetreviews_tasks.review_changeset.delay(
+            job = changesetreviews_tasks.queue_review_changeset(
                 changeset_pk=changeset_id,
                 schema_version_pk=schema_version_id,
                 reviewed_by_user_pk=request.user.schemanizer_user.pk
             )
-            data['task_id'] = async_result.id
+            data['task_id'] = job.task_id
 
         except Exception, e:
             log.exception('EXCEPTION')
@@ -783,7 +872,8 @@ class ChangesetDetailResource(ModelResource):
     class Meta:
         queryset = changesets_models.ChangesetDetail.objects.all()
         resource_name = 'changeset_detail'
-        authentication = BasicAuthentication()
+        excludes = ['split_statements']
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -797,7 +887,7 @@ class TestTypeResource(ModelResource):
     class Meta:
         queryset = changesettests_models.TestType.objects.all()
         resource_name = 'test_type'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -815,11 +905,12 @@ class ChangesetTestResource(ModelResource):
     class Meta:
         queryset = changesettests_models.ChangesetTest.objects.all()
         resource_name = 'changeset_test'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
         filtering = {
+            'id': ALL,
             'changeset_detail': ALL_WITH_RELATIONS,
             'test_type': ALL_WITH_RELATIONS,
         }
@@ -829,7 +920,7 @@ class ValidationTypeResource(ModelResource):
     class Meta:
         queryset = changesetvalidations_models.ValidationType.objects.all()
         resource_name = 'validation_type'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
@@ -847,11 +938,12 @@ class ChangesetValidationResource(ModelResource):
     class Meta:
         queryset = changesetvalidations_models.ChangesetValidation.objects.all()
         resource_name = 'changeset_validation'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
         filtering = {
+            'id': ALL,
             'changeset': ALL_WITH_RELATIONS,
             'validation_type': ALL_WITH_RELATIONS,
         }
@@ -867,10 +959,29 @@ class ChangesetDetailApplyResource(ModelResource):
     class Meta:
         queryset = changesetapplies_models.ChangesetDetailApply.objects.all()
         resource_name = 'changeset_detail_apply'
-        authentication = BasicAuthentication()
+        authentication = authentications.default_authentication()
         authorization = ReadOnlyAuthorization()
         list_allowed_methods = ['get']
         detail_allowed_methods = ['get']
         filtering = {
+            'id': ALL,
             'changeset_detail': ALL_WITH_RELATIONS,
         }
+
+
+class EventResource(ModelResource):
+    user = fields.ForeignKey(UserResource, 'user', null=True, blank=True)
+
+    class Meta:
+        queryset = events_models.Event.objects.all()
+        resource_name = 'event'
+        authentication = authentications.default_authentication()
+        authorization = ReadOnlyAuthorization()
+        list_allowed_methods = ['get']
+        detail_allowed_methods = ['get']
+        paginator_class = paginators.EventPaginator
+        filtering = {
+            'datetime': ['exact', 'lt', 'lte', 'gt', 'gte', 'range'],
+            'type': ['exact', 'in'],
+            'user': ['exact'],
+        }
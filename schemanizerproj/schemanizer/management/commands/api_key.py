@@ -0,0 +1,29 @@
+from optparse import make_option
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from tastypie.models import ApiKey
+
+
+class Command(BaseCommand):
+    args = '<username>'
+    help = 'Prints the API key of a user, the key is created if needed.'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--regenerate', action='store_true', dest='regenerate',
+            default=False,
+            help='Replaces the API key with a new one.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Username is required.')
+        try:
+            user = User.objects.get(username=args[0])
+        except User.DoesNotExist:
+            raise CommandError('User %s does not exist.' % (args[0],))
+
+        api_key, created = ApiKey.objects.get_or_create(user=user)
+        if options['regenerate'] and not created:
+            api_key.key = api_key.generate_key()
+            api_key.save()
+        print api_key.key
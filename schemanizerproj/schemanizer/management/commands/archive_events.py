@@ -0,0 +1,48 @@
+import logging
+from optparse import make_option
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from dateutil import relativedelta
+from events import event_functions
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Moves old events to monthly compressed archive files.'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--days', dest='days', default=None, type='int',
+            help='Events older than this number of days are archived. '
+                 'Defaults to EVENT_RETENTION_DAYS setting.'),
+        make_option(
+            '--dir', dest='archive_dir', default=None,
+            help='Directory of the archive files. '
+                 'Defaults to EVENT_ARCHIVE_DIR setting.'),
+        make_option(
+            '--batch-size', dest='batch_size',
+            default=event_functions.ARCHIVE_BATCH_SIZE, type='int',
+            help='Number of events that are moved at a time.'),
+    )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = settings.EVENT_RETENTION_DAYS
+        archive_dir = options['archive_dir'] or settings.EVENT_ARCHIVE_DIR
+        before = timezone.now() - relativedelta.relativedelta(days=days)
+        print 'Archiving events before %s to %s...' % (
+            before.isoformat(), archive_dir)
+
+        try:
+            count = event_functions.archive_events(
+                before, archive_dir, batch_size=options['batch_size'])
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            sys.stderr.write('%s\n' % (msg,))
+            log.exception(msg)
+            return
+
+        print '%s event(s) were archived.' % (count,)
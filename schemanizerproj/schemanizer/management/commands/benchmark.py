@@ -0,0 +1,91 @@
+import json
+import platform
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from benchmarks import suite
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures time spent dumping, normalizing, hashing and diffing '
+        'schemas, and validating, reviewing and applying changesets, on a '
+        'synthetic schema and synthetic changesets. The schema is loaded '
+        'into a scratch database of the test MySQL server (TEST_DB_* '
+        'settings). Results are written as JSON.')
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--tables', dest='tables', default=10, type='int',
+            help='Number of tables of the schema.'),
+        make_option(
+            '--columns', dest='columns', default=10, type='int',
+            help='Number of columns of each table, besides the primary key.'),
+        make_option(
+            '--indexes', dest='indexes', default=2, type='int',
+            help='Number of indexes of each table, besides the primary key.'),
+        make_option(
+            '--changesets', dest='changesets', default=10, type='int',
+            help='Number of changesets.'),
+        make_option(
+            '--details', dest='details', default=3, type='int',
+            help='Number of details of each changeset.'),
+        make_option(
+            '--repeat', dest='repeat', default=3, type='int',
+            help='Number of times each benchmark is run.'),
+        make_option(
+            '--output', dest='output', default='benchmark_results.json',
+            help='File the results are written to.'),
+        make_option(
+            '--no-mysql', dest='mysql', default=True, action='store_false',
+            help='Skip the benchmarks that need a MySQL server.'),
+    )
+
+    def get_connection_options(self):
+        connection_options = {}
+        if settings.TEST_DB_HOST:
+            connection_options['host'] = settings.TEST_DB_HOST
+        if settings.TEST_DB_PORT:
+            connection_options['port'] = settings.TEST_DB_PORT
+        if settings.TEST_DB_USER:
+            connection_options['user'] = settings.TEST_DB_USER
+        if settings.TEST_DB_PASSWORD:
+            connection_options['passwd'] = settings.TEST_DB_PASSWORD
+        return connection_options
+
+    def handle(self, *args, **options):
+        parameters = dict(
+            (name, options[name])
+            for name in (
+                'tables', 'columns', 'indexes', 'changesets', 'details',
+                'repeat'))
+        if min(parameters.values()) < 1:
+            raise CommandError('Parameters must be positive.')
+        if options['indexes'] > options['columns']:
+            raise CommandError('There can not be more indexes than columns.')
+
+        results = suite.run_offline_benchmarks(
+            options['tables'], options['columns'], options['indexes'],
+            options['repeat'])
+        if options['mysql']:
+            results.update(suite.run_mysql_benchmarks(
+                self.get_connection_options(), **parameters))
+
+        print '%-22s %5s %10s %10s %10s' % (
+            'benchmark', 'runs', 'min', 'mean', 'max')
+        for name, timings in sorted(results.items()):
+            print '%-22s %5s %10.4f %10.4f %10.4f' % (
+                name, timings['runs'], timings['min'], timings['mean'],
+                timings['max'])
+        if 'apply_loop' in results and results['apply_loop']['errors']:
+            print 'Failed applies: %s' % (results['apply_loop']['errors'],)
+
+        with open(options['output'], 'w') as f:
+            json.dump(dict(
+                created_at=timezone.now().isoformat(),
+                parameters=parameters,
+                environment=dict(
+                    python=platform.python_version(),
+                    platform=platform.platform()),
+                results=results), f, indent=2, sort_keys=True)
+        print 'Results were written to %s.' % (options['output'],)
@@ -0,0 +1,65 @@
+import base64
+import time
+from optparse import make_option
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.client import RequestFactory
+from tastypie.authentication import BasicAuthentication
+from tastypie.models import ApiKey
+from utils import helpers
+from schemanizer.api import authentications
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures time and queries spent authenticating API requests with '
+        'HTTP basic authentication and with an API key. A temporary user '
+        'is created and deleted afterwards.')
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--requests', dest='requests', default=100, type='int',
+            help='Number of authenticated requests.'),
+    )
+
+    def run(self, name, authentication, request, requests):
+        query_count = len(connection.queries)
+        start = time.time()
+        for i in range(requests):
+            if authentication.is_authenticated(request) is not True:
+                raise CommandError('%s authentication failed.' % (name,))
+        seconds = time.time() - start
+        print '%-10s %8s %8s %10.3f %10.3f' % (
+            name, requests, len(connection.queries) - query_count,
+            seconds, seconds * 1000 / requests)
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        username = 'benchmark_%s' % (helpers.random_string(8),)
+        password = helpers.random_string(16)
+        user = User.objects.create_user(username, password=password)
+        api_key = ApiKey.objects.create(user=user)
+        request_factory = RequestFactory()
+        basic_request = request_factory.get(
+            '/api/v1/role/',
+            HTTP_AUTHORIZATION='Basic %s' % (
+                base64.b64encode('%s:%s' % (username, password)),))
+        api_key_request = request_factory.get(
+            '/api/v1/role/',
+            HTTP_AUTHORIZATION='ApiKey %s:%s' % (username, api_key.key))
+        # the first API key request is not cached
+        cache.delete(authentications.get_api_key_cache_key(username))
+        use_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        try:
+            print '%-10s %8s %8s %10s %10s' % (
+                'auth', 'requests', 'queries', 'seconds', 'ms/request')
+            self.run(
+                'basic', BasicAuthentication(), basic_request, requests)
+            self.run(
+                'api_key', authentications.CachedApiKeyAuthentication(),
+                api_key_request, requests)
+        finally:
+            connection.use_debug_cursor = use_debug_cursor
+            user.delete()
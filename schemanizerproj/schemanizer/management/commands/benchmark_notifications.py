@@ -0,0 +1,69 @@
+import time
+from optparse import make_option
+from django.core import mail
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from changesets import models as changesets_models
+from emails import email_functions
+from emails import models as emails_models
+from schemaversions import models as schemaversions_models
+from users import models as users_models
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures time and queries spent sending changeset notifications '
+        'for a burst of events, with and without digests. Emails are not '
+        'sent, they are kept in memory.')
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--events', dest='events', default=100, type='int',
+            help='Number of notifications of the same changeset.'),
+    )
+
+    def run(self, changeset, events, digest_window):
+        mail.outbox = []
+        cache.delete(emails_models.DBA_EMAILS_CACHE_KEY)
+        # digests are sent below instead of by a queued task
+        cache.set(email_functions.DIGEST_SCHEDULED_CACHE_KEY, True)
+        query_count = len(connection.queries)
+        start = time.time()
+        with override_settings(EMAIL_DIGEST_WINDOW=digest_window):
+            for i in range(events):
+                email_functions.send_mail_changeset_updated(changeset)
+            if digest_window:
+                email_functions.send_notification_digests()
+        seconds = time.time() - start
+        print '%-10s %8s %8s %8s %10.3f %10.3f' % (
+            'digest' if digest_window else 'immediate', events,
+            len(mail.outbox), len(connection.queries) - query_count,
+            seconds, seconds * 1000 / events)
+
+    def handle(self, *args, **options):
+        events = options['events']
+        submitted_by = users_models.User.objects.all()[:1]
+        if not submitted_by:
+            raise CommandError('There are no users.')
+
+        database_schema = schemaversions_models.DatabaseSchema.objects.create(
+            name='benchmark_notifications')
+        changeset = changesets_models.Changeset.objects.create(
+            database_schema=database_schema, submitted_by=submitted_by[0])
+        use_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        try:
+            with override_settings(
+                    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                    DISABLE_SEND_MAIL=False):
+                print '%-10s %8s %8s %8s %10s %10s' % (
+                    'mode', 'events', 'emails', 'queries', 'seconds',
+                    'ms/event')
+                self.run(changeset, events, 0)
+                self.run(changeset, events, 60)
+        finally:
+            connection.use_debug_cursor = use_debug_cursor
+            cache.delete(email_functions.DIGEST_SCHEDULED_CACHE_KEY)
+            changeset.delete()
+            database_schema.delete()
@@ -0,0 +1,28 @@
+import logging
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from jobs import job_functions
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    args = '<task_id task_id ...>'
+    help = (
+        'Cancels changeset review or apply tasks. Running tasks stop at '
+        'their next checkpoint.')
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError('At least one task ID is required.')
+
+        for task_id in args:
+            try:
+                if job_functions.cancel_job(task_id):
+                    print 'Cancellation of task %s was requested.' % (task_id,)
+                else:
+                    print 'Task %s has already ended.' % (task_id,)
+            except Exception, e:
+                msg = 'ERROR %s: %s' % (type(e), e)
+                sys.stderr.write('%s\n' % (msg,))
+                log.exception(msg)
@@ -0,0 +1,61 @@
+import logging
+from optparse import make_option
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from changesets import import_functions
+from users import models as users_models
+from utils import exceptions
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    args = '<directory or tar file>'
+    help = 'Imports changesets from the YAML files of a directory or tar file.'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--prefix', dest='prefix', default='',
+            help='Prefix of the repository filenames of the imported '
+                 'changesets, for example, changesets. Files are matched to '
+                 'changesets of the Github repository by repository '
+                 'filename.'),
+        make_option(
+            '--submitted-by', dest='submitted_by', default=None,
+            help='Name of the user that submitted changesets whose YAML '
+                 'files have no submitted_by field.'),
+        make_option(
+            '--no-review', action='store_false', dest='review', default=True,
+            help='Do not send emails and start reviews for the imported '
+                 'changesets.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Usage: import_changesets %s' % (self.args,))
+        submitted_by = None
+        if options['submitted_by']:
+            try:
+                submitted_by = users_models.User.objects.get(
+                    name=options['submitted_by'])
+            except users_models.User.DoesNotExist:
+                raise CommandError(
+                    'User %s does not exist.' % (options['submitted_by'],))
+
+        try:
+            files = import_functions.read_changeset_files(
+                args[0], prefix=options['prefix'])
+            print 'Importing %s file(s)...' % (len(files),)
+            changesets = import_functions.import_changesets(
+                files, submitted_by=submitted_by, review=options['review'])
+        except exceptions.ChangesetImportError, e:
+            for error in e.errors:
+                sys.stderr.write(u'%s\n' % (error,))
+            sys.stderr.write('%s\n' % (e.message,))
+            return
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            sys.stderr.write('%s\n' % (msg,))
+            log.exception(msg)
+            return
+
+        print '%s changeset(s) were imported.' % (len(changesets),)
@@ -0,0 +1,25 @@
+import logging
+import sys
+from django.core.management.base import BaseCommand
+from jobs import job_functions
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Terminates EC2 instances of jobs whose workers stopped sending '
+        'heartbeats and marks the jobs and stale tasks as failed.')
+
+    def handle(self, *args, **options):
+        try:
+            jobs = job_functions.reap_jobs()
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            sys.stderr.write('%s\n' % (msg,))
+            log.exception(msg)
+            return
+
+        for job in jobs:
+            print 'Reaped job [id=%s, task_id=%s].' % (job.pk, job.task_id)
+        print '%s job(s) were reaped.' % (len(jobs),)
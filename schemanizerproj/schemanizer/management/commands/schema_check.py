@@ -4,9 +4,10 @@ from optparse import make_option
 from django.core.management.base import BaseCommand
 
 from celery import states
-from djcelery import models as djcelery_models
 
 from emails import email_functions
+from events import event_bus
+from jobs import models as jobs_models
 from schemaversions import (
     event_handlers as schemaversions_event_handlers,
     models as schemaversions_models,
@@ -20,11 +21,15 @@ class Command(BaseCommand):
     option_list = BaseCommand.option_list
 
     def handle(self, *args, **options):
+        # events of all schema checks are inserted together
+        event_bus.begin()
         try:
-            task_states = djcelery_models.TaskState.objects.filter(
-                name='changesetapplies.tasks.apply_changeset',
+            # unfinished apply jobs of lost or killed tasks are failed by
+            # reap_jobs, so that they do not block schema checks forever
+            apply_jobs = jobs_models.Job.objects.filter(
+                type=jobs_models.Job.TYPE_CHANGESET_APPLY,
                 state__in=states.UNREADY_STATES)
-            if not task_states.exists():
+            if not apply_jobs.exists():
                 database_schemas = schemaversions_models.DatabaseSchema.objects.all()
                 server_list = list(servers_models.Server.objects.all())
                 for database_schema in database_schemas:
@@ -53,4 +58,5 @@ class Command(BaseCommand):
             log.exception(msg)
 
         finally:
+            event_bus.end()
             print 'schema_check finished.'
@@ -9,13 +9,31 @@ from django.core.management.base import BaseCommand, CommandError
 
 import requests
 from cmd2 import Cmd, make_option, options
-from requests.auth import HTTPBasicAuth
+from requests.auth import AuthBase
+from tastypie.models import ApiKey
 from texttable import Texttable
 
 from changesets import models as changesets_models
 
 log = logging.getLogger(__name__)
 
+# maximum number of objects retrieved by one API request
+OBJECTS_PER_REQUEST = 100
+
+
+class ApiKeyAuth(AuthBase):
+    """Authenticates API requests with an API key, unlike HTTP basic
+    authentication this does not hash the password on each request."""
+
+    def __init__(self, username, api_key):
+        self.username = username
+        self.api_key = api_key
+
+    def __call__(self, r):
+        r.headers['Authorization'] = 'ApiKey %s:%s' % (
+            self.username, self.api_key)
+        return r
+
 
 class Command(BaseCommand):
     option_list = BaseCommand.option_list
@@ -39,7 +57,8 @@ class SchemanizerCLI(Cmd):
         self.user = kwargs.pop('user')
         self.username = kwargs.pop('username')
         self.passwd = kwargs.pop('passwd')
-        self.api_auth = HTTPBasicAuth(self.username, self.passwd)
+        api_key, created = ApiKey.objects.get_or_create(user=self.user)
+        self.api_auth = ApiKeyAuth(self.username, api_key.key)
         self.site = Site.objects.get_current()
         self.prompt = 'Schemanizer(%s)> ' % (self.username)
         Cmd.__init__(self, *args, **kwargs)
@@ -102,7 +121,32 @@ class SchemanizerCLI(Cmd):
             self.print_topics(self.misc_header,  help.keys(),15,80)
             self.print_topics(self.undoc_header, cmds_undoc, 15,80)
             self.print_topics(self.schemanizer_header, cmds_schemanizer, 15,80)
-    
+
+    def get_task_status(self, task_ids):
+        '''Returns dict of task IDs and status of review and apply tasks.'''
+        r = requests.post('http://%s/api/v1/changeset/task_status/' % (self.site),
+                            data=json.dumps({'task_ids': task_ids}),
+                            auth=self.api_auth)
+        return r.json().get('tasks', {})
+
+    def get_objects(self, resource_name, ids):
+        '''Returns dict of IDs and objects of an API resource.
+
+        Objects are retrieved with one request per OBJECTS_PER_REQUEST IDs.
+        '''
+        objects = {}
+        for i in range(0, len(ids), OBJECTS_PER_REQUEST):
+            params = {
+                'id__in': ','.join(str(pk) for pk in ids[i:i + OBJECTS_PER_REQUEST]),
+                'limit': 0,
+            }
+            r = requests.get('http://%s/api/v1/%s/' % (self.site, resource_name),
+                                params=params,
+                                auth=self.api_auth)
+            for obj in r.json().get('objects', []):
+                objects[obj['id']] = obj
+        return objects
+
     def do_list_changesets(self, arg, opts=None):
         '''Show changesets needing review.'''
         changesets = requests.get('http://%s/api/v1/changeset/' % self.site, 
@@ -328,25 +372,19 @@ class SchemanizerCLI(Cmd):
                 changeset_test_ids = response.get('changeset_test_ids', [])
                 changeset_validation_ids = response.get(
                     'changeset_validation_ids', [])
+                changeset_validations = self.get_objects(
+                    'changeset_validation', changeset_validation_ids)
+                changeset_tests = self.get_objects(
+                    'changeset_test', changeset_test_ids)
                 print
                 print 'Validation Result Log:'
                 for i,val_id in enumerate(changeset_validation_ids):
-                    r = requests.get(
-                        'http://%s/api/v1/changeset_validation/%d/' % (
-                            self.site, val_id),
-                        auth=self.api_auth)
-                    response = r.json()
-                    log = response.get('result')
+                    log = changeset_validations.get(val_id, {}).get('result')
                     print '%d. %s' % (i+1, log)
                 print
                 print 'Test Result Log:'
                 for i,test_id in enumerate(changeset_test_ids):
-                    r = requests.get(
-                        'http://%s/api/v1/changeset_test/%d/' % (
-                            self.site, test_id),
-                        auth=self.api_auth)
-                    response = r.json()
-                    log = response.get('results_log')
+                    log = changeset_tests.get(test_id, {}).get('results_log')
                     print '%d. %s' % (i+1, log)
                 print
                 print '*** Changeset check successful.'
@@ -416,14 +454,11 @@ class SchemanizerCLI(Cmd):
                 tries = 0
                 while True:
                     tries += 1
-                    r = requests.get(
-                        'http://%s/api/v1/changeset/apply_status/%s/' % (
-                            self.site, task_id),
-                            auth=self.api_auth)
-                    response = r.json()
+                    task_status = self.get_task_status([task_id]).get(
+                        task_id, {})
                     # thread_is_alive = response.get('thread_is_alive')
-                    task_active = response.get('task_active')
-                    messages = response.get('messages', [])
+                    task_active = task_status.get('task_active')
+                    messages = task_status.get('messages', [])
 
                     if messages:
                         message = messages[-1]
@@ -437,16 +472,14 @@ class SchemanizerCLI(Cmd):
                             break
                     time.sleep(10)
 
-                changeset_detail_apply_ids = response.get(
-                    'changeset_detail_apply_ids', [])
+                changeset_detail_apply_ids = task_status.get(
+                    'result', {}).get('changeset_detail_apply_ids', [])
+                changeset_detail_applies = self.get_objects(
+                    'changeset_detail_apply', changeset_detail_apply_ids)
                 print 'Apply Changeset Result Log:'
                 for i,apply_id in enumerate(changeset_detail_apply_ids):
-                    r = requests.get(
-                        'http://%s/api/v1/changeset_detail_apply/%d/' % (
-                            self.site, apply_id),
-                            auth=self.api_auth)
-                    response = r.json()
-                    log = response.get('results_log')
+                    log = changeset_detail_applies.get(apply_id, {}).get(
+                        'results_log')
                     print '%d. %s' % (i+1, log)
                 print
                 print '*** Changeset application successful.'
@@ -0,0 +1,47 @@
+import socket
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def get_worker_command(worker, loglevel='INFO', hostname=None):
+    """Returns command that starts the Celery worker of a workload.
+
+    The node name of the worker is the workload name followed by hostname,
+    the host name of this host by default. celery worker does not expand %h
+    in node names, so the host name is substituted here.
+    """
+
+    if hostname is None:
+        hostname = socket.gethostname()
+    args = [
+        './manage.py', 'celery', 'worker', '-E',
+        '--loglevel=%s' % (loglevel,),
+        '-Q', ','.join(worker['queues']),
+        '-n', '%s.%s' % (worker['name'], hostname)]
+    if worker.get('autoscale'):
+        args.append('--autoscale=%s,%s' % tuple(worker['autoscale']))
+    elif worker.get('concurrency'):
+        args.append('--concurrency=%s' % (worker['concurrency'],))
+    return ' '.join(args)
+
+
+class Command(BaseCommand):
+    help = (
+        'Prints the commands that start a Celery worker for each workload '
+        'in CELERY_WORKERS setting.')
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--loglevel', dest='loglevel', default='INFO',
+            help='Log level of the workers.'),
+        make_option(
+            '--hostname', dest='hostname', default=None,
+            help='Host name in the node names of the workers, defaults to '
+                 'the host name of this host.'),
+    )
+
+    def handle(self, *args, **options):
+        for worker in settings.CELERY_WORKERS:
+            print get_worker_command(
+                worker, loglevel=options['loglevel'],
+                hostname=options['hostname'])
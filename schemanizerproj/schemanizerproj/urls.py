@@ -25,6 +25,7 @@ v1_api.register(resources.ChangesetTestResource())
 v1_api.register(resources.ValidationTypeResource())
 v1_api.register(resources.ChangesetValidationResource())
 v1_api.register(resources.ChangesetDetailApplyResource())
+v1_api.register(resources.EventResource())
 
 from schemanizer.forms import AuthenticationForm
 
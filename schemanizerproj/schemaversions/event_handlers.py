@@ -1,7 +1,7 @@
 from django.conf import settings
 from django.contrib import messages
-from django.utils import timezone
 
+from events import event_bus
 from events import models as events_models
 
 
@@ -10,11 +10,9 @@ def on_schema_version_generated(request, obj, created):
         'Generated schema version [id=%s, database_schema=%s, '
         'pulled_from=%s].' % (
             obj.pk, obj.database_schema.name, obj.pulled_from))
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.schema_version_generated,
-        description=description,
-        user=request.user.schemanizer_user)
+    event_bus.record(
+        events_models.Event.TYPE.schema_version_generated, description,
+        request.user.schemanizer_user, schema_version_pk=obj.pk)
     messages.success(request, description)
 
 
@@ -25,11 +23,9 @@ def on_schema_check(database_schema, request=None):
 
     description = 'Schema check was performed for database schema \'%s\'.' % (
         database_schema.name,)
-    events_models.Event.objects.create(
-        datetime=timezone.now(),
-        type=events_models.Event.TYPE.schema_check,
-        description=description,
-        user=user)
+    event_bus.record(
+        events_models.Event.TYPE.schema_check, description, user,
+        database_schema_pk=database_schema.pk)
 
     if request:
         messages.success(request, description)
\ No newline at end of file
@@ -1,7 +1,9 @@
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.urlresolvers import reverse
 from django.db import models
-from utils import models as utils_models, mysql_functions, helpers
+from utils import (
+    cache_functions, models as utils_models, mysql_functions, helpers)
 from servers import models as servers_models
 
 
@@ -15,9 +17,9 @@ class DatabaseSchema(utils_models.TimeStampedModel):
         return self.name
 
     def get_latest_schema_version(self):
-        schema_versions = SchemaVersion.objects.filter(
-            database_schema=self).order_by('-updated_at', 'id')
-        if schema_versions.exists():
+        schema_versions = list(SchemaVersion.objects.filter(
+            database_schema=self).order_by('-updated_at', '-id')[:1])
+        if schema_versions:
             return schema_versions[0]
         else:
             return None
@@ -32,10 +34,10 @@ class DatabaseSchema(utils_models.TimeStampedModel):
             schema_exists = server.schema_exists(
                 self.name, connection_options)
             if schema_exists:
-                schema_dump = server.dump_schema(self.name, connection_options)
+                schema_hash = server.dump_schema_hash(
+                    self.name, connection_options)
             else:
-                schema_dump = ''
-            schema_hash = mysql_functions.generate_schema_hash(schema_dump)
+                schema_hash = mysql_functions.generate_schema_hash('')
             schema_version = None
             try:
                 if schema_exists:
@@ -48,6 +50,12 @@ class DatabaseSchema(utils_models.TimeStampedModel):
             if schema_version is None:
                 # get different of host schema from latest schema version
                 latest_schema_version = self.get_latest_schema_version()
+                # the schema is dumped again only for the diff
+                if schema_exists:
+                    schema_dump = server.dump_schema(
+                        self.name, connection_options)
+                else:
+                    schema_dump = ''
                 latest_schema_version_ddl = ''
                 if latest_schema_version:
                     latest_schema_version_ddl = latest_schema_version.ddl
@@ -81,8 +89,27 @@ class SchemaVersion(utils_models.TimeStampedModel):
 
     class Meta:
         db_table = 'schema_versions'
+        # the unique index also serves lookups by database schema and
+        # checksum
         unique_together = (('database_schema', 'checksum'),)
+        # latest schema version of a database schema
+        index_together = (('database_schema', 'updated_at'),)
 
     def __unicode__(self):
         return 'SchemaVersion: id=%s, database_schema=%s' % (
-            self.pk, self.database_schema)
\ No newline at end of file
+            self.pk, self.database_schema)
+
+    def get_download_ddl_url(self):
+        """Returns URL for downloading DDL, the URL includes the checksum so
+        that responses can be cached by browsers."""
+        if self.checksum:
+            return reverse(
+                'schemaversions_schema_version_download_ddl_checksum',
+                args=[self.pk, self.checksum])
+        return reverse(
+            'schemaversions_schema_version_download_ddl', args=[self.pk])
+
+
+cache_functions.register_model(SchemaVersion, 'schema_versions')
+cache_functions.register_model(
+    DatabaseSchema, 'changesets', 'schema_versions', 'server_data')
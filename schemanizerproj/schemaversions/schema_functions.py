@@ -1,3 +1,4 @@
+import calendar
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
@@ -20,10 +21,11 @@ def generate_schema_version(server, schema_name, connection_options=None):
     checksum = mysql_functions.generate_schema_hash(schema_dump)
     schema_version_created = False
     try:
+        # the DDL of a schema version is not changed, it is served with the
+        # checksum as its ETag
         schema_version = models.SchemaVersion.objects.get(
             database_schema=database_schema,
             checksum=checksum)
-        schema_version.ddl = schema_dump
         schema_version.pulled_from = server
         schema_version.pull_datetime = timezone.now()
         schema_version.save()
@@ -31,7 +33,7 @@ def generate_schema_version(server, schema_name, connection_options=None):
         schema_version = models.SchemaVersion.objects.create(
             database_schema=database_schema,
             ddl=schema_dump,
-            checksum=mysql_functions.generate_schema_hash(schema_dump),
+            checksum=checksum,
             pulled_from=server,
             pull_datetime=timezone.now())
         schema_version_created = True
@@ -64,12 +66,76 @@ def save_schema_dump(
     schema_version, __ = (
         models.SchemaVersion.objects.get_or_create(
             database_schema=database_schema,
-            checksum=checksum))
+            checksum=checksum,
+            defaults=dict(ddl=structure)))
 
-    schema_version.ddl=structure
-    schema_version.checksum=checksum
     schema_version.pulled_from = server
     schema_version.pull_datetime = timezone.now()
     schema_version.save()
 
-    return schema_version
\ No newline at end of file
+    return schema_version
+
+
+def iter_ddl_chunks(schema_version_pk, chunk_size=None):
+    """Yields DDL of schema version in chunks of chunk_size characters.
+
+    Each chunk is read from the database with its own query, so that the
+    whole DDL is not kept in memory. MySQL reads the whole DDL for every
+    SUBSTRING() query though, so reading a DDL costs its length times the
+    number of chunks. Chunks are large to keep that number small, most DDLs
+    are read with a single query, at the cost of keeping up to chunk_size
+    characters in memory.
+    """
+
+    if chunk_size is None:
+        chunk_size = settings.SCHEMA_VERSION_DDL_CHUNK_SIZE
+    schema_versions = models.SchemaVersion.objects.filter(pk=schema_version_pk)
+    # the length is read with the first chunk, so that no query is needed
+    # to find the end of the DDL
+    chunk, length = schema_versions.extra(
+        select={
+            'ddl_chunk': 'SUBSTRING(ddl, 1, %s)',
+            'ddl_length': 'CHAR_LENGTH(ddl)'},
+        select_params=(chunk_size,)).values_list(
+            'ddl_chunk', 'ddl_length').get()
+    position = 1
+    while True:
+        if chunk:
+            yield chunk.encode('utf-8')
+        position += chunk_size
+        if position > length:
+            break
+        chunk = schema_versions.extra(
+            select={'ddl_chunk': 'SUBSTRING(ddl, %s, %s)'},
+            select_params=(position, chunk_size)).values_list(
+                'ddl_chunk', flat=True).get()
+
+
+def iter_schema_version_files(schema_versions, batch_size=None):
+    """Yields (name, data, mtime) tuples of DDL files of schema versions,
+    as used by utils.stream_functions.tar_chunks().
+
+    DDL of batch_size schema versions is read from the database at a time.
+    """
+
+    if batch_size is None:
+        batch_size = settings.SCHEMA_VERSION_EXPORT_BATCH_SIZE
+    pks = list(schema_versions.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(pks), batch_size):
+        batch = (
+            models.SchemaVersion.objects
+            .filter(pk__in=pks[i:i + batch_size])
+            .select_related('database_schema')
+            .order_by('pk'))
+        for schema_version in batch:
+            name = u'%s/schema_version_%s_%s.sql' % (
+                schema_version.database_schema.name, schema_version.pk,
+                schema_version.checksum)
+            mtime = 0
+            modified = (
+                schema_version.pull_datetime or schema_version.created_at)
+            if modified:
+                mtime = calendar.timegm(modified.utctimetuple())
+            yield (
+                name.encode('utf-8'), schema_version.ddl.encode('utf-8'),
+                mtime)
@@ -5,7 +5,14 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import base64
+import gzip
+import json
+import tarfile
+from StringIO import StringIO
+from django.core.urlresolvers import reverse
 from django.test import TestCase
+from . import models, schema_functions
 
 
 class SimpleTest(TestCase):
@@ -14,3 +21,252 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class SchemaVersionResourceTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        database_schema = models.DatabaseSchema.objects.create(
+            name='test_schema_version_resource')
+        self.schema_version = models.SchemaVersion.objects.create(
+            database_schema=database_schema,
+            ddl='CREATE TABLE t1 (id int);', checksum='checksum1')
+
+    def get(self, url, data=None, **extra):
+        params = {'format': 'json'}
+        params.update(data or {})
+        return self.client.get(
+            url, params,
+            HTTP_AUTHORIZATION='Basic %s' % (
+                base64.b64encode('admin:admin'),),
+            **extra)
+
+    def get_list_url(self):
+        return reverse(
+            'api_dispatch_list',
+            kwargs={'api_name': 'v1', 'resource_name': 'schema_version'})
+
+    def get_detail_url(self):
+        return reverse(
+            'api_dispatch_detail',
+            kwargs={
+                'api_name': 'v1', 'resource_name': 'schema_version',
+                'pk': self.schema_version.pk})
+
+    def test_list_without_ddl(self):
+        data = json.loads(self.get(self.get_list_url()).content)
+        obj = data['objects'][0]
+        self.assertNotIn('ddl', obj)
+        self.assertEqual(obj['checksum'], 'checksum1')
+        self.assertEqual(
+            obj['database_schema'],
+            '/api/v1/database_schema/%s/' % (
+                self.schema_version.database_schema_id,))
+
+    def test_detail_with_ddl(self):
+        data = json.loads(self.get(self.get_detail_url()).content)
+        self.assertEqual(data['ddl'], 'CREATE TABLE t1 (id int);')
+
+    def test_sparse_fields(self):
+        data = json.loads(
+            self.get(self.get_detail_url(), {'fields': 'id,checksum'}).content)
+        self.assertEqual(
+            sorted(data.keys()), ['checksum', 'id', 'resource_uri'])
+
+        data = json.loads(
+            self.get(self.get_detail_url(), {'exclude': 'ddl'}).content)
+        self.assertNotIn('ddl', data)
+        self.assertIn('checksum', data)
+
+    def test_ddl(self):
+        response = self.get(reverse(
+            'api_schema_version_ddl',
+            kwargs={
+                'api_name': 'v1', 'resource_name': 'schema_version',
+                'schema_version_id': self.schema_version.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertEqual(response.content, 'CREATE TABLE t1 (id int);')
+
+    def test_ddl_not_modified(self):
+        url = reverse(
+            'api_schema_version_ddl',
+            kwargs={
+                'api_name': 'v1', 'resource_name': 'schema_version',
+                'schema_version_id': self.schema_version.pk})
+        response = self.get(url)
+        self.assertEqual(response['ETag'], '"checksum1"')
+        response = self.get(url, HTTP_IF_NONE_MATCH='"checksum1"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, '')
+
+    def test_gzip(self):
+        # responses shorter than 200 bytes are not compressed
+        self.schema_version.ddl = 'CREATE TABLE t1 (id int);\n' * 20
+        self.schema_version.save()
+        response = self.get(
+            self.get_detail_url(), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(
+            gzip.GzipFile(fileobj=StringIO(response.content)).read())
+        self.assertEqual(data['ddl'], self.schema_version.ddl)
+
+
+class SchemaVersionHttpCachingTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        database_schema = models.DatabaseSchema.objects.create(
+            name='test_schema_version_http_caching')
+        self.schema_version = models.SchemaVersion.objects.create(
+            database_schema=database_schema,
+            ddl='CREATE TABLE t1 (id int);', checksum='checksum1')
+        self.client.login(username='admin', password='admin')
+
+    def test_download_ddl(self):
+        url = reverse(
+            'schemaversions_schema_version_download_ddl',
+            args=[self.schema_version.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['ETag'], '"checksum1"')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"checksum1"')
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"checksum0"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_download_ddl_checksum_url(self):
+        url = self.schema_version.get_download_ddl_url()
+        self.assertEqual(
+            url,
+            reverse(
+                'schemaversions_schema_version_download_ddl_checksum',
+                args=[self.schema_version.pk, 'checksum1']))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(reverse(
+            'schemaversions_schema_version_download_ddl_checksum',
+            args=[self.schema_version.pk, 'checksum0']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_ajax_get_schema_version(self):
+        url = reverse('schemaversions_ajax_get_schema_version')
+        params = dict(schema_version_id=self.schema_version.pk)
+        response = self.client.get(
+            url, params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response['ETag'], '"checksum1"')
+        html = json.loads(response.content)['schema_version_html']
+        self.assertIn('CREATE TABLE t1 (id int);', html)
+
+        # rendered DDL is cached for the checksum
+        models.SchemaVersion.objects.filter(pk=self.schema_version.pk).update(
+            ddl='CREATE TABLE t2 (id int);')
+        response = self.client.get(
+            url, params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(
+            json.loads(response.content)['schema_version_html'], html)
+
+        response = self.client.get(
+            url, params, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_IF_NONE_MATCH='"checksum1"')
+        self.assertEqual(response.status_code, 304)
+
+
+class SchemaVersionStreamingTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        self.database_schema = models.DatabaseSchema.objects.create(
+            name='test_schema_version_streaming')
+        self.schema_versions = [
+            models.SchemaVersion.objects.create(
+                database_schema=self.database_schema,
+                ddl='CREATE TABLE t%s (id int);\n' % (i,) * 10,
+                checksum='checksum%s' % (i,))
+            for i in range(3)]
+        self.client.login(username='admin', password='admin')
+
+    def test_iter_ddl_chunks(self):
+        schema_version = self.schema_versions[0]
+        chunks = list(schema_functions.iter_ddl_chunks(
+            schema_version.pk, chunk_size=100))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(''.join(chunks), schema_version.ddl)
+        # a DDL of exactly one chunk is read with a single query
+        with self.assertNumQueries(1):
+            chunks = list(schema_functions.iter_ddl_chunks(
+                schema_version.pk, chunk_size=len(schema_version.ddl)))
+        self.assertEqual(chunks, [schema_version.ddl])
+
+    def test_download_ddl(self):
+        schema_version = self.schema_versions[0]
+        url = reverse(
+            'schemaversions_schema_version_download_ddl',
+            args=[schema_version.pk])
+        with self.settings(SCHEMA_VERSION_DDL_CHUNK_SIZE=100):
+            response = self.client.get(url)
+            self.assertTrue(response.streaming)
+            self.assertEqual(
+                ''.join(response.streaming_content), schema_version.ddl)
+
+            response = self.client.get(url, {'compression': 'gzip'})
+            self.assertIn('.sql.gz', response['Content-Disposition'])
+            data = ''.join(response.streaming_content)
+        self.assertEqual(
+            gzip.GzipFile(fileobj=StringIO(data)).read(), schema_version.ddl)
+
+    def test_export(self):
+        other_schema = models.DatabaseSchema.objects.create(
+            name='test_schema_version_streaming_other')
+        models.SchemaVersion.objects.create(
+            database_schema=other_schema, ddl='', checksum='checksum')
+
+        with self.settings(SCHEMA_VERSION_EXPORT_BATCH_SIZE=2):
+            response = self.client.get(
+                reverse('schemaversions_schema_version_export'),
+                {'database_schema_id': self.database_schema.pk,
+                 'compression': 'gzip'})
+            data = ''.join(response.streaming_content)
+        tar = tarfile.open(fileobj=StringIO(data), mode='r:gz')
+        names = [
+            'test_schema_version_streaming/schema_version_%s_%s.sql' % (
+                schema_version.pk, schema_version.checksum)
+            for schema_version in self.schema_versions]
+        self.assertEqual(tar.getnames(), names)
+        self.assertEqual(
+            tar.extractfile(names[1]).read(), self.schema_versions[1].ddl)
+
+
+class SchemaVersionListTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        self.database_schema = models.DatabaseSchema.objects.create(
+            name='test_schema_version_list')
+        self.schema_versions = [
+            models.SchemaVersion.objects.create(
+                database_schema=self.database_schema,
+                ddl='CREATE TABLE t%s (id int, name varchar(255));' % (i,),
+                checksum='checksum%s' % (i,))
+            for i in range(3)]
+        self.client.login(username='admin', password='admin')
+
+    def test_list(self):
+        response = self.client.get(
+            reverse('schemaversions_schema_version_list'),
+            dict(database_schema_id=self.database_schema.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [schema_version.pk for schema_version in response.context['page']],
+            [schema_version.pk
+             for schema_version in reversed(self.schema_versions)])
+        self.assertContains(response, 'CREATE TABLE t2 (id int, na...')
+        self.assertNotContains(response, 'varchar(255)')
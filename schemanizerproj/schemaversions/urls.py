@@ -26,6 +26,14 @@ urlpatterns = patterns('',
         r'^schema-version/download-ddl/(?P<schema_version_pk>\d+)/$',
         views.SchemaVersionDdlDownload.as_view(),
         name='schemaversions_schema_version_download_ddl'),
+    url(
+        r'^schema-version/download-ddl/(?P<schema_version_pk>\d+)/'
+        r'(?P<checksum>\w+)/$',
+        views.SchemaVersionDdlDownload.as_view(),
+        name='schemaversions_schema_version_download_ddl_checksum'),
+    url(
+        r'^schema-version/export/$', views.SchemaVersionExport.as_view(),
+        name='schemaversions_schema_version_export'),
     url(
         r'^ajax-get-schema-version/$',
         'schemaversions.views.ajax_get_schema_version',
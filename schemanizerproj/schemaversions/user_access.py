@@ -32,10 +32,19 @@ def check_schema_version_generate_access(request, *args, **kwargs):
         raise exceptions.UserAccessError(MSG_ACCESS_DENIED)
 
 
+def check_schema_version_export_access(request, *args, **kwargs):
+    role_class = users_models.Role
+    if request.user.schemanizer_user.role.name not in (
+            role_class.NAME.developer, role_class.NAME.dba,
+            role_class.NAME.admin):
+        raise exceptions.UserAccessError(MSG_ACCESS_DENIED)
+
+
 access_map = {
     'schemaversions_database_schema_list': check_database_schema_list_access,
     'schemaversions_schema_version_list': check_schema_version_list_access,
     'schemaversions_schema_version_generate': check_schema_version_generate_access,
+    'schemaversions_schema_version_export': check_schema_version_export_access,
 }
 
 
@@ -1,31 +1,63 @@
 import json
 import logging
-import StringIO
 import urllib
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.servers.basehttp import FileWrapper
+from django.core.cache import cache
 from django.core.urlresolvers import reverse_lazy, reverse
-from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse)
 from django.shortcuts import redirect
 from django.template import RequestContext
 from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 from django.views.generic import ListView, FormView, DetailView, View
 
 from servers import models as servers_models
-from utils import decorators
+from utils import decorators, stream_functions
+from utils import views as utils_views
 from . import (
     models, user_access, forms, schema_functions, event_handlers)
 
 log = logging.getLogger(__name__)
 MSG_USER_NO_ACCESS = u'You do not have access to this page.'
 MSG_NOT_AJAX = u'Request must be a valid XMLHttpRequest.'
+# responses of URLs that include the checksum do not change
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# number of characters of DDL shown on the schema version list
+DDL_PREVIEW_LENGTH = 30
 
 
-class DatabaseSchemaList(ListView):
+def _get_checksum(schema_version_pk, checksum=None):
+    """Returns checksum of schema version, used as ETag of its DDL."""
+    schema_versions = models.SchemaVersion.objects.filter(
+        pk=int(schema_version_pk))
+    if checksum is not None:
+        schema_versions = schema_versions.filter(checksum=checksum)
+    checksums = list(schema_versions.values_list('checksum', flat=True)[:1])
+    if checksums and checksums[0]:
+        return checksums[0]
+    return None
+
+
+def _schema_version_ddl_etag(request, schema_version_pk, checksum=None):
+    return _get_checksum(schema_version_pk, checksum)
+
+
+def _ajax_get_schema_version_etag(request, *args, **kwargs):
+    if not request.is_ajax() or not request.user.is_authenticated():
+        return None
+    schema_version_id = request.GET.get('schema_version_id', '').strip()
+    if not schema_version_id.isdigit():
+        return None
+    return _get_checksum(schema_version_id)
+
+
+class DatabaseSchemaList(utils_views.KeysetListMixin, ListView):
     model = models.DatabaseSchema
 
     @method_decorator(login_required)
@@ -35,8 +67,12 @@ class DatabaseSchemaList(ListView):
             request, *args, **kwargs)
 
 
-class SchemaVersionList(ListView):
+class SchemaVersionList(utils_views.KeysetListMixin, ListView):
     model = models.SchemaVersion
+    filter_fields = (
+        ('database_schema_id', 'database_schema'),
+        ('pulled_from_id', 'pulled_from'),
+    )
 
     @method_decorator(login_required)
     @decorators.check_access(user_access.check_access)
@@ -44,6 +80,14 @@ class SchemaVersionList(ListView):
         return super(SchemaVersionList, self).dispatch(
             request, *args, **kwargs)
 
+    def get_queryset(self):
+        # only the beginning of the DDL is read, one character more than
+        # shown so that truncatechars adds the ellipsis to longer DDL
+        return models.SchemaVersion.objects.select_related(
+            'database_schema', 'pulled_from').defer('ddl').extra(
+                select={'ddl_preview': 'SUBSTRING(ddl, 1, %s)'},
+                select_params=(DDL_PREVIEW_LENGTH + 1,))
+
 
 class SchemaVersionGenerate(FormView):
     template_name = 'schemaversions/schemaversion_generate.html'
@@ -159,20 +203,81 @@ class SchemaVersionDdlDownload(View):
         return super(SchemaVersionDdlDownload, self).dispatch(
             request, *args, **kwargs)
 
+    @method_decorator(etag(_schema_version_ddl_etag))
     def get(self, request, *args, **kwargs):
         try:
             schema_version_pk = int(self.kwargs['schema_version_pk'])
-            schema_version = models.SchemaVersion.objects.get(
-                pk=schema_version_pk)
-            ddl_file = StringIO.StringIO()
-            ddl_file.write(schema_version.ddl)
-            response = HttpResponse(
-                FileWrapper(ddl_file), content_type='text/plain')
+            filters = dict(pk=schema_version_pk)
+            if 'checksum' in self.kwargs:
+                filters['checksum'] = self.kwargs['checksum']
+            schema_version = models.SchemaVersion.objects.defer('ddl').get(
+                **filters)
+            chunks = schema_functions.iter_ddl_chunks(schema_version.pk)
+            filename = 'schema_version_%s.sql' % (schema_version.pk,)
+            content_type = 'text/plain; charset=utf-8'
+            if request.GET.get('compression') == 'gzip':
+                chunks = stream_functions.gzip_chunks(chunks)
+                filename = '%s.gz' % (filename,)
+                content_type = 'application/x-gzip'
+            response = StreamingHttpResponse(
+                chunks, content_type=content_type)
+            response['Content-Disposition'] = (
+                'attachment; filename=%s' % (filename,))
+            if 'checksum' in self.kwargs:
+                patch_cache_control(
+                    response, private=True, max_age=IMMUTABLE_MAX_AGE,
+                    immutable=True)
+            else:
+                # revalidated with the ETag
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        except Exception, e:
+            msg = 'ERROR %s: %s' % (type(e), e)
+            log.exception(msg)
+            messages.error(request, msg)
+
+        raise Http404
+
+
+class SchemaVersionExport(View):
+    """Streams a tar archive of DDL of schema versions.
+
+    The schema versions can be limited to a database schema with the
+    database_schema_id query parameter, the archive is gzip-compressed if the
+    compression query parameter is 'gzip'.
+    """
+
+    @method_decorator(login_required)
+    @decorators.check_access(user_access.check_access)
+    def dispatch(self, request, *args, **kwargs):
+        return super(SchemaVersionExport, self).dispatch(
+            request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        if not self.allow_user_access:
+            return HttpResponseForbidden(MSG_USER_NO_ACCESS)
+        try:
+            schema_versions = models.SchemaVersion.objects.all()
+            filename = 'schema_versions'
+            database_schema_id = request.GET.get('database_schema_id')
+            if database_schema_id:
+                database_schema = models.DatabaseSchema.objects.get(
+                    pk=int(database_schema_id))
+                schema_versions = schema_versions.filter(
+                    database_schema=database_schema)
+                filename = 'schema_versions_%s' % (database_schema.pk,)
+            chunks = stream_functions.tar_chunks(
+                schema_functions.iter_schema_version_files(schema_versions))
+            filename = '%s.tar' % (filename,)
+            content_type = 'application/x-tar'
+            if request.GET.get('compression') == 'gzip':
+                chunks = stream_functions.gzip_chunks(chunks)
+                filename = '%s.gz' % (filename,)
+                content_type = 'application/x-gzip'
+            response = StreamingHttpResponse(
+                chunks, content_type=content_type)
             response['Content-Disposition'] = (
-                'attachment; filename=schema_version_%s.sql' % (
-                    schema_version.pk,))
-            response['Content-Length'] = ddl_file.tell()
-            ddl_file.seek(0)
+                'attachment; filename=%s' % (filename,))
             return response
         except Exception, e:
             msg = 'ERROR %s: %s' % (type(e), e)
@@ -182,6 +287,7 @@ class SchemaVersionDdlDownload(View):
         raise Http404
 
 
+@etag(_ajax_get_schema_version_etag)
 def ajax_get_schema_version(
         request, template='schemaversions/ajax_get_schema_version.html'):
     if not request.is_ajax():
@@ -195,11 +301,24 @@ def ajax_get_schema_version(
         schema_version_id = request.GET['schema_version_id'].strip()
         if schema_version_id:
             schema_version_id = int(schema_version_id)
-            schema_version = models.SchemaVersion.objects.get(
-                pk=schema_version_id)
-            data['schema_version_html'] = render_to_string(
-                template, {'obj': schema_version},
-                context_instance=RequestContext(request))
+            checksum = models.SchemaVersion.objects.values_list(
+                'checksum', flat=True).get(pk=schema_version_id)
+            # the DDL of a schema version does not change for its checksum
+            cache_key = 'schemaversions:schema_version_html:%s:%s:%s' % (
+                template, schema_version_id, checksum)
+            schema_version_html = cache.get(cache_key)
+            if schema_version_html is None:
+                schema_version = (
+                    models.SchemaVersion.objects
+                    .select_related('database_schema')
+                    .get(pk=schema_version_id))
+                schema_version_html = render_to_string(
+                    template, {'obj': schema_version},
+                    context_instance=RequestContext(request))
+                cache.set(
+                    cache_key, schema_version_html,
+                    settings.SCHEMA_VERSION_HTML_CACHE_TIMEOUT)
+            data['schema_version_html'] = schema_version_html
         else:
             data['schema_version_html'] = ''
 
@@ -210,4 +329,7 @@ def ajax_get_schema_version(
         data = dict(error=msg)
         data_json = json.dumps(data)
 
-    return HttpResponse(data_json, mimetype='application/json')
\ No newline at end of file
+    response = HttpResponse(data_json, mimetype='application/json')
+    # revalidated with the ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -2,7 +2,7 @@ import pprint
 import MySQLdb
 from django.conf import settings
 from django.db import models
-from utils import models as utils_models, mysql_functions
+from utils import cache_functions, models as utils_models, mysql_functions
 
 
 class Environment(utils_models.TimeStampedModel):
@@ -68,7 +68,7 @@ class Server(utils_models.TimeStampedModel):
                     schema_list.append(row[0])
         return schema_list
 
-    def dump_schema(self, schema_name, connection_options=None):
+    def _get_dump_connection_options(self, connection_options=None):
         if connection_options is None:
             connection_options = {
                 'user': settings.MYSQL_USER,
@@ -78,8 +78,20 @@ class Server(utils_models.TimeStampedModel):
         connection_options.update({'host': self.hostname})
         if self.port:
             connection_options['port'] = self.port
+        return connection_options
+
+    def dump_schema(self, schema_name, connection_options=None):
+        connection_options = self._get_dump_connection_options(
+            connection_options)
         return mysql_functions.dump_schema(schema_name, **connection_options)
 
+    def dump_schema_hash(self, schema_name, connection_options=None):
+        """Returns hash of schema dump without keeping the dump."""
+        connection_options = self._get_dump_connection_options(
+            connection_options)
+        return mysql_functions.dump_schema_hash(
+            schema_name, **connection_options)
+
 
 class ServerData(utils_models.TimeStampedModel):
     server = models.ForeignKey(Server)
@@ -92,4 +104,8 @@ class ServerData(utils_models.TimeStampedModel):
 
     class Meta:
         db_table = 'server_data'
-        unique_together = (('server', 'database_schema'),)
\ No newline at end of file
+        unique_together = (('server', 'database_schema'),)
+
+
+cache_functions.register_model(ServerData, 'server_data')
+cache_functions.register_model(Server, 'server_data')
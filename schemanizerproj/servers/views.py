@@ -6,7 +6,7 @@ from django.shortcuts import redirect
 from django.utils.decorators import method_decorator
 from django.views.generic import (
     ListView, CreateView, UpdateView, DeleteView, TemplateView, DetailView)
-from utils import decorators, forms as utils_forms
+from utils import decorators, forms as utils_forms, views as utils_views
 from . import event_handlers, forms, models, user_access, server_discovery
 
 
@@ -80,14 +80,25 @@ class EnvironmentDelete(DeleteView):
         return return_value
 
 
-class ServerList(ListView):
+class ServerList(utils_views.KeysetListMixin, ListView):
     model = models.Server
+    sorts = (
+        ('name', ('name',)),
+        ('newest', ('-id',)),
+        ('oldest', ('id',)),
+    )
+    filter_fields = (
+        ('environment_id', 'environment'),
+    )
 
     @method_decorator(login_required)
     @decorators.check_access(user_access.check_access)
     def dispatch(self, request, *args, **kwargs):
         return super(ServerList, self).dispatch(request, *args, **kwargs)
 
+    def get_queryset(self):
+        return models.Server.objects.select_related('environment')
+
 
 class ServerCreate(CreateView):
     model = models.Server
@@ -176,8 +187,12 @@ class DiscoverMySqlServers(TemplateView):
         return redirect('servers_server_list')
 
 
-class ServerDataList(ListView):
+class ServerDataList(utils_views.KeysetListMixin, ListView):
     model = models.ServerData
+    filter_fields = (
+        ('database_schema_id', 'database_schema'),
+        ('server_id', 'server'),
+    )
 
     @method_decorator(login_required)
     @decorators.check_access(user_access.check_access)
@@ -185,11 +200,13 @@ class ServerDataList(ListView):
         return super(ServerDataList, self).dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        qs = models.ServerData.objects.all()
-        database_schema_id = self.request.GET.get('database_schema_id')
-        if database_schema_id:
-            qs = qs.filter(database_schema__id=int(database_schema_id))
-        return qs
+        # the list only shows whether there is a schema version diff
+        return models.ServerData.objects.select_related(
+            'server__environment', 'database_schema').defer(
+                'schema_version_diff').extra(
+                    select={
+                        'has_schema_version_diff':
+                            "schema_version_diff <> ''"})
 
 
 class ServerData(DetailView):
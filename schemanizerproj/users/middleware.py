@@ -0,0 +1,12 @@
+from . import user_cache
+
+
+class SchemanizerUserMiddleware(object):
+    """Resolves the schemanizer user and role of the authenticated user once
+    per request, from the process-level user cache.
+
+    Must be placed after AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        user_cache.attach_schemanizer_user(request.user)
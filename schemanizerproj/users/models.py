@@ -1,7 +1,7 @@
 from django.contrib.auth.models import User as AuthUser
 from django.db import models
 from model_utils import Choices
-from utils import models as utils_models
+from utils import cache_functions, models as utils_models
 
 
 class Role(utils_models.TimeStampedModel):
@@ -34,4 +34,10 @@ class User(utils_models.TimeStampedModel):
         db_table = 'users'
 
     def __unicode__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+# changesets are listed with the names of their users
+cache_functions.register_model(User, 'changesets', 'users')
+# users are cached with their roles, see user_cache
+cache_functions.register_model(Role, 'users')
@@ -5,7 +5,18 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import base64
+import json
+import re
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from tastypie.models import ApiKey
+from schemanizer.api import authentications
+from utils import cache_functions
+from . import models, user_cache
 
 
 class SimpleTest(TestCase):
@@ -14,3 +25,122 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class ApiKeyAuthenticationTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        self.user = User.objects.get(username='admin')
+        self.api_key = ApiKey.objects.create(user=self.user)
+        self.url = reverse(
+            'api_dispatch_list',
+            kwargs={'api_name': 'v1', 'resource_name': 'role'})
+        cache.delete(authentications.get_api_key_cache_key('admin'))
+
+    def get(self, authorization):
+        return self.client.get(
+            self.url, {'format': 'json'}, HTTP_AUTHORIZATION=authorization)
+
+    def test_api_key(self):
+        authorization = 'ApiKey admin:%s' % (self.api_key.key,)
+        response = self.get(authorization)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)['objects'])
+
+        # the key and user are cached after the first request
+        with self.assertNumQueries(0):
+            authentication = authentications.CachedApiKeyAuthentication()
+            self.assertEqual(
+                authentication.get_user('admin', self.api_key.key),
+                self.user)
+
+        self.assertEqual(self.get('ApiKey admin:invalid').status_code, 401)
+
+    def test_cached_data(self):
+        self.assertEqual(
+            self.get('ApiKey admin:%s' % (self.api_key.key,)).status_code,
+            200)
+        cached = repr(cache.get(authentications.get_api_key_cache_key('admin')))
+        self.assertFalse(self.api_key.key in cached)
+        self.assertFalse(self.user.password in cached)
+
+    def test_regenerated_api_key(self):
+        old_key = self.api_key.key
+        self.assertEqual(
+            self.get('ApiKey admin:%s' % (old_key,)).status_code, 200)
+        self.api_key.key = self.api_key.generate_key()
+        self.api_key.save()
+        self.assertEqual(
+            self.get('ApiKey admin:%s' % (old_key,)).status_code, 401)
+        self.assertEqual(
+            self.get('ApiKey admin:%s' % (self.api_key.key,)).status_code,
+            200)
+
+    def test_basic_authentication(self):
+        response = self.get(
+            'Basic %s' % (base64.b64encode('admin:admin'),))
+        self.assertEqual(response.status_code, 200)
+
+
+class UserCacheTestCase(TestCase):
+
+    fixtures = ['schemanizer/test.json']
+
+    def setUp(self):
+        user_cache.clear_cache()
+        self.auth_user = User.objects.get(username='dba01')
+
+    def get_queries(self, func):
+        """Returns SQL of queries executed by func."""
+        use_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            func()
+            return [query['sql'] for query in connection.queries[start:]]
+        finally:
+            connection.use_debug_cursor = use_debug_cursor
+
+    def test_get_schemanizer_user(self):
+        user = user_cache.get_schemanizer_user(self.auth_user.pk)
+        self.assertEqual(user.auth_user_id, self.auth_user.pk)
+        with self.assertNumQueries(0):
+            user = user_cache.get_schemanizer_user(self.auth_user.pk)
+            self.assertEqual(user.role.name, models.Role.ROLE_DBA)
+
+    def test_invalidation(self):
+        user_cache.get_schemanizer_user(self.auth_user.pk)
+        user = models.User.objects.get(auth_user=self.auth_user)
+        user.role = models.Role.objects.get(name=models.Role.ROLE_ADMIN)
+        user.save()
+        self.assertEqual(
+            user_cache.get_schemanizer_user(self.auth_user.pk).role.name,
+            models.Role.ROLE_ADMIN)
+
+        role = user.role
+        role.save()
+        with self.assertNumQueries(1):
+            user_cache.get_schemanizer_user(self.auth_user.pk)
+
+    def test_invalidation_by_other_process(self):
+        user_cache.get_schemanizer_user(self.auth_user.pk)
+        # another process saves a user and replaces the shared version
+        cache_functions.new_version('users')
+        with self.assertNumQueries(1):
+            user_cache.get_schemanizer_user(self.auth_user.pk)
+
+    def test_main_pages_do_not_query_user(self):
+        self.client.login(username='dba01', password='dba')
+        # query of the schemanizer user of the logged in user
+        user_query_re = re.compile(r'WHERE .*\bauth_user_id\b')
+        for url_name in (
+                'home', 'changesets_changeset_list',
+                'schemaversions_schema_version_list', 'servers_server_list'):
+            url = reverse(url_name)
+            self.assertEqual(self.client.get(url).status_code, 200)
+            queries = self.get_queries(lambda: self.client.get(url))
+            self.assertEqual(
+                [sql for sql in queries if user_query_re.search(sql)], [],
+                url_name)
@@ -0,0 +1,61 @@
+"""Process-level cache of schemanizer users and their roles.
+
+Nearly every request dereferences request.user.schemanizer_user and its
+role. The users are cached by auth user ID for USER_CACHE_TIMEOUT seconds,
+so that a request normally does not query the users and roles tables.
+Cached users are kept with the shared version of users (see
+utils.cache_functions), which is replaced whenever a user or role is saved
+or deleted in any process, so that changes take effect in all processes.
+"""
+
+import copy
+import time
+from django.conf import settings
+from utils import cache_functions
+from . import models
+
+# maximum number of cached users, the cache is cleared when it is full
+MAX_CACHED_USERS = 1000
+
+# auth user ID -> (expiry time, version of users, schemanizer user with its
+# role)
+_users = {}
+
+
+def get_schemanizer_user(auth_user_id):
+    """Returns schemanizer user, with its role, of an auth user.
+
+    Returns None if the auth user has no schemanizer user. The returned
+    user is a copy that can be changed by the caller.
+    """
+
+    now = time.time()
+    version = cache_functions.get_version('users')
+    entry = _users.get(auth_user_id)
+    if entry is None or entry[0] <= now or entry[1] != version:
+        try:
+            user = models.User.objects.select_related('role').get(
+                auth_user_id=auth_user_id)
+        except models.User.DoesNotExist:
+            return None
+        if len(_users) >= MAX_CACHED_USERS:
+            _users.clear()
+        entry = (now + settings.USER_CACHE_TIMEOUT, version, user)
+        _users[auth_user_id] = entry
+    return copy.deepcopy(entry[2])
+
+
+def attach_schemanizer_user(auth_user):
+    """Caches schemanizer user of auth_user on it, so that
+    auth_user.schemanizer_user and its role do not query the database."""
+
+    if not auth_user.is_authenticated():
+        return
+    user = get_schemanizer_user(auth_user.pk)
+    if user is not None:
+        # setting the one-to-one field also caches the reverse relation
+        user.auth_user = auth_user
+
+
+def clear_cache():
+    _users.clear()
@@ -0,0 +1,76 @@
+"""Versions of cached data.
+
+Cached data derived from a set of models, for example rendered listing
+fragments, includes the versions of these models in its cache key. The
+version of a name is replaced by a new random token whenever an instance of
+a model registered with register_model() is saved or deleted, so that stale
+cache entries are not read anymore and expire on their own.
+
+Versions are kept in the default cache, which must be shared by the web
+and worker processes for changes made by workers to be seen. A change only
+sets a version that was never used before, it does not read the old one, so
+that no change is lost when processes change a version concurrently, even
+with cache backends without atomic increments such as the file based cache.
+"""
+
+import uuid
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+# number of seconds versions are kept
+VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def get_version_cache_key(name):
+    return 'version:%s' % (name,)
+
+
+def _generate_version():
+    return uuid.uuid4().hex
+
+
+def get_version(name):
+    """Returns version of name."""
+
+    cache_key = get_version_cache_key(name)
+    version = cache.get(cache_key)
+    if version is None:
+        version = _generate_version()
+        # add() does not overwrite a version set by another process
+        cache.add(cache_key, version, VERSION_TIMEOUT)
+        version = cache.get(cache_key, version)
+    return version
+
+
+def get_versions(*names):
+    """Returns a string of versions of names, for cache keys."""
+
+    return u'.'.join(u'%s' % (get_version(name),) for name in names)
+
+
+def new_version(name):
+    """Replaces version of name with a new one."""
+
+    cache.set(get_version_cache_key(name), _generate_version(), VERSION_TIMEOUT)
+
+
+class CacheVersions(object):
+    """Lazy mapping of names to versions, for templates.
+
+    For example: {% cache 300 changeset_list cache_versions.changesets %}
+    """
+
+    def __getitem__(self, name):
+        return get_version(name)
+
+
+def register_model(model, *names):
+    """Replaces versions of names whenever an instance of model is saved or
+    deleted."""
+
+    def invalidate(sender, **kwargs):
+        for name in names:
+            new_version(name)
+
+    post_save.connect(invalidate, sender=model, weak=False)
+    post_delete.connect(invalidate, sender=model, weak=False)
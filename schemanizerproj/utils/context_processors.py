@@ -0,0 +1,11 @@
+from django.conf import settings
+from . import cache_functions
+
+
+def cache(request):
+    """Adds versions and the timeout of cached template fragments."""
+
+    return {
+        'cache_versions': cache_functions.CacheVersions(),
+        'fragment_cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
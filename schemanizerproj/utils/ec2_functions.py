@@ -15,8 +15,13 @@ class EC2InstanceStarter(object):
             ami_id, key_name, instance_type, security_groups,
             running_state_check_pre_delay=None,
             running_state_check_timeout=None,
-            message_callback=None):
-        """Initializes instance."""
+            message_callback=None, instances_callback=None, checkpoint=None):
+        """Initializes instance.
+
+        instances_callback is called with the list of instances as soon as
+        they are requested. checkpoint is called while waiting for the
+        instance to run, it may raise an exception to stop waiting.
+        """
 
         super(EC2InstanceStarter, self).__init__()
 
@@ -30,6 +35,8 @@ class EC2InstanceStarter(object):
         self._running_state_check_pre_delay = running_state_check_pre_delay
         self._running_state_check_timeout = running_state_check_timeout
         self._message_callback = message_callback
+        self._instances_callback = instances_callback
+        self._checkpoint = checkpoint
 
     def _init_run_vars(self):
         """Initializes variables used for running logic."""
@@ -82,6 +89,8 @@ class EC2InstanceStarter(object):
         tries = 0
         start_time = time.time()
         while True:
+            if self._checkpoint:
+                self._checkpoint()
             try:
                 tries += 1
                 msg = 'Waiting for instance to run, tries=%s.' % (tries,)
@@ -122,6 +131,8 @@ class EC2InstanceStarter(object):
         log.debug('reservation: %s' % (self._reservation,))
 
         if self._reservation and self._reservation.instances:
+            if self._instances_callback:
+                self._instances_callback(self._reservation.instances)
             self._instance = self._reservation.instances[0]
 
             self._delay_running_state_check()
@@ -136,3 +147,16 @@ class EC2InstanceStarter(object):
                 msg = 'EC2 instance terminated.'
                 log.info(msg)
                 self._store_message(msg)
+
+
+def terminate_instances(
+        region, aws_access_key_id, aws_secret_access_key, instance_ids):
+    """Terminates EC2 instances by ID, returns list of terminated instances."""
+
+    conn = boto.ec2.connect_to_region(
+        region,
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key)
+    instances = conn.terminate_instances(instance_ids=instance_ids)
+    log.info('EC2 instances terminated: %s' % (instance_ids,))
+    return instances
@@ -18,4 +18,16 @@ class SchemaDoesNotMatchError(Error):
         self.message = message
         self.expected = expected
         self.actual = actual
-        self.delta = delta
\ No newline at end of file
+        self.delta = delta
+
+
+class ChangesetImportError(Error):
+
+    def __init__(self, message, errors):
+        super(ChangesetImportError, self).__init__(message, errors)
+        self.message = message
+        self.errors = errors
+
+
+class JobCancelledError(Error):
+    pass
@@ -1,3 +1,4 @@
+import hashlib
 import mmh3
 
 
@@ -7,3 +8,23 @@ def generate_hash(s):
     k1, k2 = mmh3.hash64(s)
     anded = 0xFFFFFFFFFFFFFFFF
     return '%016x%016x' % (k1 & anded, k2 & anded)
+
+
+class HashGenerator(object):
+    """Generates the MD5 hash of a string that is given in parts.
+
+    Unlike generate_hash(), the hash is computed incrementally, so the parts
+    are not kept in memory; mmh3 for Python 2 can only hash whole strings.
+    """
+
+    def __init__(self):
+        super(HashGenerator, self).__init__()
+        self._hasher = hashlib.md5()
+
+    def update(self, s):
+        if isinstance(s, unicode):
+            s = s.encode('utf-8')
+        self._hasher.update(s)
+
+    def hexdigest(self):
+        return self._hasher.hexdigest()
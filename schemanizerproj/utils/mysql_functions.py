@@ -6,13 +6,43 @@ import subprocess
 import time
 import MySQLdb
 import paramiko
-import sqlparse
-from . import hash_functions, exceptions
+from . import hash_functions, exceptions, sql_functions
 
 log = logging.getLogger(__name__)
 
 
-def dump_schema(db, host=None, port=None, user=None, passwd=None):
+AUTO_INCREMENT_REGEX = re.compile(r'AUTO_INCREMENT=\d+\s*', re.IGNORECASE)
+
+
+def _strip_auto_increment(lines):
+    """Removes AUTO_INCREMENT table options from lines of schema dump.
+
+    Gives the same text as removing them from the whole dump at once.
+    """
+
+    strip_whitespace = False
+    for line in lines:
+        if strip_whitespace:
+            # whitespace after the last option of the previous line
+            line = line.lstrip()
+            if not line:
+                continue
+        last_match = None
+        for last_match in AUTO_INCREMENT_REGEX.finditer(line):
+            pass
+        strip_whitespace = (
+            last_match is not None and last_match.end() == len(line))
+        if last_match is not None:
+            line = AUTO_INCREMENT_REGEX.sub('', line)
+        yield line
+
+
+def iter_schema_dump(db, host=None, port=None, user=None, passwd=None):
+    """Yields schema dump line by line, as mysqldump writes it.
+
+    AUTO_INCREMENT table options are removed.
+    """
+
     cmd_parts = ['mysqldump']
     if host:
         cmd_parts.append(' -h %s' % host)
@@ -26,41 +56,82 @@ def dump_schema(db, host=None, port=None, user=None, passwd=None):
     cmd = ''.join(cmd_parts)
     args = shlex.split(str(cmd))
 
-    ret = ''
     p = subprocess.Popen(args, stdout=subprocess.PIPE)
     try:
-        while True:
-            ln = p.stdout.readline()
-            ret += ln
-            if ln == '' and p.poll() is not None:
-                break
+        for line in _strip_auto_increment(iter(p.stdout.readline, '')):
+            yield line
     finally:
+        # mysqldump may still be writing when the caller stops early
+        p.stdout.close()
         p.wait()
 
-    pattern = r'AUTO_INCREMENT=\d+\s*'
-    prog = re.compile(pattern, re.IGNORECASE)
-    ret = prog.sub('', ret)
-    return ret
 
+def dump_schema(db, host=None, port=None, user=None, passwd=None):
+    return ''.join(iter_schema_dump(
+        db, host=host, port=port, user=user, passwd=passwd))
 
-def normalize_schema_dump(dump):
-    """Normalizes schema dump."""
 
-    statement_list = sqlparse.split(dump)
-    new_statement_list = []
-    for statement in statement_list:
-        stripped_chars = unicode(string.whitespace + ';')
+def _normalized_statements(statements):
+    """Yields statements of schema dump that are part of the normalized
+    dump."""
+
+    stripped_chars = unicode(string.whitespace + ';')
+    for statement in statements:
         statement = statement.strip(stripped_chars)
         if statement:
             if not statement.startswith(u'/*!'):
                 # skip processing conditional comments
-                new_statement_list.append(statement)
-    return u';\n'.join(new_statement_list)
+                yield statement
+
+
+def _generate_statements_hash(statements):
+    """Returns the hash of normalized statements, without joining them."""
+
+    hash_generator = hash_functions.HashGenerator()
+    separator = u''
+    for statement in _normalized_statements(statements):
+        hash_generator.update(separator)
+        hash_generator.update(statement)
+        separator = u';\n'
+    return hash_generator.hexdigest()
+
+
+def normalize_schema_dump(dump):
+    """Normalizes schema dump."""
+
+    return u';\n'.join(
+        _normalized_statements(sql_functions.split_schema_dump(dump)))
 
 
 def generate_schema_hash(dump):
     """Returns the hash string of a normalized dump."""
-    return hash_functions.generate_hash(normalize_schema_dump(dump))
+    return _generate_statements_hash(sql_functions.split_schema_dump(dump))
+
+
+def _generate_schema_hash_from_lines(lines):
+    """Returns the hash string of a normalized dump given line by line.
+
+    Only the statement being split is kept in memory.
+    """
+
+    splitter = sql_functions.SchemaDumpSplitter()
+
+    def iter_statements():
+        for line in lines:
+            for statement in splitter.feed(line):
+                yield statement
+        for statement in splitter.close():
+            yield statement
+
+    return _generate_statements_hash(iter_statements())
+
+
+def dump_schema_hash(db, host=None, port=None, user=None, passwd=None):
+    """Returns the same hash string as generate_schema_hash() for the dump
+    returned by dump_schema(), without keeping the dump in memory."""
+
+    return _generate_schema_hash_from_lines(iter_schema_dump(
+        db, host=host, port=port, user=user, passwd=passwd))
 
 
 def execute_count_statements(cursor, statements):
@@ -73,7 +144,7 @@ def execute_count_statements(cursor, statements):
     statements = statements.strip(u'%s%s' % (string.whitespace, ';'))
     statement_list = None
     if statements:
-        statement_list = sqlparse.split(statements)
+        statement_list = sql_functions.split(statements)
 
     if not statements:
         return counts
@@ -127,7 +198,7 @@ def execute_statements(cursor, statements):
     statements = statements.strip(u'%s%s' % (string.whitespace, ';'))
     statement_list = None
     if statements:
-        statement_list = sqlparse.split(statements)
+        statement_list = sql_functions.split(statements)
 
     if not statements:
         return
@@ -0,0 +1,122 @@
+"""Keyset (cursor) pagination.
+
+Pages are selected with a filter on the ordering fields of the last row of
+the previous page instead of an offset, so that fetching a page costs the
+same for the first and the last page when the ordering fields are indexed.
+"""
+
+import base64
+import json
+from django.db.models import Q
+from utils import exceptions
+
+
+class InvalidCursorError(exceptions.Error):
+    pass
+
+
+def _get_field_name(ordering_field):
+    return ordering_field.lstrip('-')
+
+
+def encode_cursor(obj, ordering):
+    """Returns cursor of the page that follows obj."""
+
+    values = []
+    for ordering_field in ordering:
+        value = getattr(obj, _get_field_name(ordering_field))
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        values.append(value)
+    return base64.urlsafe_b64encode(json.dumps(values))
+
+
+def decode_cursor(cursor, model, ordering):
+    """Returns values of ordering fields from cursor."""
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError('Unexpected number of values.')
+        return [
+            model._meta.get_field(_get_field_name(ordering_field)).to_python(
+                value)
+            for ordering_field, value in zip(ordering, values)]
+    except Exception, e:
+        raise InvalidCursorError(u'Invalid cursor: %s' % (e,))
+
+
+def filter_after(queryset, ordering, values):
+    """Returns queryset filtered to rows that come after values in
+    ordering."""
+
+    q = None
+    for i, ordering_field in enumerate(ordering):
+        field_name = _get_field_name(ordering_field)
+        if ordering_field.startswith('-'):
+            lookup = '%s__lt' % (field_name,)
+        else:
+            lookup = '%s__gt' % (field_name,)
+        condition = Q(**{lookup: values[i]})
+        for previous_field, previous_value in zip(ordering[:i], values[:i]):
+            condition &= Q(**{_get_field_name(previous_field): previous_value})
+        q = condition if q is None else q | condition
+    return queryset.filter(q)
+
+
+def get_page(queryset, ordering, limit, cursor=None):
+    """Returns (objects, next_cursor) of a page of queryset.
+
+    ordering must end with a unique field, for example ('-datetime', '-id').
+    next_cursor is None for the last page.
+    """
+
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = filter_after(
+            queryset, ordering,
+            decode_cursor(cursor, queryset.model, ordering))
+    objects = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(objects) > limit:
+        objects = objects[:limit]
+        next_cursor = encode_cursor(objects[-1], ordering)
+    return objects, next_cursor
+
+
+class Page(object):
+    """Page of queryset that is fetched when it is first used.
+
+    Can be used as the object list of a template, rendering a cached
+    template fragment that includes the page does not query the database.
+    """
+
+    def __init__(self, queryset, ordering, limit, cursor=None):
+        self.model = queryset.model
+        self.queryset = queryset
+        self.ordering = ordering
+        self.limit = limit
+        self.cursor = cursor
+        self._objects = None
+        self._next_cursor = None
+
+    def _fetch(self):
+        if self._objects is None:
+            self._objects, self._next_cursor = get_page(
+                self.queryset, self.ordering, self.limit, cursor=self.cursor)
+
+    @property
+    def objects(self):
+        self._fetch()
+        return self._objects
+
+    @property
+    def next_cursor(self):
+        self._fetch()
+        return self._next_cursor
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
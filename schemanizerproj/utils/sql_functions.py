@@ -0,0 +1,321 @@
+"""Memoized SQL splitting and parsing.
+
+sqlparse is slow on large inputs and the same SQL text is split several times
+during review, test and apply. Results are kept in an LRU cache keyed by the
+hash of the SQL text, bounded by the total length of the cached SQL texts
+(settings.SQL_CACHE_MAX_SIZE). Parse results take much more memory than the
+text, their length is counted PARSE_WEIGHT times.
+
+Cached values are shared, callers must not modify returned statements.
+
+Schema dumps are split with SchemaDumpSplitter, which is much faster than
+sqlparse and splits statements the way the mysql client does.
+"""
+
+import codecs
+import re
+import threading
+from django.conf import settings
+import sqlparse
+from . import hash_functions
+
+
+class LRUCache(object):
+    """Thread-safe least recently used cache.
+
+    The cache is bounded by the total weight of the cached values, the
+    weight of each value is given when it is added.
+    """
+
+    # positions in a link
+    PREV, NEXT, KEY, VALUE, WEIGHT = range(5)
+
+    def __init__(self, max_weight):
+        super(LRUCache, self).__init__()
+        self.max_weight = max_weight
+        self.weight = 0
+        self._links = {}
+        # circular doubly linked list, root.NEXT is the least recently used
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None, 0]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._links)
+
+    def __contains__(self, key):
+        return key in self._links
+
+    def get(self, key, default=None):
+        with self._lock:
+            link = self._links.get(key)
+            if link is None:
+                return default
+            self._unlink(link)
+            self._append(link)
+            return link[self.VALUE]
+
+    def set(self, key, value, weight=1):
+        with self._lock:
+            link = self._links.pop(key, None)
+            if link is not None:
+                self._unlink(link)
+                self.weight -= link[self.WEIGHT]
+            if weight > self.max_weight:
+                return
+            link = [None, None, key, value, weight]
+            self._append(link)
+            self._links[key] = link
+            self.weight += weight
+            while self.weight > self.max_weight:
+                oldest = self._root[self.NEXT]
+                self._unlink(oldest)
+                del self._links[oldest[self.KEY]]
+                self.weight -= oldest[self.WEIGHT]
+
+    def clear(self):
+        with self._lock:
+            self._links.clear()
+            self._root[:] = [self._root, self._root, None, None, 0]
+            self.weight = 0
+
+    def _unlink(self, link):
+        link[self.PREV][self.NEXT] = link[self.NEXT]
+        link[self.NEXT][self.PREV] = link[self.PREV]
+
+    def _append(self, link):
+        last = self._root[self.PREV]
+        link[self.PREV] = last
+        link[self.NEXT] = self._root
+        last[self.NEXT] = link
+        self._root[self.PREV] = link
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the shared cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LRUCache(settings.SQL_CACHE_MAX_SIZE)
+    return _cache
+
+
+def sql_hash(sql):
+    """Returns the hash of SQL text."""
+    if isinstance(sql, unicode):
+        sql = sql.encode('utf-8')
+    return hash_functions.generate_hash(sql)
+
+
+# Weight of parse results per character of SQL text. Parsed statements take
+# about 20 times the memory of split statements with sqlparse 0.1.8.
+PARSE_WEIGHT = 20
+
+
+def _memoize(kind, sql, func, weight=1):
+    cache = get_cache()
+    key = (kind, sql_hash(sql))
+    value = cache.get(key)
+    if value is None:
+        value = func(sql)
+        cache.set(key, value, len(sql) * weight)
+    return value
+
+
+def split(sql):
+    """Returns a tuple of statements in SQL text, same as sqlparse.split()."""
+    if not sql:
+        return ()
+    return _memoize('split', sql, lambda sql: tuple(sqlparse.split(sql)))
+
+
+def parse(sql):
+    """Returns a tuple of parsed statements, same as sqlparse.parse()."""
+    if not sql:
+        return ()
+    return _memoize(
+        'parse', sql, lambda sql: tuple(sqlparse.parse(sql)),
+        weight=PARSE_WEIGHT)
+
+
+# Quoted strings with backslash escapes, up to and including the closing
+# quote (_STRING_END_RE), or up to the end of the text read so far when the
+# string is not closed yet (_STRING_BODY_RE).
+_STRING_END_RE = dict(
+    (quote, re.compile(r'[^%s\\]*(?:\\[\s\S][^%s\\]*)*%s' % (
+        quote, quote, quote)))
+    for quote in u'\'"')
+_STRING_BODY_RE = dict(
+    (quote, re.compile(r'[^%s\\]*(?:\\[\s\S][^%s\\]*)*' % (quote, quote)))
+    for quote in u'\'"')
+
+# Two dashes start a comment when they are followed by whitespace or a
+# control character.
+_DASH_COMMENT_RE = re.compile(r'--(?:[\x00-\x20]|\Z)')
+
+_DELIMITER_COMMAND = u'DELIMITER'
+
+_DELIMITER_COMMAND_RE = re.compile(
+    r'DELIMITER[ \t]+(\S+)[^\n]*(?:\n|\Z)', re.IGNORECASE)
+
+_WHITESPACE_RE = re.compile(r'\s*')
+
+
+class SchemaDumpSplitter(object):
+    """Streaming statement splitter for mysqldump output.
+
+    Statements are split the way the mysql client splits them: they end at
+    the delimiter, except in quoted strings and identifiers, /* */ comments
+    and single line comments (# and -- ), and DELIMITER commands at the
+    start of a statement change the delimiter. Statements are returned with
+    their delimiter, DELIMITER commands are not returned.
+
+    Text is fed in chunks, complete statements are returned as soon as their
+    delimiter is seen. Only the text of the statement being split is kept.
+    """
+
+    def __init__(self):
+        super(SchemaDumpSplitter, self).__init__()
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._set_delimiter(u';')
+        # text of the statement being split and the position up to which it
+        # was read
+        self._pending = u''
+        self._pos = 0
+        # text that ends the quote or comment the position is in, None if
+        # it is not in a quote or comment
+        self._closing = None
+
+    def _set_delimiter(self, delimiter):
+        self._delimiter = delimiter
+        self._token_re = re.compile(
+            u'[\'"`#]|/\\*|--|%s' % (re.escape(delimiter),))
+
+    def feed(self, text):
+        """Adds text, returns list of statements completed by it."""
+
+        if isinstance(text, str):
+            text = self._decoder.decode(text)
+        return self._split(text, final=False)
+
+    def close(self):
+        """Returns remaining statements at the end of input."""
+        return self._split(self._decoder.decode('', final=True), final=True)
+
+    def _read_delimiter_command(self, buf, pos, final):
+        """Returns end of the DELIMITER command at pos, pos if there is no
+        command there, None if more text is needed."""
+
+        prefix = buf[pos:pos + len(_DELIMITER_COMMAND)].upper()
+        if prefix != _DELIMITER_COMMAND:
+            if not final and len(prefix) < len(_DELIMITER_COMMAND) and (
+                    _DELIMITER_COMMAND.startswith(prefix)):
+                return None
+            return pos
+        match = _DELIMITER_COMMAND_RE.match(buf, pos)
+        if match is None or not (final or match.group().endswith(u'\n')):
+            if not final and buf.find(u'\n', pos) == -1:
+                return None
+            return pos
+        self._set_delimiter(match.group(1))
+        return match.end()
+
+    def _split(self, text, final):
+        buf = self._pending + text
+        length = len(buf)
+        statements = []
+        start = 0
+        pos = self._pos
+        closing = self._closing
+        while True:
+            if closing is not None:
+                if closing in u'\'"':
+                    match = _STRING_END_RE[closing].match(buf, pos)
+                    if match is None:
+                        # a backslash at the end escapes the next character
+                        pos = _STRING_BODY_RE[closing].match(buf, pos).end()
+                        break
+                    pos = match.end()
+                else:
+                    end = buf.find(closing, pos)
+                    if end == -1:
+                        # the closing text may be split between chunks
+                        pos = max(pos, length - len(closing) + 1)
+                        break
+                    pos = end + len(closing)
+                closing = None
+                continue
+
+            if pos == start:
+                # only whitespace was read, the statement may be a
+                # DELIMITER command
+                pos = _WHITESPACE_RE.match(buf, pos).end()
+                end = self._read_delimiter_command(buf, pos, final)
+                if end is None:
+                    pos = start
+                    break
+                if end != pos:
+                    start = pos = end
+                    continue
+                if pos == length:
+                    pos = start
+                    break
+
+            match = self._token_re.search(buf, pos)
+            if match is None:
+                # the delimiter or a comment start may be split between
+                # chunks
+                pos = max(pos, length - max(len(self._delimiter), 2) + 1)
+                break
+            token = match.group()
+            pos = match.end()
+            if token == self._delimiter:
+                statement = buf[start:pos].strip()
+                if statement != self._delimiter:
+                    statements.append(statement)
+                start = pos
+            elif token in (u'\'', u'"', u'`'):
+                closing = token
+            elif token == u'/*':
+                closing = u'*/'
+            elif token == u'#':
+                closing = u'\n'
+            elif token == u'--':
+                dash_match = _DASH_COMMENT_RE.match(buf, match.start())
+                if dash_match is None:
+                    # not a comment, the second dash may start one
+                    pos = match.start() + 1
+                elif dash_match.end() == length and not final:
+                    # wait for the character after the dashes
+                    pos = match.start()
+                    break
+                else:
+                    closing = u'\n'
+
+        if final:
+            statement = buf[start:].strip()
+            if statement:
+                statements.append(statement)
+            self._pending = u''
+            self._pos = 0
+            self._closing = None
+        else:
+            self._pending = buf[start:]
+            self._pos = pos - start
+            self._closing = closing
+        return statements
+
+
+def split_schema_dump(dump):
+    """Returns list of statements in a schema dump, split by
+    SchemaDumpSplitter."""
+
+    splitter = SchemaDumpSplitter()
+    statements = splitter.feed(dump)
+    statements.extend(splitter.close())
+    return statements
@@ -0,0 +1,59 @@
+"""Functions for generating the content of streaming responses.
+
+Chunks are generated one at a time, so that the whole content is never kept
+in memory.
+"""
+
+import tarfile
+import zlib
+from StringIO import StringIO
+
+
+def gzip_chunks(chunks, compresslevel=6):
+    """Yields chunks compressed in gzip format."""
+
+    # wbits of 16 + MAX_WBITS adds the gzip header and trailer
+    compressor = zlib.compressobj(
+        compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkWriter(object):
+    """File-like object that keeps written data until it is popped."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def pop(self):
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def tar_chunks(members):
+    """Yields chunks of an uncompressed tar archive.
+
+    members is an iterable of (name, data, mtime) tuples, where name and data
+    are byte strings and mtime is a UNIX timestamp. Only the member being
+    added is kept in memory.
+    """
+
+    writer = _ChunkWriter()
+    tar = tarfile.open(mode='w|', fileobj=writer)
+    for name, data, mtime in members:
+        tarinfo = tarfile.TarInfo(name)
+        tarinfo.size = len(data)
+        tarinfo.mtime = mtime
+        tar.addfile(tarinfo, StringIO(data))
+        chunk = writer.pop()
+        if chunk:
+            yield chunk
+    tar.close()
+    yield writer.pop()
@@ -1,16 +1,350 @@
-"""
-This file demonstrates writing tests using the unittest module. These will pass
-when you run "manage.py test".
-
-Replace this with more appropriate tests for your application.
-"""
+import gzip
+import hashlib
+import random
+import string
+import tarfile
+from StringIO import StringIO
 
 from django.test import TestCase
 
+import sqlparse
+
+from . import (
+    cache_functions, hash_functions, mysql_functions, sql_functions,
+    stream_functions)
+
+
+class LRUCacheTestCase(TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = sql_functions.LRUCache(3)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('d', 4)
+        self.assertFalse('b' in cache)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.get('d'), 4)
+        self.assertEqual(len(cache), 3)
+
+    def test_weight(self):
+        cache = sql_functions.LRUCache(10)
+        cache.set('a', 1, 4)
+        cache.set('b', 2, 4)
+        cache.set('c', 3, 4)
+        self.assertFalse('a' in cache)
+        self.assertEqual(cache.weight, 8)
+        cache.set('d', 4, 11)
+        self.assertFalse('d' in cache)
+        cache.set('b', 5, 1)
+        self.assertEqual(cache.get('b'), 5)
+        self.assertEqual(cache.weight, 5)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.weight, 0)
+
+
+class SqlFunctionsTestCase(TestCase):
+
+    def test_split(self):
+        sql = u'create table t01 (id int); insert into t01 values (";")'
+        statements = sql_functions.split(sql)
+        self.assertEqual(list(statements), sqlparse.split(sql))
+        self.assertTrue(sql_functions.split(sql) is statements)
+        self.assertEqual(sql_functions.split(u''), ())
+
+    def test_parse(self):
+        sql = u'update t01 set id = 1 where id = 2'
+        statements = sql_functions.parse(sql)
+        self.assertEqual(
+            [unicode(statement) for statement in statements],
+            [unicode(statement) for statement in sqlparse.parse(sql)])
+        self.assertTrue(sql_functions.parse(sql) is statements)
+
+    def test_parse_weight(self):
+        sql = u'update t01 set id = 1 where id = 3'
+        cache = sql_functions.get_cache()
+        cache.clear()
+        sql_functions.split(sql)
+        self.assertEqual(cache.weight, len(sql))
+        sql_functions.parse(sql)
+        self.assertEqual(
+            cache.weight, len(sql) * (1 + sql_functions.PARSE_WEIGHT))
+
+
+def normalize_statements(statements):
+    """Normalizes statements the way mysql_functions.normalize_schema_dump
+    does."""
+
+    stripped_chars = unicode(string.whitespace + ';')
+    statements = [statement.strip(stripped_chars) for statement in statements]
+    return [
+        statement for statement in statements
+        if statement and not statement.startswith(u'/*!')]
+
+
+class SchemaDumpSplitterTestCase(TestCase):
+
+    def random_identifier(self, rand):
+        chars = string.ascii_letters + u'_; ()\'"-#/*`\\\u00e9'
+        name = u''.join(
+            rand.choice(chars) for _ in range(rand.randint(1, 8)))
+        return u'`%s`' % (name.replace(u'`', u'``'),)
+
+    def random_string(self, rand):
+        quote = rand.choice(u'\'"')
+        parts = [
+            rand.choice([
+                u'\\' + quote, quote + quote, u'\\\\', u';', u'\n', u'/*',
+                u'abc', u' ', u'#', u'-- ', u'x(', u'`', u'\u00e9'])
+            for _ in range(rand.randint(0, 6))]
+        return quote + u''.join(parts) + quote
+
+    def random_statement(self, rand):
+        """Returns text of a random statement and the statement that is
+        split from it."""
+
+        if rand.random() < 0.2:
+            statement = u'/*!40101 SET character_set_client = utf8 */;'
+            return statement, statement
+        if rand.random() < 0.1:
+            statement = (
+                u'CREATE TRIGGER %s BEFORE INSERT ON %s FOR EACH ROW BEGIN '
+                u'SET NEW.a = %s; END ;;' % (
+                    self.random_identifier(rand),
+                    self.random_identifier(rand), self.random_string(rand)))
+            return (
+                u'DELIMITER ;;\n%s\nDELIMITER ;' % (statement,), statement)
+        columns = []
+        for _ in range(rand.randint(1, 6)):
+            column = u'  %s %s' % (
+                self.random_identifier(rand),
+                rand.choice([u'int(11)', u'varchar(255)', u'decimal(10,2)']))
+            if rand.random() < 0.5:
+                column += u' DEFAULT ' + self.random_string(rand)
+            if rand.random() < 0.3:
+                column += u' COMMENT ' + self.random_string(rand)
+            if rand.random() < 0.1:
+                column += u' /* c;o\nm */'
+            if rand.random() < 0.1:
+                column = rand.choice([u'  -- c;o\n', u'  # c;o\n']) + column
+            columns.append(column)
+        statement = u'CREATE TABLE %s (\n%s\n) ENGINE=InnoDB' % (
+            self.random_identifier(rand), u',\n'.join(columns))
+        statement += rand.choice([u';', u' ;', u';\n', u';;'])
+        return statement, statement
+
+    def random_dump(self, rand, statement_count):
+        """Returns a random dump and its statements."""
+
+        texts = []
+        statements = []
+        for _ in range(statement_count):
+            text, statement = self.random_statement(rand)
+            texts.append(text + u'\n')
+            statements.append(statement)
+        return u''.join(texts), statements
+
+    def split_in_chunks(self, rand, dump):
+        splitter = sql_functions.SchemaDumpSplitter()
+        statements = []
+        pos = 0
+        while pos < len(dump):
+            chunk_size = rand.choice([1, 7, 64, 1000])
+            statements.extend(splitter.feed(dump[pos:pos + chunk_size]))
+            pos += chunk_size
+        statements.extend(splitter.close())
+        return statements
+
+    def test_random_dumps(self):
+        rand = random.Random(1)
+        for _ in range(200):
+            dump, statements = self.random_dump(rand, rand.randint(0, 5))
+            self.assertEqual(
+                normalize_statements(self.split_in_chunks(rand, dump)),
+                normalize_statements(statements))
+            self.assertEqual(
+                normalize_statements(sql_functions.split_schema_dump(dump)),
+                normalize_statements(statements))
+
+    def test_encoded_dump(self):
+        rand = random.Random(2)
+        dump, statements = self.random_dump(rand, 100)
+        self.assertIn(u'\u00e9', dump)
+        self.assertEqual(
+            normalize_statements(
+                self.split_in_chunks(rand, dump.encode('utf-8'))),
+            normalize_statements(statements))
+
+    def test_quotes_and_comments(self):
+        dump = (
+            u'/*!40101 SET NAMES utf8 */;\n'
+            u'CREATE TABLE `t;01` (\n'
+            u'  `id` int(11) DEFAULT \'a;b\' COMMENT "c;d",\n'
+            u'  /* e;f */ PRIMARY KEY (`id`)\n'
+            u') ENGINE=InnoDB;\n'
+            u'CREATE TABLE `t02` (`id` int(11));\n')
+        self.assertEqual(sql_functions.split_schema_dump(dump), [
+            u'/*!40101 SET NAMES utf8 */;',
+            u'CREATE TABLE `t;01` (\n'
+            u'  `id` int(11) DEFAULT \'a;b\' COMMENT "c;d",\n'
+            u'  /* e;f */ PRIMARY KEY (`id`)\n'
+            u') ENGINE=InnoDB;',
+            u'CREATE TABLE `t02` (`id` int(11));'])
+
+    def test_statements_returned_when_complete(self):
+        splitter = sql_functions.SchemaDumpSplitter()
+        self.assertEqual(splitter.feed(u'CREATE TABLE `t;01` (\n'), [])
+        self.assertEqual(
+            splitter.feed(u'  `id` int(11) DEFAULT \';\'\n);\n'),
+            [u'CREATE TABLE `t;01` (\n  `id` int(11) DEFAULT \';\'\n);'])
+        self.assertEqual(splitter.feed(u'CREATE TABLE `t02` '), [])
+        self.assertEqual(
+            splitter.feed(u'(`id` int(11));\n'),
+            [u'CREATE TABLE `t02` (`id` int(11));'])
+        self.assertEqual(splitter.close(), [])
+
+    def test_delimiter(self):
+        dump = (
+            u'DELIMITER ;;\n'
+            u'CREATE PROCEDURE p() BEGIN SELECT 1; END ;;\n'
+            u'delimiter $$\n'
+            u'CREATE FUNCTION f() RETURNS int RETURN 1$$\n'
+            u'DELIMITER ;\n'
+            u'CREATE TABLE t01 (id int);\n')
+        self.assertEqual(sql_functions.split_schema_dump(dump), [
+            u'CREATE PROCEDURE p() BEGIN SELECT 1; END ;;',
+            u'CREATE FUNCTION f() RETURNS int RETURN 1$$',
+            u'CREATE TABLE t01 (id int);'])
+
+    def test_single_line_comments(self):
+        dump = (
+            u'CREATE TABLE t01 (id int); -- comment;\n'
+            u'# comment;\n'
+            u'SELECT 1--1;\n'
+            u'SELECT 1 /* ; */;\n')
+        self.assertEqual(sql_functions.split_schema_dump(dump), [
+            u'CREATE TABLE t01 (id int);',
+            u'-- comment;\n# comment;\nSELECT 1--1;',
+            u'SELECT 1 /* ; */;'])
+
+
+class HashGeneratorTestCase(TestCase):
+
+    def test_same_as_whole_string_hash(self):
+        s = u'create table t01 (id int);\n' * 100
+        hash_generator = hash_functions.HashGenerator()
+        for i in range(0, len(s), 7):
+            hash_generator.update(s[i:i + 7])
+        self.assertEqual(
+            hash_generator.hexdigest(),
+            hashlib.md5(s.encode('utf-8')).hexdigest())
+        self.assertEqual(
+            hash_functions.HashGenerator().hexdigest(),
+            hashlib.md5('').hexdigest())
+
+
+class SchemaDumpHashTestCase(TestCase):
+
+    dump = (
+        '/*!40101 SET @saved_cs_client     = @@character_set_client */;\n'
+        '/*!40101 SET character_set_client = utf8 */;\n'
+        'CREATE TABLE `t01` (\n'
+        '  `id` int(11) NOT NULL AUTO_INCREMENT,\n'
+        '  `name` varchar(255) DEFAULT \'a;b\',\n'
+        '  PRIMARY KEY (`id`)\n'
+        ') ENGINE=InnoDB AUTO_INCREMENT=10 DEFAULT CHARSET=utf8;\n'
+        'CREATE TABLE `t02` (`id` int(11)) AUTO_INCREMENT=3\n'
+        '\n'
+        '   AUTO_INCREMENT=4 ENGINE=InnoDB;\n'
+        '/*!40101 SET character_set_client = @saved_cs_client */;\n')
+
+    def test_strip_auto_increment(self):
+        self.assertEqual(
+            ''.join(mysql_functions._strip_auto_increment(
+                self.dump.splitlines(True))),
+            mysql_functions.AUTO_INCREMENT_REGEX.sub('', self.dump))
+
+    def test_hash_from_lines(self):
+        dump = ''.join(mysql_functions._strip_auto_increment(
+            self.dump.splitlines(True)))
+        schema_hash = mysql_functions.generate_schema_hash(dump)
+        self.assertEqual(
+            schema_hash,
+            hashlib.md5(mysql_functions.normalize_schema_dump(
+                dump).encode('utf-8')).hexdigest())
+        self.assertEqual(
+            mysql_functions._generate_schema_hash_from_lines(
+                dump.splitlines(True)),
+            schema_hash)
+
+    def test_hash_from_lines_with_delimiter(self):
+        lines = [
+            'DELIMITER ;;\n',
+            'CREATE TRIGGER t BEFORE INSERT ON t01 FOR EACH ROW BEGIN\n',
+            'SET NEW.id = 1; END ;;\n',
+            'DELIMITER ;\n']
+        self.assertEqual(
+            mysql_functions.normalize_schema_dump(''.join(lines)),
+            u'CREATE TRIGGER t BEFORE INSERT ON t01 FOR EACH ROW BEGIN\n'
+            u'SET NEW.id = 1; END')
+        self.assertEqual(
+            mysql_functions._generate_schema_hash_from_lines(lines),
+            mysql_functions.generate_schema_hash(''.join(lines)))
+
+
+class StreamFunctionsTestCase(TestCase):
+
+    def test_gzip_chunks(self):
+        chunks = ['CREATE TABLE t%s (id int);\n' % (i,) for i in range(100)]
+        data = ''.join(stream_functions.gzip_chunks(chunks))
+        self.assertEqual(
+            gzip.GzipFile(fileobj=StringIO(data)).read(), ''.join(chunks))
+
+    def test_tar_chunks(self):
+        members = [
+            ('db1/schema_version_1.sql', 'CREATE TABLE t1 (id int);', 100),
+            ('db1/schema_version_2.sql', 'x' * 20000, 200),
+        ]
+        data = ''.join(stream_functions.tar_chunks(members))
+        tar = tarfile.open(fileobj=StringIO(data))
+        self.assertEqual(
+            [(info.name, info.mtime) for info in tar.getmembers()],
+            [('db1/schema_version_1.sql', 100),
+             ('db1/schema_version_2.sql', 200)])
+        self.assertEqual(
+            tar.extractfile('db1/schema_version_2.sql').read(), 'x' * 20000)
+
+
+class CacheFunctionsTestCase(TestCase):
+
+    def test_versions(self):
+        version = cache_functions.get_version('test_versions')
+        self.assertEqual(cache_functions.get_version('test_versions'), version)
+        cache_functions.new_version('test_versions')
+        new_version = cache_functions.get_version('test_versions')
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(
+            cache_functions.CacheVersions()['test_versions'], new_version)
+
+    def test_missing_version(self):
+        from django.core.cache import cache
+        version = cache_functions.get_version('test_missing_version')
+        cache.delete(
+            cache_functions.get_version_cache_key('test_missing_version'))
+        self.assertNotEqual(
+            cache_functions.get_version('test_missing_version'), version)
 
-class SimpleTest(TestCase):
-    def test_basic_addition(self):
-        """
-        Tests that 1 + 1 always equals 2.
-        """
-        self.assertEqual(1 + 1, 2)
+    def test_register_model(self):
+        from changesets import models as changesets_models
+        from schemaversions import models as schemaversions_models
+        version = cache_functions.get_version('changesets')
+        database_schema = schemaversions_models.DatabaseSchema.objects.create(
+            name='test_register_model')
+        changesets_models.Changeset.objects.create(
+            database_schema=database_schema,
+            type=changesets_models.Changeset.DDL_TABLE_CREATE,
+            classification=changesets_models.Changeset.CLASSIFICATION_PAINLESS)
+        self.assertNotEqual(cache_functions.get_version('changesets'), version)
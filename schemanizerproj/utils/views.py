@@ -1 +1,117 @@
-# Create your views here.
+from django.conf import settings
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.utils.http import urlencode
+from utils import pagination
+
+
+class KeysetListMixin(object):
+    """ListView mixin that shows a page of the object list.
+
+    Pages are selected with the cursor query parameter, see utils.pagination.
+    The objects are sorted by the ordering named by the sort query parameter
+    and filtered by the query parameters in filter_fields. The object list of
+    the template is a lazy pagination.Page, that is not fetched when the
+    template fragment that uses it is cached.
+    """
+
+    # (sort query parameter, ordering) pairs, the first one is the default.
+    # The last field of each ordering must be unique, and the fields should
+    # be indexed.
+    sorts = (
+        ('newest', ('-id',)),
+        ('oldest', ('id',)),
+    )
+
+    # (filter query parameter, field name) pairs
+    filter_fields = ()
+
+    # number of objects on a page, LIST_PAGE_SIZE if None
+    page_size = None
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort')
+        if sort not in dict(self.sorts):
+            sort = self.sorts[0][0]
+        return sort
+
+    def get_filters(self, model):
+        """Returns (query parameter, field name, value) tuples of the valid
+        filter query parameters."""
+
+        filters = []
+        for name, field_name in self.filter_fields:
+            value = self.request.GET.get(name, '').strip()
+            if not value:
+                continue
+            field = model._meta.get_field(field_name)
+            if field.rel:
+                field = field.rel.get_related_field()
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                messages.error(
+                    self.request, u'Invalid %s: %s' % (name, value))
+                continue
+            filters.append((name, field_name, value))
+        return filters
+
+    def get_cursor(self, model, ordering):
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                pagination.decode_cursor(cursor, model, ordering)
+            except pagination.InvalidCursorError, e:
+                messages.error(self.request, u'%s' % (e,))
+                cursor = None
+        return cursor
+
+    def get_query_string(self, sort=None):
+        """Returns query string of the first page, sorted by sort or by the
+        current sort."""
+
+        params = [('sort', sort or self.sort)]
+        params.extend((name, value) for name, field_name, value in self.filters)
+        return urlencode(params)
+
+    def get_page_query_string(self):
+        """Returns query string of the page, also used to vary cached
+        fragments."""
+
+        query_string = self.get_query_string()
+        if self.page.cursor:
+            query_string = '%s&%s' % (
+                query_string, urlencode(dict(cursor=self.page.cursor)))
+        return query_string
+
+    def get_next_page_query_string(self):
+        return '%s&%s' % (
+            self.get_query_string(),
+            urlencode(dict(cursor=self.page.next_cursor)))
+
+    def get_sort_links(self):
+        """Returns (sort, query string, is current sort) tuples."""
+
+        return [
+            (sort, self.get_query_string(sort), sort == self.sort)
+            for sort, ordering in self.sorts]
+
+    def get_context_data(self, **kwargs):
+        queryset = kwargs.pop('object_list', self.object_list)
+        model = queryset.model
+        self.sort = self.get_sort()
+        ordering = dict(self.sorts)[self.sort]
+        self.filters = self.get_filters(model)
+        queryset = queryset.filter(**dict(
+            (field_name, value)
+            for name, field_name, value in self.filters))
+        page_size = self.page_size
+        if page_size is None:
+            page_size = settings.LIST_PAGE_SIZE
+        self.page = pagination.Page(
+            queryset, ordering, page_size,
+            cursor=self.get_cursor(model, ordering))
+        context = super(KeysetListMixin, self).get_context_data(
+            object_list=self.page, **kwargs)
+        context['page'] = self.page
+        return context